@@ -0,0 +1,147 @@
+"""Schéma initial (tel que créé jusqu'ici par Base.metadata.create_all)
+
+Les tables déjà présentes sont conservées : une base créée par create_all
+peut donc être migrée directement avec `alembic upgrade head`. Si la table
+monthly_rollups est créée ici, elle est remplie à partir des transactions
+existantes.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+CATEGORIES = (
+    "ALIMENTATION", "TRANSPORT", "LOGEMENT", "SANTE", "EDUCATION",
+    "LOISIRS", "EPARGNE", "VETEMENTS", "COMMUNICATION", "AUTRE",
+)
+
+
+def category_type(bind):
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(*CATEGORIES, name="categoryenum").create(bind, checkfirst=True)
+        return postgresql.ENUM(*CATEGORIES, name="categoryenum", create_type=False)
+    return sa.Enum(*CATEGORIES, name="categoryenum")
+
+
+def backfill_rollups(bind):
+    """
+    Agrégats mensuels de l'historique déjà présent (base créée par
+    create_all), même requête que rollups.rebuild_rollups
+    """
+    if bind.dialect.name == "postgresql":
+        month = "to_char(created_at, 'YYYY-MM')"
+    else:
+        month = "strftime('%Y-%m', created_at)"
+    op.execute(
+        "INSERT INTO monthly_rollups (user_id, month, category, transaction_type,"
+        " total_amount, transaction_count, min_amount, max_amount)"
+        f" SELECT user_id, {month}, category, coalesce(transaction_type, 'expense'),"
+        " sum(amount), count(id), min(amount), max(amount)"
+        " FROM transactions"
+        f" GROUP BY user_id, {month}, category, coalesce(transaction_type, 'expense')"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    category = category_type(bind)
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("phone", sa.String()),
+            sa.Column("username", sa.String()),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_phone", "users", ["phone"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "budgets" not in existing:
+        op.create_table(
+            "budgets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("category", category, nullable=False),
+            sa.Column("monthly_limit", sa.Float(), nullable=False),
+            sa.Column("current_spent", sa.Float()),
+            sa.Column("period_start", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("period_end", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_budgets_id", "budgets", ["id"])
+
+    if "transactions" not in existing:
+        op.create_table(
+            "transactions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("category", category, nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("transaction_type", sa.String()),
+            sa.Column("ai_score", sa.Float()),
+            sa.Column("ai_recommendation", sa.String()),
+            sa.Column("was_approved", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_transactions_id", "transactions", ["id"])
+
+    if "goals" not in existing:
+        op.create_table(
+            "goals",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("target_amount", sa.Float(), nullable=False),
+            sa.Column("current_amount", sa.Float()),
+            sa.Column("target_date", sa.DateTime(timezone=True)),
+            sa.Column("icon", sa.String()),
+            sa.Column("color", sa.String()),
+            sa.Column("is_completed", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_goals_id", "goals", ["id"])
+
+    if "monthly_rollups" not in existing:
+        op.create_table(
+            "monthly_rollups",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("month", sa.String(7), nullable=False),
+            sa.Column("category", category, nullable=False),
+            sa.Column("transaction_type", sa.String(), nullable=False),
+            sa.Column("total_amount", sa.Float(), nullable=False),
+            sa.Column("transaction_count", sa.Integer(), nullable=False),
+            sa.Column("min_amount", sa.Float()),
+            sa.Column("max_amount", sa.Float()),
+            sa.UniqueConstraint(
+                "user_id", "month", "category", "transaction_type", name="uq_monthly_rollups_key"
+            ),
+        )
+        op.create_index("ix_monthly_rollups_id", "monthly_rollups", ["id"])
+        backfill_rollups(bind)
+
+
+def downgrade():
+    for table in ("monthly_rollups", "goals", "transactions", "budgets", "users"):
+        op.drop_table(table)
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(name="categoryenum").drop(bind, checkfirst=True)
@@ -0,0 +1,47 @@
+"""Index composites pour les requêtes fréquentes et budget unique par catégorie
+
+- transactions (user_id, created_at, id) : historique trié par date
+- transactions (user_id, category) et (user_id, transaction_type) : filtres
+- budgets (user_id, category) UNIQUE : remplace la vérification SELECT de create_budget
+- goals (user_id, is_completed) : objectifs actifs des endpoints /ai
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_transactions_user_id_created_at", "transactions", ["user_id", "created_at", "id"], False),
+    ("ix_transactions_user_id_category", "transactions", ["user_id", "category"], False),
+    ("ix_transactions_user_id_type", "transactions", ["user_id", "transaction_type"], False),
+    ("uq_budgets_user_id_category", "budgets", ["user_id", "category"], True),
+    ("ix_goals_user_id_is_completed", "goals", ["user_id", "is_completed"], False),
+)
+
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT user_id, category, COUNT(*) FROM budgets "
+        "GROUP BY user_id, category HAVING COUNT(*) > 1"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            "Budgets en double pour (user_id, category) : "
+            f"{[(row[0], row[1]) for row in duplicates]}. "
+            "Fusionnez-les avant d'appliquer l'index unique."
+        )
+
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
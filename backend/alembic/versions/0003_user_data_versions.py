@@ -0,0 +1,27 @@
+"""Version des données par utilisateur (ETag des GET de liste et de résumé)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "user_data_versions" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "user_data_versions",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("user_data_versions")
@@ -0,0 +1,65 @@
+"""Statistiques courantes des dépenses par catégorie (détection des dépenses inhabituelles)
+
+- spending_stats : effectif, moyenne et m2 (Welford) par (user_id, category)
+- spending_sketch_buckets : esquisse de quantiles par compartiment logarithmique
+- transactions.anomaly_score : renseigné pour les dépenses signalées
+
+Les tables sont remplies à partir de l'historique existant par
+`python -m app.services.anomalies`.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+CATEGORIES = (
+    "ALIMENTATION", "TRANSPORT", "LOGEMENT", "SANTE", "EDUCATION",
+    "LOISIRS", "EPARGNE", "VETEMENTS", "COMMUNICATION", "AUTRE",
+)
+
+
+def category_type(bind):
+    if bind.dialect.name == "postgresql":
+        return postgresql.ENUM(*CATEGORIES, name="categoryenum", create_type=False)
+    return sa.Enum(*CATEGORIES, name="categoryenum")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+    category = category_type(bind)
+
+    if "spending_stats" not in existing:
+        op.create_table(
+            "spending_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("category", category, primary_key=True),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("mean", sa.Float(), nullable=False),
+            sa.Column("m2", sa.Float(), nullable=False),
+        )
+    if "spending_sketch_buckets" not in existing:
+        op.create_table(
+            "spending_sketch_buckets",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("category", category, primary_key=True),
+            sa.Column("bucket", sa.Integer(), primary_key=True),
+            sa.Column("count", sa.Integer(), nullable=False),
+        )
+    if "anomaly_score" not in {column["name"] for column in inspector.get_columns("transactions")}:
+        op.add_column("transactions", sa.Column("anomaly_score", sa.Float()))
+
+
+def downgrade():
+    op.drop_column("transactions", "anomaly_score")
+    op.drop_table("spending_sketch_buckets")
+    op.drop_table("spending_stats")
@@ -0,0 +1,61 @@
+"""Archive des périodes budgétaires et avancement de la remise à zéro mensuelle
+
+- budget_periods : dépense de chaque période close, par budget
+- budget_rollovers : une ligne par mois, dernier budget traité (reprise)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+CATEGORIES = (
+    "ALIMENTATION", "TRANSPORT", "LOGEMENT", "SANTE", "EDUCATION",
+    "LOISIRS", "EPARGNE", "VETEMENTS", "COMMUNICATION", "AUTRE",
+)
+
+
+def category_type(bind):
+    if bind.dialect.name == "postgresql":
+        return postgresql.ENUM(*CATEGORIES, name="categoryenum", create_type=False)
+    return sa.Enum(*CATEGORIES, name="categoryenum")
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if "budget_periods" not in existing:
+        op.create_table(
+            "budget_periods",
+            sa.Column("budget_id", sa.Integer(), sa.ForeignKey("budgets.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("period_start", sa.DateTime(timezone=True), primary_key=True),
+            sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("category", category_type(bind), nullable=False),
+            sa.Column("monthly_limit", sa.Float(), nullable=False),
+            sa.Column("spent", sa.Float(), nullable=False),
+        )
+        op.create_index("ix_budget_periods_user_id_period_start", "budget_periods", ["user_id", "period_start"])
+    if "budget_rollovers" not in existing:
+        op.create_table(
+            "budget_rollovers",
+            sa.Column("period", sa.String(7), primary_key=True),
+            sa.Column("last_budget_id", sa.Integer(), nullable=False),
+            sa.Column("budgets_rolled", sa.Integer(), nullable=False),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("completed_at", sa.DateTime(timezone=True)),
+        )
+
+
+def downgrade():
+    op.drop_table("budget_rollovers")
+    op.drop_index("ix_budget_periods_user_id_period_start", table_name="budget_periods")
+    op.drop_table("budget_periods")
@@ -1,7 +1,12 @@
-from .database import Base, engine, get_db
+from .database import Base, get_db, get_engine
 from .user import User
 from .budget import Budget, CategoryEnum
 from .transaction import Transaction
 from .goal import Goal
+from .rollup import MonthlyRollup
+from .data_version import UserDataVersion
+from .idempotency import IdempotencyKey
+from .spending_stats import SpendingStats, SpendingSketchBucket
+from .budget_period import BudgetPeriod, BudgetRollover
 
-__all__ = ["Base", "engine", "get_db", "User", "Budget", "CategoryEnum", "Transaction", "Goal"]
+__all__ = ["Base", "get_db", "get_engine", "User", "Budget", "CategoryEnum", "Transaction", "Goal", "MonthlyRollup", "UserDataVersion", "IdempotencyKey", "SpendingStats", "SpendingSketchBucket", "BudgetPeriod", "BudgetRollover"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from .database import Base
 import enum
@@ -19,6 +19,10 @@ class CategoryEnum(str, enum.Enum):
 
 class Budget(Base):
     __tablename__ = "budgets"
+    __table_args__ = (
+        # Un seul budget par catégorie et par utilisateur
+        Index("uq_budgets_user_id_category", "user_id", "category", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index
+from .database import Base
+from .budget import CategoryEnum
+
+
+class BudgetPeriod(Base):
+    """Période budgétaire close : dépense archivée à la remise à zéro du budget"""
+    __tablename__ = "budget_periods"
+    __table_args__ = (
+        # Historique d'un utilisateur, par période
+        Index("ix_budget_periods_user_id_period_start", "user_id", "period_start"),
+    )
+
+    budget_id = Column(Integer, ForeignKey("budgets.id", ondelete="CASCADE"), primary_key=True)
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(Enum(CategoryEnum), nullable=False)
+    monthly_limit = Column(Float, nullable=False)
+    spent = Column(Float, nullable=False, default=0.0)
+
+
+class BudgetRollover(Base):
+    """Avancement de la remise à zéro mensuelle de tous les budgets (reprise après interruption)"""
+    __tablename__ = "budget_rollovers"
+
+    period = Column(String(7), primary_key=True)  # "YYYY-MM" de la période ouverte
+    last_budget_id = Column(Integer, nullable=False, default=0)  # dernier budget traité
+    budgets_rolled = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True))
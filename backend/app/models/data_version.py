@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from .database import Base
+
+
+class UserDataVersion(Base):
+    """Version des données d'un utilisateur, incrémentée par chaque écriture"""
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,21 +1,311 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from fastapi import Query
+from typing import Optional
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from .pool import pool_options, pool_status
+from .profiling import SQL_PROFILING, install_profiling
+from .replicas import REPLICA_URLS, Replica, ReplicaSet, is_sticky, replica_name
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Mode async : les routes utilisent un AsyncSession (asyncpg / aiosqlite)
+# au lieu d'une Session bloquante exécutée dans le threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Convertir une URL synchrone en URL utilisant le driver async équivalent"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Les moteurs sont créés par init_engines() (lifespan de l'application, ou
+# premier accès à `engine` / `SessionLocal` hors application) : importer
+# l'application, Alembic ou une CLI ne demande ni base ni DATABASE_URL.
+_engine = None
+_async_engine = None
+_session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+_async_session_factory = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_replicas = ReplicaSet()
+_init_lock = threading.Lock()
+
+
+def _create_engine(url: str):
+    """Moteur du mode configuré (sync ou async) pour une URL synchrone"""
+    if DB_ASYNC:
+        async_url = to_async_url(url)
+        engine = create_async_engine(async_url, **pool_options(async_url, is_async=True))
+        if SQL_PROFILING:
+            install_profiling(engine.sync_engine)
+        return engine
+    engine = create_engine(url, **pool_options(url))
+    if SQL_PROFILING:
+        install_profiling(engine)
+    return engine
+
+
+def init_engines():
+    """Créer les moteurs et lier les fabriques de sessions (idempotent)"""
+    global _engine, _async_engine, _replicas
+    with _init_lock:
+        if _engine is not None:
+            return _engine
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL n'est pas défini")
+
+        engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+        if SQL_PROFILING:
+            install_profiling(engine)
+        _session_factory.configure(bind=engine)
+
+        if DB_ASYNC:
+            async_url = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+            _async_engine = create_async_engine(async_url, **pool_options(async_url, is_async=True))
+            if SQL_PROFILING:
+                install_profiling(_async_engine.sync_engine)
+            _async_session_factory.configure(bind=_async_engine)
+        _replicas = ReplicaSet([Replica(replica_name(url), _create_engine(url)) for url in REPLICA_URLS])
+        _engine = engine
+        return engine
+
+
+def get_engine():
+    """Moteur synchrone (créé au premier appel)"""
+    return _engine if _engine is not None else init_engines()
+
+
+def get_async_engine():
+    """Moteur async, None hors mode DB_ASYNC"""
+    get_engine()
+    return _async_engine
+
+
+def dialect_name() -> str:
+    return get_engine().dialect.name
+
+
+def __getattr__(name):
+    # `database.engine`, `from .database import SessionLocal`… créent les moteurs à la demande
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "SessionLocal":
+        get_engine()
+        return _session_factory
+    if name == "AsyncSessionLocal":
+        get_engine()
+        return _async_session_factory if DB_ASYNC else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class SyncSessionAdapter:
+    """
+    Expose une Session bloquante avec l'API d'AsyncSession.
+
+    Chaque appel qui touche la base est exécuté dans le threadpool, ce qui
+    permet d'écrire les routes une seule fois (async def) pour les deux modes.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        self.sync_session.delete(instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """fn(session, ...) en un seul passage dans le threadpool, comme AsyncSession.run_sync"""
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        """Curseur côté serveur ; lire avec `async for rows in result.partitions(n)`"""
+        result = await run_in_threadpool(
+            self.sync_session.execute,
+            statement.execution_options(stream_results=True), params, **kwargs
+        )
+        return ThreadedStreamResult(result)
+
+
+class ThreadedStreamResult:
+    """Équivalent minimal d'AsyncResult pour un résultat synchrone en streaming"""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        try:
+            while True:
+                rows = await run_in_threadpool(self.result.fetchmany, size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await run_in_threadpool(self.result.close)
+
+
+@asynccontextmanager
+async def session_scope():
+    """Session du mode configuré, hors injection de dépendances (streaming, tâches)"""
+    get_engine()
+    if DB_ASYNC:
+        async with _async_session_factory() as db:
+            yield db
+    else:
+        db = SyncSessionAdapter(_session_factory())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def get_db():
+    async with session_scope() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+def _open_session(engine):
+    if DB_ASYNC:
+        return _async_session_factory(bind=engine)
+    return SyncSessionAdapter(_session_factory(bind=engine))
+
+
+async def _connect(db):
+    """Prendre la connexion tout de suite : un réplica injoignable est détecté avant la route"""
+    if DB_ASYNC:
+        await db.connection()
+    else:
+        await db.run_sync(lambda session: session.connection())
+
+
+@asynccontextmanager
+async def read_session_scope(user_id: Optional[int] = None):
+    """
+    Session de lecture seule : un réplica en tourniquet, ou la principale
+    (pas de réplica, écriture récente de l'utilisateur, réplicas éjectés)
+    """
+    get_engine()
+    tried = []
+    while _replicas and not is_sticky(user_id):
+        replica = _replicas.choose(exclude=tried)
+        if replica is None:
+            break
+        db = _open_session(replica.engine)
+        try:
+            await _connect(db)
+        except exc.TimeoutError:
+            # Pool du réplica saturé : il n'est pas en panne, on essaie le suivant
+            await db.close()
+            tried.append(replica)
+            continue
+        except (exc.DBAPIError, OSError):
+            await db.close()
+            _replicas.eject(replica)
+            tried.append(replica)
+            continue
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+
+    async with session_scope() as db:
+        yield db
+
+
+async def get_read_db(user_id: int = Query(default=1)):
+    """Dépendance des GET et des routes IA en lecture seule"""
+    async with read_session_scope(user_id) as db:
+        yield db
+
+
+async def dispose_engines():
+    """Fermer les connexions du pool (arrêt du worker) ; les moteurs restent utilisables"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        await run_in_threadpool(_engine.dispose)
+    for replica in _replicas.replicas:
+        if DB_ASYNC:
+            await replica.engine.dispose()
+        else:
+            await run_in_threadpool(replica.engine.dispose)
+
+
+def get_pool_status():
+    """État du pool du moteur actif"""
+    active = get_async_engine().sync_engine if DB_ASYNC else get_engine()
+    return pool_status(active.pool)
+
+
+def get_replica_status():
+    """Réplicas : santé, éjections, lectures servies et pool"""
+    get_engine()
+    status = _replicas.status()
+    for entry, replica in zip(status, _replicas.replicas):
+        entry["pool"] = pool_status((replica.engine.sync_engine if DB_ASYNC else replica.engine).pool)
+    return status
+
+
+async def ping_database() -> float:
+    """Aller-retour SELECT 1, retourne la latence en millisecondes"""
+    start = time.perf_counter()
+    if DB_ASYNC:
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        def _ping():
+            with get_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+        await run_in_threadpool(_ping)
+    return round((time.perf_counter() - start) * 1000, 3)
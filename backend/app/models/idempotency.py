@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
+from .database import Base
+
+
+class IdempotencyKey(Base):
+    """Réponse enregistrée pour un en-tête Idempotency-Key (rejouée aux tentatives suivantes)"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # Purge des clés expirées
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(32), nullable=False)  # route + corps de la requête
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)  # réponse JSON
+    expires_at = Column(Integer, nullable=False)  # timestamp Unix
@@ -0,0 +1,100 @@
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from typing import Dict, Any
+import threading
+import time
+import os
+
+
+class PoolStats:
+    """Compteurs d'attente et de timeouts au checkout d'un pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class InstrumentedPoolMixin:
+    """Mesurer le temps passé à obtenir une connexion du pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """Arguments de create_engine pour le pool, lus depuis l'environnement"""
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        # SQLite en mémoire : une seule connexion partagée, pas de pool à régler
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """État instantané d'un pool : connexions utilisées, overflow, saturation"""
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+
+    size = pool.size()
+    checked_out = pool.checkedout()
+    # max_overflow = -1 : overflow illimité, le pool ne sature jamais
+    capacity = size + pool._max_overflow if pool._max_overflow >= 0 else 0
+    status = {
+        "pool": type(pool).__name__,
+        "size": size,
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow_in_use": max(0, pool.overflow()),
+        "saturation": round(checked_out / capacity, 3) if capacity > 0 else 0.0,
+    }
+    if isinstance(pool, InstrumentedPoolMixin):
+        status.update(pool.stats.snapshot())
+    return status
@@ -0,0 +1,101 @@
+"""
+Réplicas en lecture : tourniquet et éjection sur échec de connexion.
+
+DATABASE_REPLICA_URLS (URLs séparées par des virgules) active le routage ;
+sans elle, toutes les lectures restent sur la base principale.
+
+- Une lecture prend le réplica suivant parmi ceux qui ne sont pas éjectés.
+- Un réplica dont la connexion échoue est éjecté REPLICA_EJECT_SECONDS,
+  puis remis dans le tourniquet : s'il échoue encore, il repart pour une
+  période.
+- Un utilisateur qui vient d'écrire lit sur la principale pendant
+  REPLICA_STICKY_SECONDS (lecture de ses propres écritures malgré le
+  retard de réplication). Ce marquage est propre au worker : la fenêtre
+  doit couvrir le retard habituel des réplicas.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import itertools
+import os
+import threading
+import time
+from ..utils.cache import TTLCache
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_EJECT_SECONDS = float(os.getenv("REPLICA_EJECT_SECONDS", 30))
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: Any  # moteur synchrone, ou async selon DB_ASYNC
+    ejected_until: float = 0.0
+    failures: int = 0
+    reads: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+
+@dataclass
+class ReplicaSet:
+    replicas: List[Replica] = field(default_factory=list)
+    eject_seconds: float = REPLICA_EJECT_SECONDS
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self, exclude=()) -> Optional[Replica]:
+        """Réplica suivant en bonne santé, None si tous sont éjectés"""
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy and replica not in exclude:
+                    replica.reads += 1
+                    return replica
+        return None
+
+    def eject(self, replica: Replica):
+        with self._lock:
+            replica.failures += 1
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "ejected_for_s": round(max(0.0, replica.ejected_until - now), 1),
+                "failures": replica.failures,
+                "reads": replica.reads,
+            }
+            for replica in self.replicas
+        ]
+
+
+# Utilisateurs ayant écrit récemment : leurs lectures restent sur la principale
+recent_writers = TTLCache(maxsize=int(os.getenv("REPLICA_STICKY_USERS", 100000)), ttl=REPLICA_STICKY_SECONDS)
+
+
+def note_write(user_id: int):
+    if REPLICA_URLS:
+        recent_writers.set(user_id, True)
+
+
+def is_sticky(user_id: Optional[int]) -> bool:
+    return user_id is not None and recent_writers.get(user_id) is not None
+
+
+def replica_name(url: str) -> str:
+    """Hôte et base, sans identifiants (logs, /health)"""
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    return f"{parsed.host}/{parsed.database}" if parsed.host else str(parsed.database)
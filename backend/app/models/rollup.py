@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, UniqueConstraint
+from .database import Base
+from .budget import CategoryEnum
+
+
+class MonthlyRollup(Base):
+    """Agrégat mensuel des transactions d'un utilisateur, maintenu à chaque écriture"""
+    __tablename__ = "monthly_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", "category", "transaction_type", name="uq_monthly_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    month = Column(String(7), nullable=False)  # "YYYY-MM"
+    category = Column(Enum(CategoryEnum), nullable=False)
+    transaction_type = Column(String, nullable=False)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
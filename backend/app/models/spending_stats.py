@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, Enum
+from .database import Base
+from .budget import CategoryEnum
+
+
+class SpendingStats(Base):
+    """Statistiques courantes des dépenses d'un utilisateur dans une catégorie (Welford)"""
+    __tablename__ = "spending_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(Enum(CategoryEnum), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # somme des carrés des écarts à la moyenne
+
+
+class SpendingSketchBucket(Base):
+    """Compartiment de l'esquisse de quantiles des montants (app.utils.stats)"""
+    __tablename__ = "spending_sketch_buckets"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(Enum(CategoryEnum), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
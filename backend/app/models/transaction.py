@@ -1,11 +1,26 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Boolean, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
 from .database import Base
 from .budget import CategoryEnum
 
 
+# Sous SQLite, même format que CURRENT_TIMESTAMP (server_default) : les
+# comparaisons de la pagination par curseur se font sur des chaînes.
+CreatedAt = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Historique paginé : WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_transactions_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_transactions_user_id_category", "user_id", "category"),
+        Index("ix_transactions_user_id_type", "user_id", "transaction_type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -16,4 +31,5 @@ class Transaction(Base):
     ai_score = Column(Float)
     ai_recommendation = Column(String)
     was_approved = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(CreatedAt, server_default=func.now())
+    anomaly_score = Column(Float)  # écart à la moyenne (en écarts types) des dépenses inhabituelles
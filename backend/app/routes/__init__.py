@@ -1,3 +1,3 @@
-from . import auth, budgets, transactions, goals, ai
+from . import auth, budgets, transactions, goals, ai, health, metrics
 
-__all__ = ["auth", "budgets", "transactions", "goals", "ai"]
+__all__ = ["auth", "budgets", "transactions", "goals", "ai", "health", "metrics"]
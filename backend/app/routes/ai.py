@@ -1,17 +1,30 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
-from ..models.database import get_db
+from ..models.database import get_db, get_read_db
 from ..models.budget import Budget, CategoryEnum
 from ..models.transaction import Transaction
-from ..models.goal import Goal
-from ..services.ai_engine import AIEngine
+from ..services.ai_engine import RECOMMENDATIONS, get_ai_engine
+from ..services.accounting import post_transaction
+from ..services.anomalies import recent_outliers
+from ..services.context_cache import get_financial_context, invalidate_context
+from ..services.forecasting import (
+    CATEGORY_ROW, FORECAST_INTERVAL, FORECAST_LOOKBACK_DAYS, bounds, daily_series, fit_user, horizon,
+    naive_utc, period_bounds, period_days, project
+)
+from ..services.simulation import SIMULATION_MAX_PATHS, SIMULATION_PATHS, goal_shortfall, simulate
+from ..services.idempotency import idempotent_request, replay_response
 from pydantic import BaseModel
+import math
+import numpy as np
+import os
 
 router = APIRouter(prefix="/ai", tags=["ai"])
-ai_engine = AIEngine()
+
+MAX_BATCH_SIZE = int(os.getenv("AI_MAX_BATCH_SIZE", 10000))
 
 
 class TransactionAnalysis(BaseModel):
@@ -20,21 +33,37 @@ class TransactionAnalysis(BaseModel):
     description: Optional[str] = None
 
 
+class BatchAnalysis(BaseModel):
+    transactions: List[TransactionAnalysis]
+
+
 class VoiceQuery(BaseModel):
     query: str
 
 
+class HypotheticalExpense(BaseModel):
+    amount: float
+    category: CategoryEnum = CategoryEnum.AUTRE
+    description: Optional[str] = None
+
+
+class SimulationRequest(BaseModel):
+    """Un achat (amount, category) et/ou une liste d'achats (expenses)"""
+    amount: Optional[float] = None
+    category: CategoryEnum = CategoryEnum.AUTRE
+    description: Optional[str] = None
+    expenses: List[HypotheticalExpense] = []
+
+
 @router.post("/analyze")
-def analyze_transaction(
+async def analyze_transaction(
     data: TransactionAnalysis,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Analyser une transaction avant de la valider"""
-    budget = db.query(Budget).filter(
-        Budget.user_id == user_id,
-        Budget.category == data.category
-    ).first()
+    context = await get_financial_context(db, user_id)
+    budget = context.budget_for(data.category)
 
     if not budget:
         return {
@@ -47,7 +76,7 @@ def analyze_transaction(
 
     budget_remaining = budget.monthly_limit - budget.current_spent
 
-    result = ai_engine.calculate_score(
+    result = get_ai_engine().calculate_score(
         amount=data.amount,
         category=data.category,
         budget_remaining=budget_remaining,
@@ -56,13 +85,8 @@ def analyze_transaction(
     )
 
     # Ajouter des informations sur les objectifs impactés
-    goals = db.query(Goal).filter(
-        Goal.user_id == user_id,
-        Goal.is_completed == False
-    ).all()
-
     goals_impact = []
-    for goal in goals:
+    for goal in context.goals:
         remaining_to_goal = goal.target_amount - goal.current_amount
         if data.amount > remaining_to_goal * 0.1:  # Si la dépense représente + de 10% de l'objectif restant
             goals_impact.append({
@@ -87,16 +111,76 @@ def analyze_transaction(
     }
 
 
+@router.post("/analyze/batch")
+async def analyze_transactions_batch(
+    data: BatchAnalysis,
+    user_id: int = Query(default=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Analyser un lot d'achats envisagés en un appel.
+
+    Chaque achat est évalué indépendamment contre l'état actuel de son budget
+    (même score que /ai/analyze, sans l'impact sur les objectifs).
+    """
+    if len(data.transactions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"{MAX_BATCH_SIZE} transactions maximum par lot")
+
+    context = await get_financial_context(db, user_id)
+    budgets = {b.category.value: b for b in context.budgets}
+
+    # Achats couverts par un budget : score vectorisé en une passe
+    scored = [i for i, t in enumerate(data.transactions) if t.category in budgets]
+    limits = np.array([budgets[data.transactions[i].category].monthly_limit for i in scored], dtype=float)
+    spent = np.array([budgets[data.transactions[i].category].current_spent for i in scored], dtype=float)
+    result = get_ai_engine().calculate_scores(
+        amounts=np.array([data.transactions[i].amount for i in scored], dtype=float),
+        budget_remaining=limits - spent,
+        monthly_spent=spent,
+        monthly_limit=limits
+    )
+
+    results = [{
+        "approved": True,
+        "score": 5,
+        "color": "orange",
+        "recommendation": "Aucun budget défini pour cette catégorie. Créez un budget pour un meilleur suivi.",
+        "budget_percentage": None,
+        "transaction_percentage": None,
+    } for _ in data.transactions]
+    for i, score, code, budget_pct, transaction_pct in zip(
+        scored,
+        result["score"].tolist(),
+        result["code"].tolist(),
+        np.round(result["budget_percentage"], 2).tolist(),
+        np.round(result["transaction_percentage"], 2).tolist(),
+    ):
+        recommendation, color = RECOMMENDATIONS[code]
+        results[i] = {
+            "approved": score > 3,
+            "score": score,
+            "color": color,
+            "recommendation": recommendation,
+            "budget_percentage": budget_pct,
+            "transaction_percentage": transaction_pct,
+        }
+
+    # Contenu déjà sérialisable : éviter jsonable_encoder sur des milliers d'éléments
+    return JSONResponse(content={
+        "count": len(results),
+        "approved": sum(r["approved"] for r in results),
+        "results": results,
+    })
+
+
 @router.post("/recommend")
-def get_recommendations(
+async def get_recommendations(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtenir des recommandations personnalisées basées sur les habitudes de dépenses"""
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == user_id
-    ).order_by(desc(Transaction.created_at)).limit(50).all()
+    context = await get_financial_context(db, user_id)
+    budgets = context.budgets
 
     recommendations = []
 
@@ -126,26 +210,21 @@ def get_recommendations(
                 "priority": "low"
             })
 
-    # Analyser les tendances de dépenses
-    if transactions:
-        total_spent = sum(t.amount for t in transactions if t.transaction_type == "expense")
-        avg_transaction = total_spent / len([t for t in transactions if t.transaction_type == "expense"]) if transactions else 0
-
-        if avg_transaction > 50000:  # Si moyenne > 50,000 FCFA
-            recommendations.append({
-                "type": "insight",
-                "category": "general",
-                "message": f"Vos transactions moyennes sont de {avg_transaction:,.0f} FCFA. Essayez de diviser vos achats importants.",
-                "priority": "medium"
-            })
+    # Dépenses inhabituelles récentes, jugées à l'écriture sur les habitudes de l'utilisateur
+    for transaction in await recent_outliers(db, user_id):
+        category = transaction.category.value
+        profile = context.profile_for(category)
+        usual = f", contre ~{profile.median:,.0f} FCFA d'habitude" if profile else ""
+        recommendations.append({
+            "type": "unusual_expense",
+            "category": category,
+            "transaction_id": transaction.id,
+            "message": f"Dépense inhabituelle : {transaction.amount:,.0f} FCFA en {category} le {transaction.created_at:%d/%m}{usual}. Vérifiez qu'elle était prévue.",
+            "priority": "medium"
+        })
 
     # Vérifier les objectifs
-    goals = db.query(Goal).filter(
-        Goal.user_id == user_id,
-        Goal.is_completed == False
-    ).all()
-
-    for goal in goals:
+    for goal in context.goals:
         progress = (goal.current_amount / goal.target_amount * 100) if goal.target_amount > 0 else 0
         if progress < 25 and goal.target_date:
             days_left = (goal.target_date - datetime.utcnow()).days
@@ -164,31 +243,60 @@ def get_recommendations(
 
 
 @router.post("/predict")
-def predict_end_of_month(
+async def predict_end_of_month(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Prédire la situation financière en fin de mois"""
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == user_id,
-        Transaction.transaction_type == "expense"
-    ).all()
-
-    # Calculer les jours écoulés et restants dans le mois
-    today = datetime.utcnow()
-    days_in_month = 30
-    days_elapsed = today.day
-    days_remaining = days_in_month - days_elapsed
+    context = await get_financial_context(db, user_id)
+    budgets = context.budgets
+
+    # Chaque budget suit sa propre période (remise à zéro) ; les jours
+    # affichés sont ceux de la période qui se termine le plus tôt
+    now = datetime.utcnow()
+    periods = [period_bounds(budget.period_start, budget.period_end, now) for budget in budgets]
+    first_start, first_end = min(periods, key=lambda period: period[1], default=period_bounds(None, None, now))
+    days_elapsed, days_remaining = period_days(first_start, first_end, now)
+
+    # Série journalière bornée à la fenêtre de prévision, pas à l'historique
+    model = await fit_user(db, user_id, now.date()) if budgets else None
+    horizons = {}
 
     predictions = []
     total_predicted_overspend = 0
-
-    for budget in budgets:
-        # Calculer le taux de dépense journalier
-        daily_rate = budget.current_spent / days_elapsed if days_elapsed > 0 else 0
-        predicted_total = budget.current_spent + (daily_rate * days_remaining)
+    total_variance = 0.0
+
+    for budget, (start, end) in zip(budgets, periods):
+        if model is not None:
+            if end not in horizons:
+                horizons[end] = project(model, *horizon(now, end))
+            row = CATEGORY_ROW[budget.category]
+            expected, sd = (float(values[row]) for values in horizons[end])
+            method = model.models[row]
+            daily_rate = float(model.rate[row])
+        else:
+            # Aucune dépense sur la fenêtre : extrapolation de la période en
+            # cours, à condition qu'elle ait au moins un jour
+            elapsed = (now - start).total_seconds() / 86400
+            if elapsed >= 1.0:
+                daily_rate = budget.current_spent / elapsed
+                expected = daily_rate * max(0.0, (end - now).total_seconds() / 86400)
+                method = "linear"
+            else:
+                # Moins d'un jour : aucun rythme mesurable, pas d'extrapolation
+                daily_rate, expected = 0.0, 0.0
+                method = "insufficient_history"
+            sd = 0.0
+
+        predicted_total = budget.current_spent + expected
         predicted_overspend = max(0, predicted_total - budget.monthly_limit)
+        if method == "insufficient_history":
+            # Intervalle inconnu, donc aussi celui du total
+            low = high = None
+            total_variance = math.inf
+        else:
+            low, high = (budget.current_spent + float(value) for value in bounds(expected, sd))
+            total_variance += sd ** 2
 
         status = "on_track"
         if predicted_total > budget.monthly_limit:
@@ -202,15 +310,27 @@ def predict_end_of_month(
             "current_spent": budget.current_spent,
             "monthly_limit": budget.monthly_limit,
             "predicted_total": round(predicted_total, 2),
+            "predicted_low": round(low, 2) if low is not None else None,
+            "predicted_high": round(high, 2) if high is not None else None,
             "predicted_overspend": round(predicted_overspend, 2),
             "daily_rate": round(daily_rate, 2),
+            "model": method,
+            "period_end": end.isoformat(),
+            "days_remaining": period_days(start, end, now)[1],
             "status": status
         })
 
     # Calcul global
-    total_limit = sum(b.monthly_limit for b in budgets)
-    total_spent = sum(b.current_spent for b in budgets)
+    total_limit = context.total_budget
+    total_spent = context.total_spent
     total_predicted = sum(p["predicted_total"] for p in predictions)
+    # Catégories supposées indépendantes : les variances s'ajoutent
+    total_low = total_high = None
+    if math.isfinite(total_variance):
+        total_low, total_high = (
+            round(total_spent + float(value), 2)
+            for value in bounds(total_predicted - total_spent, total_variance ** 0.5)
+        )
 
     return {
         "days_elapsed": days_elapsed,
@@ -219,41 +339,128 @@ def predict_end_of_month(
             "total_budget": total_limit,
             "total_spent": total_spent,
             "total_predicted": round(total_predicted, 2),
+            "total_predicted_low": total_low,
+            "total_predicted_high": total_high,
+            "interval": FORECAST_INTERVAL,
             "predicted_overspend": round(total_predicted_overspend, 2),
             "overall_status": "critical" if total_predicted_overspend > 0 else "healthy"
         },
         "by_category": predictions,
-        "advice": ai_engine.generate_monthly_advice(
+        "advice": get_ai_engine().generate_monthly_advice(
             total_spent, total_limit, days_remaining, total_predicted_overspend
         )
     }
 
 
+@router.post("/simulate")
+async def simulate_purchases(
+    data: SimulationRequest,
+    user_id: int = Query(default=1),
+    paths: int = Query(default=SIMULATION_PATHS, ge=100, le=SIMULATION_MAX_PATHS),
+    seed: Optional[int] = Query(default=None, description="Graine, pour des résultats reproductibles"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Simuler la fin de période avec des achats envisagés : probabilité de
+    dépasser chaque budget et de manquer chaque objectif à sa date cible,
+    avec et sans ces achats
+    """
+    purchases = list(data.expenses)
+    if data.amount is not None:
+        purchases.append(HypotheticalExpense(amount=data.amount, category=data.category, description=data.description))
+    if any(purchase.amount <= 0 for purchase in purchases):
+        raise HTTPException(status_code=400, detail="Les montants doivent être positifs")
+
+    context = await get_financial_context(db, user_id)
+    now = datetime.utcnow()
+    series = await daily_series(db, user_id, now.date() - timedelta(days=FORECAST_LOOKBACK_DAYS), now.date())
+
+    budgets = context.budgets
+    ends = [period_bounds(budget.period_start, budget.period_end, now)[1] for budget in budgets]
+    # Objectifs datés, par échéance croissante : l'épargne finance d'abord les plus proches
+    goals = sorted((goal for goal in context.goals if goal.target_date is not None),
+                   key=lambda goal: naive_utc(goal.target_date))
+    result = simulate(
+        series, now, [budget.category for budget in budgets], ends,
+        [naive_utc(goal.target_date) for goal in goals], paths, np.random.default_rng(seed)
+    )
+
+    purchased = {}
+    for purchase in purchases:
+        purchased[purchase.category] = purchased.get(purchase.category, 0.0) + purchase.amount
+    purchases_total = sum(purchased.values())
+
+    budget_results = []
+    for i, budget in enumerate(budgets):
+        baseline = budget.current_spent + result.spend[i]
+        final = baseline + purchased.get(budget.category, 0.0)
+        low, high = np.percentile(final, [10, 90])
+        budget_results.append({
+            "category": budget.category.value,
+            "monthly_limit": budget.monthly_limit,
+            "current_spent": budget.current_spent,
+            "simulated_purchases": purchased.get(budget.category, 0.0),
+            "expected_total": round(float(final.mean()), 2),
+            "total_p10": round(float(low), 2),
+            "total_p90": round(float(high), 2),
+            "overspend_probability": round(float((final > budget.monthly_limit).mean()), 4),
+            "baseline_overspend_probability": round(float((baseline > budget.monthly_limit).mean()), 4),
+            "period_end": ends[i].isoformat(),
+        })
+
+    # Sans revenu sur la fenêtre, l'épargne future n'est pas estimable
+    remaining = np.array([max(0.0, goal.target_amount - goal.current_amount) for goal in goals])
+    missed = goal_shortfall(result.savings, remaining, purchases_total) if series.income.any() else None
+    baseline_missed = goal_shortfall(result.savings, remaining, 0.0) if series.income.any() else None
+    goal_results = [
+        {
+            "id": goal.id,
+            "name": goal.name,
+            "target_amount": goal.target_amount,
+            "current_amount": goal.current_amount,
+            "target_date": goal.target_date.isoformat(),
+            "miss_probability": round(float(missed[i].mean()), 4) if missed is not None else None,
+            "baseline_miss_probability": (
+                round(float(baseline_missed[i].mean()), 4) if baseline_missed is not None else None
+            ),
+        }
+        for i, goal in enumerate(goals)
+    ]
+
+    budgeted = {budget.category for budget in budgets}
+    return {
+        "paths": paths,
+        "history_days": series.days,
+        "purchases_total": purchases_total,
+        "unbudgeted_categories": sorted(category.value for category in purchased if category not in budgeted),
+        "budgets": budget_results,
+        "goals": goal_results,
+    }
+
+
 @router.post("/voice")
-def process_voice_query(
+async def process_voice_query(
     data: VoiceQuery,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Traiter une requête vocale de l'utilisateur"""
     query = data.query.lower()
 
     # Récupérer le contexte financier
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
-    goals = db.query(Goal).filter(Goal.user_id == user_id, Goal.is_completed == False).all()
-
-    total_budget = sum(b.monthly_limit for b in budgets)
-    total_spent = sum(b.current_spent for b in budgets)
-    remaining = total_budget - total_spent
+    context = await get_financial_context(db, user_id)
+    total_budget = context.total_budget
+    total_spent = context.total_spent
+    remaining = context.remaining
 
     # Analyser la requête
-    response = ai_engine.process_voice_query(
+    response = get_ai_engine().process_voice_query(
         query=query,
         total_budget=total_budget,
         total_spent=total_spent,
         remaining=remaining,
-        budgets=budgets,
-        goals=goals
+        budgets=context.budgets,
+        goals=context.goals
     )
 
     return {
@@ -280,10 +487,10 @@ class SikaConfirmTransaction(BaseModel):
 
 
 @router.post("/sika")
-def sika_chat(
+async def sika_chat(
     data: SikaQuery,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Endpoint principal de Sika - l'assistant vocal intelligent
@@ -292,22 +499,22 @@ def sika_chat(
     - message: La réponse de Sika
     - intent: L'intention détectée (expense_past, expense_future, balance, advice, greeting)
     - can_add_transaction: Si l'utilisateur peut confirmer une transaction
+    - unusual: Si la dépense est inhabituelle pour l'utilisateur
     - suggested_transaction: Détails de la transaction suggérée (si applicable)
     """
     # Récupérer le contexte financier
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
-    goals = db.query(Goal).filter(Goal.user_id == user_id, Goal.is_completed == False).all()
-
-    total_budget = sum(b.monthly_limit for b in budgets)
-    total_spent = sum(b.current_spent for b in budgets)
+    context = await get_financial_context(db, user_id)
+    total_budget = context.total_budget
+    total_spent = context.total_spent
 
     # Utiliser le moteur Sika
-    result = ai_engine.sika_process_query(
+    result = get_ai_engine().sika_process_query(
         query=data.query,
-        budgets=budgets,
-        goals=goals,
+        budgets=context.budgets,
+        goals=context.goals,
         total_budget=total_budget,
-        total_spent=total_spent
+        total_spent=total_spent,
+        spending=context.spending
     )
 
     return {
@@ -315,6 +522,7 @@ def sika_chat(
         "message": result["message"],
         "intent": result["intent"],
         "can_add_transaction": result["can_add_transaction"],
+        "unusual": result.get("unusual", False),
         "suggested_transaction": result["suggested_transaction"],
         "context": {
             "total_budget": total_budget,
@@ -324,25 +532,47 @@ def sika_chat(
     }
 
 
+def sika_confirmation(data: SikaConfirmTransaction, transaction: Transaction, budget) -> dict:
+    return {
+        "success": True,
+        "message": f"✅ J'ai enregistré ta dépense de {data.amount:,.0f} FCFA dans {data.category}.",
+        "transaction_id": transaction.id,
+        "new_budget_spent": budget.current_spent if budget else None
+    }
+
+
 @router.post("/sika/confirm")
-def sika_confirm_transaction(
+async def sika_confirm_transaction(
     data: SikaConfirmTransaction,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Confirmer et enregistrer une transaction suggérée par Sika
+
+    Avec l'en-tête Idempotency-Key, une nouvelle tentative renvoie la réponse
+    de la première sans rien réécrire.
     """
-    from ..models.transaction import Transaction
+    idempotency = idempotent_request(
+        idempotency_key, user_id, "POST /ai/sika/confirm", data.model_dump(mode="json")
+    )
+    if idempotency:
+        replay = await replay_response(db, idempotency)
+        if replay:
+            return replay
+        idempotency.render = lambda created, budget: sika_confirmation(data, created, budget)
 
     # Valider la catégorie
     try:
         category = CategoryEnum(data.category)
     except ValueError:
-        category = CategoryEnum.autre
+        category = CategoryEnum.AUTRE
 
-    # Créer la transaction
-    new_transaction = Transaction(
+    # Débiter le budget et créer la transaction en une seule transaction SQL
+    new_transaction, budget = await post_transaction(
+        db,
+        idempotency=idempotency,
         user_id=user_id,
         amount=data.amount,
         category=category,
@@ -350,23 +580,9 @@ def sika_confirm_transaction(
         transaction_type="expense",
         was_approved=True
     )
-    db.add(new_transaction)
+    if new_transaction is None:
+        # Même clé traitée en parallèle : rejouer la réponse enregistrée
+        return await replay_response(db, idempotency)
+    await invalidate_context(user_id)
 
-    # Mettre à jour le budget correspondant
-    budget = db.query(Budget).filter(
-        Budget.user_id == user_id,
-        Budget.category == category
-    ).first()
-
-    if budget:
-        budget.current_spent += data.amount
-
-    db.commit()
-    db.refresh(new_transaction)
-
-    return {
-        "success": True,
-        "message": f"✅ J'ai enregistré ta dépense de {data.amount:,.0f} FCFA dans {data.category}.",
-        "transaction_id": new_transaction.id,
-        "new_budget_spent": budget.current_spent if budget else None
-    }
+    return sika_confirmation(data, new_transaction, budget)
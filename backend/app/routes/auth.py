@@ -1,22 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from ..models.database import get_db
+from ..models.database import get_db, session_scope
 from ..models.user import User
+from ..services.passwords import HasherBusy, hash_password, verify_password
+from ..utils.cache import TTLCache
 from pydantic import BaseModel, EmailStr
 import os
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 
+# Utilisateurs authentifiés récemment, par id : évite un SELECT par requête.
+# Invalidé à chaque modification du profil ; le TTL borne la durée pendant
+# laquelle un autre worker peut servir un profil périmé.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", 60)),
+)
+
 class UserCreate(BaseModel):
     email: EmailStr
     username: str
@@ -27,11 +36,13 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def hasher_busy_exception():
+    # File bcrypt pleine : le client peut réessayer sans pénaliser les autres routes
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Trop de connexions simultanées, réessayez dans un instant",
+        headers={"Retry-After": "1"},
+    )
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -41,12 +52,17 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email déjà enregistré")
-    
-    hashed_password = get_password_hash(user.password)
+    # Rendre la connexion au pool pendant le calcul bcrypt
+    await db.rollback()
+
+    try:
+        hashed_password = await hash_password(user.password)
+    except HasherBusy:
+        raise hasher_busy_exception()
     new_user = User(
         email=user.email,
         username=user.username,
@@ -54,25 +70,53 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": new_user.email, "uid": new_user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(
+        select(User.id, User.email, User.hashed_password).where(User.email == form_data.username)
+    )).first()
+    # Rendre la connexion au pool pendant le calcul bcrypt (plusieurs centaines de ms)
+    await db.rollback()
+
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await verify_password(form_data.password, user.hashed_password)
+        except HasherBusy:
+            raise hasher_busy_exception()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect"
         )
 
-    access_token = create_access_token(data={"sub": user.email})
+    if new_hash:
+        # Hachage stocké avec un ancien coût (BCRYPT_ROUNDS a changé)
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+class Principal(BaseModel):
+    """Instantané de l'utilisateur authentifié (détaché de toute session)"""
+    id: int
+    email: str
+    username: str
+    phone: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
+
 class UserResponse(BaseModel):
     id: int
     email: str
@@ -84,7 +128,11 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Utilisateur du jeton, lu d'abord dans principal_cache : une session
+    n'est ouverte qu'en cas d'absence, pas à chaque requête authentifiée
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token invalide ou expiré",
@@ -93,36 +141,56 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    principal = principal_cache.get(user_id) if user_id is not None else None
+    if principal is None or principal.email != email:
+        async with session_scope() as db:
+            # Les jetons émis avant l'ajout de "uid" sont encore résolus par email
+            if user_id is not None:
+                user = await db.get(User, user_id)
+            else:
+                user = await db.scalar(select(User).where(User.email == email))
+        if user is None or user.email != email:
+            raise credentials_exception
+        principal = Principal.model_validate(user)
+        principal_cache.set(principal.id, principal)
+
+    if not principal.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Compte désactivé")
+    return principal
+
+
+def invalidate_principal(user_id: int):
+    """À appeler après toute modification d'un utilisateur (profil, désactivation)"""
+    principal_cache.invalidate(user_id)
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: Principal = Depends(get_current_user)):
     """Récupérer les informations de l'utilisateur connecté"""
     return current_user
 
 
 @router.put("/me", response_model=UserResponse)
-def update_me(
+async def update_me(
     username: str = None,
     phone: str = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour le profil de l'utilisateur"""
+    user = await db.get(User, current_user.id)
     if username:
-        current_user.username = username
+        user.username = username
     if phone:
-        current_user.phone = phone
+        user.phone = phone
 
-    db.commit()
-    db.refresh(current_user)
-    return current_user
\ No newline at end of file
+    await db.commit()
+    await db.refresh(user)
+    invalidate_principal(user.id)
+    return user
\ No newline at end of file
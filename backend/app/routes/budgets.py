@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from ..models.database import get_db
+from ..models.database import get_db, get_read_db
 from ..models.budget import Budget, CategoryEnum
+from ..services.aggregations import budget_totals
+from ..services.data_version import bump_data_version, conditional_get
+from ..services.context_cache import invalidate_context
+from ..services.rollover import reset_user_budgets
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/budgets", tags=["budgets"])
@@ -28,6 +34,7 @@ class BudgetResponse(BaseModel):
     remaining: float = 0.0
     usage_percentage: float = 0.0
     period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -44,61 +51,67 @@ class BudgetResponse(BaseModel):
             current_spent=budget.current_spent,
             remaining=round(remaining, 2),
             usage_percentage=round(percentage, 2),
-            period_start=budget.period_start
+            period_start=budget.period_start,
+            period_end=budget.period_end
         )
 
 
 @router.post("/", response_model=BudgetResponse)
-def create_budget(
+async def create_budget(
     budget: BudgetCreate,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer un nouveau budget pour une catégorie"""
-    # Vérifier si un budget existe déjà pour cette catégorie
-    existing = db.query(Budget).filter(
-        Budget.user_id == user_id,
-        Budget.category == budget.category
-    ).first()
-
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Un budget existe déjà pour la catégorie {budget.category.value}"
-        )
-
     new_budget = Budget(
         user_id=user_id,
         category=budget.category,
         monthly_limit=budget.monthly_limit
     )
     db.add(new_budget)
-    db.commit()
-    db.refresh(new_budget)
+
+    # L'index unique (user_id, category) garantit un seul budget par catégorie
+    try:
+        await bump_data_version(db, user_id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        existing = await db.scalar(select(Budget.id).where(
+            Budget.user_id == user_id,
+            Budget.category == budget.category
+        ))
+        if existing is None:
+            raise
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un budget existe déjà pour la catégorie {budget.category.value}"
+        )
+    await db.refresh(new_budget)
+    await invalidate_context(user_id)
 
     return BudgetResponse.from_orm_with_stats(new_budget)
 
 
-@router.get("/", response_model=List[BudgetResponse])
-def get_budgets(
+@router.get("/", response_model=List[BudgetResponse], dependencies=[Depends(conditional_get)])
+async def get_budgets(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Récupérer tous les budgets d'un utilisateur"""
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
+    budgets = (await db.scalars(select(Budget).where(Budget.user_id == user_id))).all()
     return [BudgetResponse.from_orm_with_stats(b) for b in budgets]
 
 
-@router.get("/summary")
-def get_budgets_summary(
+@router.get("/summary", dependencies=[Depends(conditional_get)])
+async def get_budgets_summary(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtenir un résumé global des budgets"""
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
+    totals = await budget_totals(db, user_id)
 
-    total_limit = sum(b.monthly_limit for b in budgets)
-    total_spent = sum(b.current_spent for b in budgets)
+    total_limit = totals["total_limit"]
+    total_spent = totals["total_spent"]
     total_remaining = total_limit - total_spent
 
     return {
@@ -106,14 +119,14 @@ def get_budgets_summary(
         "total_spent": total_spent,
         "total_remaining": total_remaining,
         "overall_usage_percentage": round((total_spent / total_limit * 100) if total_limit > 0 else 0, 2),
-        "budget_count": len(budgets)
+        "budget_count": totals["budget_count"]
     }
 
 
 @router.get("/{budget_id}", response_model=BudgetResponse)
-def get_budget(budget_id: int, db: Session = Depends(get_db)):
+async def get_budget(budget_id: int, db: AsyncSession = Depends(get_db)):
     """Récupérer un budget par son ID"""
-    budget = db.query(Budget).filter(Budget.id == budget_id).first()
+    budget = await db.get(Budget, budget_id)
     if not budget:
         raise HTTPException(status_code=404, detail="Budget non trouvé")
 
@@ -121,13 +134,13 @@ def get_budget(budget_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{budget_id}", response_model=BudgetResponse)
-def update_budget(
+async def update_budget(
     budget_id: int,
     budget_update: BudgetUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour un budget"""
-    budget = db.query(Budget).filter(Budget.id == budget_id).first()
+    budget = await db.get(Budget, budget_id)
     if not budget:
         raise HTTPException(status_code=404, detail="Budget non trouvé")
 
@@ -135,37 +148,41 @@ def update_budget(
     for key, value in update_data.items():
         setattr(budget, key, value)
 
-    db.commit()
-    db.refresh(budget)
+    await bump_data_version(db, budget.user_id)
+    await db.commit()
+    await db.refresh(budget)
+    await invalidate_context(budget.user_id)
 
     return BudgetResponse.from_orm_with_stats(budget)
 
 
 @router.delete("/{budget_id}")
-def delete_budget(budget_id: int, db: Session = Depends(get_db)):
+async def delete_budget(budget_id: int, db: AsyncSession = Depends(get_db)):
     """Supprimer un budget"""
-    budget = db.query(Budget).filter(Budget.id == budget_id).first()
+    budget = await db.get(Budget, budget_id)
     if not budget:
         raise HTTPException(status_code=404, detail="Budget non trouvé")
 
-    db.delete(budget)
-    db.commit()
+    await db.delete(budget)
+    await bump_data_version(db, budget.user_id)
+    await db.commit()
+    await invalidate_context(budget.user_id)
 
     return {"message": "Budget supprimé avec succès"}
 
 
 @router.post("/reset")
-def reset_budgets(
+async def reset_budgets(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Réinitialiser les dépenses de tous les budgets (nouveau mois)"""
-    budgets = db.query(Budget).filter(Budget.user_id == user_id).all()
-
-    for budget in budgets:
-        budget.current_spent = 0.0
-        budget.period_start = datetime.utcnow()
-
-    db.commit()
-
-    return {"message": f"{len(budgets)} budgets réinitialisés"}
\ No newline at end of file
+    """
+    Réinitialiser les dépenses de tous les budgets : la période en cours est
+    close et archivée, une nouvelle court jusqu'à la fin du mois.
+    La remise à zéro mensuelle de tous les utilisateurs est faite par
+    app.services.rollover.
+    """
+    count = await reset_user_budgets(db, user_id)
+    await invalidate_context(user_id)
+
+    return {"message": f"{count} budgets réinitialisés"}
\ No newline at end of file
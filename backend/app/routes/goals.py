@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from ..models.database import get_db
+from ..models.database import get_db, get_read_db
 from ..models.goal import Goal
+from ..services.accounting import credit_goal
+from ..services.aggregations import goal_totals
+from ..services.data_version import bump_data_version, conditional_get
+from ..services.context_cache import invalidate_context
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/goals", tags=["goals"])
@@ -71,10 +75,10 @@ class GoalResponse(BaseModel):
 
 
 @router.post("/", response_model=GoalResponse)
-def create_goal(
+async def create_goal(
     goal: GoalCreate,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer un nouvel objectif d'épargne"""
     new_goal = Goal(
@@ -87,46 +91,46 @@ def create_goal(
         color=goal.color
     )
     db.add(new_goal)
-    db.commit()
-    db.refresh(new_goal)
+    await bump_data_version(db, user_id)
+    await db.commit()
+    await db.refresh(new_goal)
+    await invalidate_context(user_id)
 
     return GoalResponse.from_orm_with_progress(new_goal)
 
 
-@router.get("/", response_model=List[GoalResponse])
-def get_goals(
+@router.get("/", response_model=List[GoalResponse], dependencies=[Depends(conditional_get)])
+async def get_goals(
     user_id: int = Query(default=1),
     include_completed: bool = Query(default=True),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Récupérer tous les objectifs d'un utilisateur"""
-    query = db.query(Goal).filter(Goal.user_id == user_id)
+    query = select(Goal).where(Goal.user_id == user_id)
 
     if not include_completed:
-        query = query.filter(Goal.is_completed == False)
+        query = query.where(Goal.is_completed == False)
 
-    goals = query.order_by(desc(Goal.created_at)).all()
+    goals = (await db.scalars(query.order_by(desc(Goal.created_at)))).all()
 
     return [GoalResponse.from_orm_with_progress(g) for g in goals]
 
 
-@router.get("/summary")
-def get_goals_summary(
+@router.get("/summary", dependencies=[Depends(conditional_get)])
+async def get_goals_summary(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtenir un résumé des objectifs"""
-    goals = db.query(Goal).filter(Goal.user_id == user_id).all()
+    totals = await goal_totals(db, user_id)
 
-    total_target = sum(g.target_amount for g in goals)
-    total_saved = sum(g.current_amount for g in goals)
-    completed_count = sum(1 for g in goals if g.is_completed)
-    in_progress_count = sum(1 for g in goals if not g.is_completed)
+    total_target = totals["total_target"]
+    total_saved = totals["total_saved"]
 
     return {
-        "total_goals": len(goals),
-        "completed": completed_count,
-        "in_progress": in_progress_count,
+        "total_goals": totals["total_goals"],
+        "completed": totals["completed"],
+        "in_progress": totals["in_progress"],
         "total_target_amount": total_target,
         "total_saved_amount": total_saved,
         "overall_progress": round((total_saved / total_target * 100) if total_target > 0 else 0, 2)
@@ -134,9 +138,9 @@ def get_goals_summary(
 
 
 @router.get("/{goal_id}", response_model=GoalResponse)
-def get_goal(goal_id: int, db: Session = Depends(get_db)):
+async def get_goal(goal_id: int, db: AsyncSession = Depends(get_db)):
     """Récupérer un objectif par son ID"""
-    goal = db.query(Goal).filter(Goal.id == goal_id).first()
+    goal = await db.get(Goal, goal_id)
     if not goal:
         raise HTTPException(status_code=404, detail="Objectif non trouvé")
 
@@ -144,13 +148,13 @@ def get_goal(goal_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{goal_id}", response_model=GoalResponse)
-def update_goal(
+async def update_goal(
     goal_id: int,
     goal_update: GoalUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour un objectif"""
-    goal = db.query(Goal).filter(Goal.id == goal_id).first()
+    goal = await db.get(Goal, goal_id)
     if not goal:
         raise HTTPException(status_code=404, detail="Objectif non trouvé")
 
@@ -162,43 +166,41 @@ def update_goal(
     if goal.current_amount >= goal.target_amount:
         goal.is_completed = True
 
-    db.commit()
-    db.refresh(goal)
+    await bump_data_version(db, goal.user_id)
+    await db.commit()
+    await db.refresh(goal)
+    await invalidate_context(goal.user_id)
 
     return GoalResponse.from_orm_with_progress(goal)
 
 
 @router.post("/{goal_id}/add", response_model=GoalResponse)
-def add_to_goal(
+async def add_to_goal(
     goal_id: int,
     data: GoalAddAmount,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Ajouter un montant à un objectif d'épargne"""
-    goal = db.query(Goal).filter(Goal.id == goal_id).first()
+    # Incrément atomique ; l'objectif est marqué atteint dans la même requête
+    goal = await credit_goal(db, goal_id, data.amount)
     if not goal:
         raise HTTPException(status_code=404, detail="Objectif non trouvé")
 
-    goal.current_amount += data.amount
-
-    # Vérifier si l'objectif est atteint
-    if goal.current_amount >= goal.target_amount:
-        goal.is_completed = True
-
-    db.commit()
-    db.refresh(goal)
+    await invalidate_context(goal.user_id)
 
     return GoalResponse.from_orm_with_progress(goal)
 
 
 @router.delete("/{goal_id}")
-def delete_goal(goal_id: int, db: Session = Depends(get_db)):
+async def delete_goal(goal_id: int, db: AsyncSession = Depends(get_db)):
     """Supprimer un objectif"""
-    goal = db.query(Goal).filter(Goal.id == goal_id).first()
+    goal = await db.get(Goal, goal_id)
     if not goal:
         raise HTTPException(status_code=404, detail="Objectif non trouvé")
 
-    db.delete(goal)
-    db.commit()
+    await db.delete(goal)
+    await bump_data_version(db, goal.user_id)
+    await db.commit()
+    await invalidate_context(goal.user_id)
 
     return {"message": "Objectif supprimé avec succès"}
@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+import asyncio
+import os
+from ..models.database import get_pool_status, get_replica_status, ping_database
+from ..services.context_cache import context_cache
+from ..services.passwords import hasher
+from .auth import principal_cache
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+# Au-delà de ce taux d'occupation du pool, le worker se déclare non prêt
+READY_MAX_SATURATION = float(os.getenv("DB_READY_MAX_SATURATION", 0.9))
+PING_TIMEOUT = float(os.getenv("DB_PING_TIMEOUT", 2))
+
+
+async def check_readiness():
+    """Vérifier la saturation du pool puis la latence d'un aller-retour en base"""
+    pool = get_pool_status()
+    report = {"pool": pool, "database": {}}
+
+    saturation = pool.get("saturation", 0.0)
+    if saturation >= READY_MAX_SATURATION:
+        # Pool épuisé : inutile d'attendre une connexion pour le ping
+        report["database"] = {"reachable": None, "error": "pool saturé"}
+        return False, report
+
+    try:
+        latency = await asyncio.wait_for(ping_database(), timeout=PING_TIMEOUT)
+    except Exception as e:
+        report["database"] = {"reachable": False, "error": type(e).__name__}
+        return False, report
+
+    report["database"] = {"reachable": True, "latency_ms": latency}
+    return True, report
+
+
+@router.get("")
+async def health_check():
+    """État complet : latence base, statistiques du pool, réplicas, caches et bcrypt"""
+    ready, report = await check_readiness()
+    # Un réplica éjecté ne rend pas le worker malade : ses lectures vont à la principale
+    report["replicas"] = get_replica_status()
+    report["caches"] = {
+        "principals": principal_cache.stats(),
+        "financial_context": context_cache.stats(),
+    }
+    report["password_hasher"] = hasher.stats()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "healthy" if ready else "unhealthy", **report}
+    )
+
+
+@router.get("/live")
+async def liveness():
+    """Le processus répond (ne touche pas la base)"""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness():
+    """Le worker peut recevoir du trafic : base joignable et pool non saturé"""
+    ready, report = await check_readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", **report}
+    )
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from ..services.metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques du worker au format texte Prometheus"""
+    return Response(registry.render(), media_type=registry.CONTENT_TYPE)
@@ -1,16 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, desc, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from ..models.database import get_db
+from ..models.database import get_db, get_read_db, read_session_scope
 from ..models.transaction import Transaction
-from ..models.budget import Budget, CategoryEnum
-from ..services.ai_engine import AIEngine
-from pydantic import BaseModel
+from ..models.budget import CategoryEnum
+from ..services.ai_engine import get_ai_engine
+from ..services.aggregations import transaction_totals
+from ..services.accounting import post_transaction, remove_transaction, amend_transaction
+from ..services.importer import TransactionImporter, iter_records
+from ..services.exporter import EXPORT_MEDIA_TYPES, export_transactions
+from ..services.data_version import conditional_get
+from ..services.context_cache import invalidate_context
+from ..services.idempotency import idempotent_request, replay_response
+from ..utils.pagination import encode_cursor, decode_cursor
+from pydantic import BaseModel, field_validator
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
-ai_engine = AIEngine()
+
+
+def score_expense(category: CategoryEnum, amount: float, monthly_limit: float, monthly_spent: float):
+    """Score IA d'une dépense, sur l'état du budget avant son débit"""
+    result = get_ai_engine().calculate_score(
+        amount=amount,
+        category=category.value,
+        budget_remaining=monthly_limit - monthly_spent,
+        monthly_spent=monthly_spent,
+        monthly_limit=monthly_limit
+    )
+    return {"ai_score": result["score"], "ai_recommendation": result["recommendation"]}
 
 
 class TransactionCreate(BaseModel):
@@ -20,12 +40,24 @@ class TransactionCreate(BaseModel):
     transaction_type: str = "expense"  # expense ou income
 
 
+class TransactionImportRow(TransactionCreate):
+    created_at: Optional[datetime] = None  # date d'origine (relevé, tableur)
+
+
 class TransactionUpdate(BaseModel):
     amount: Optional[float] = None
     category: Optional[CategoryEnum] = None
     description: Optional[str] = None
     transaction_type: Optional[str] = None
 
+    @field_validator("amount", "category", "transaction_type")
+    @classmethod
+    def not_null(cls, value):
+        # Absent : inchangé ; null explicite : colonne NOT NULL (agrégats mensuels)
+        if value is None:
+            raise ValueError("ne peut pas être null")
+        return value
+
 
 class TransactionResponse(BaseModel):
     id: int
@@ -36,6 +68,7 @@ class TransactionResponse(BaseModel):
     transaction_type: str
     ai_score: Optional[float]
     ai_recommendation: Optional[str]
+    anomaly_score: Optional[float] = None  # renseigné si la dépense est inhabituelle pour l'utilisateur
     was_approved: bool
     created_at: datetime
 
@@ -44,152 +77,212 @@ class TransactionResponse(BaseModel):
 
 
 @router.post("/", response_model=TransactionResponse)
-def create_transaction(
+async def create_transaction(
     transaction: TransactionCreate,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Créer une nouvelle transaction et mettre à jour le budget correspondant"""
-
-    # Analyser la transaction avec l'IA si c'est une dépense
-    ai_score = None
-    ai_recommendation = None
-
-    if transaction.transaction_type == "expense":
-        budget = db.query(Budget).filter(
-            Budget.user_id == user_id,
-            Budget.category == transaction.category
-        ).first()
-
-        if budget:
-            budget_remaining = budget.monthly_limit - budget.current_spent
-            result = ai_engine.calculate_score(
-                amount=transaction.amount,
-                category=transaction.category.value,
-                budget_remaining=budget_remaining,
-                monthly_spent=budget.current_spent,
-                monthly_limit=budget.monthly_limit
-            )
-            ai_score = result["score"]
-            ai_recommendation = result["recommendation"]
-
-            # Mettre à jour le budget
-            budget.current_spent += transaction.amount
-            db.commit()
-
-    # Créer la transaction
-    new_transaction = Transaction(
+    """
+    Créer une nouvelle transaction et mettre à jour le budget correspondant
+
+    Avec l'en-tête Idempotency-Key, une nouvelle tentative renvoie la réponse
+    de la première sans rien réécrire.
+    """
+    idempotency = idempotent_request(
+        idempotency_key, user_id, "POST /transactions/", transaction.model_dump(mode="json")
+    )
+    if idempotency:
+        replay = await replay_response(db, idempotency)
+        if replay:
+            return replay
+        idempotency.render = lambda created, _: TransactionResponse.model_validate(created).model_dump(mode="json")
+
+    # Débit du budget (dépense), score IA et insertion dans une seule transaction
+    new_transaction, budget = await post_transaction(
+        db,
+        scorer=score_expense,
+        idempotency=idempotency,
         user_id=user_id,
         amount=transaction.amount,
         category=transaction.category,
         description=transaction.description,
         transaction_type=transaction.transaction_type,
-        ai_score=ai_score,
-        ai_recommendation=ai_recommendation,
         was_approved=True
     )
-    db.add(new_transaction)
-    db.commit()
-    db.refresh(new_transaction)
+    if new_transaction is None:
+        # Même clé traitée en parallèle : rejouer la réponse enregistrée
+        return await replay_response(db, idempotency)
+    if new_transaction.transaction_type == "expense":
+        # Budget débité et profil de dépenses (statistiques) mis à jour
+        await invalidate_context(user_id)
 
     return new_transaction
 
 
-@router.get("/", response_model=List[TransactionResponse])
-def get_transactions(
+@router.post("/import")
+async def import_transactions(
+    request: Request,
+    user_id: int = Query(default=1),
+    format: Optional[str] = Query(default=None, pattern="^(csv|ndjson)$"),
+    score: bool = Query(default=False, description="Calculer le score IA de chaque dépense"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Importer des transactions en masse depuis le corps de la requête (CSV ou NDJSON)
+
+    Colonnes / clés : amount, category, description, transaction_type, created_at.
+    Les lignes invalides sont ignorées et listées dans le rapport d'erreurs.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            format = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            format = "ndjson"
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Format inconnu : précisez format=csv|ndjson ou le Content-Type"
+            )
+
+    importer = TransactionImporter(
+        db, user_id, TransactionImportRow, scorer=get_ai_engine() if score else None
+    )
+    await importer.load_budgets()
+
+    async for line_no, record in iter_records(request.stream(), format):
+        await importer.add(line_no, record)
+
+    report = await importer.finish()
+    if report["expenses_by_category"]:
+        await invalidate_context(user_id)
+    return report
+
+
+@router.get("/", response_model=List[TransactionResponse], dependencies=[Depends(conditional_get)])
+async def get_transactions(
+    response: Response,
     user_id: int = Query(default=1),
     category: Optional[CategoryEnum] = None,
     transaction_type: Optional[str] = None,
     limit: int = Query(default=50, le=100),
     offset: int = Query(default=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(default=None, description="Valeur de X-Next-Cursor de la page précédente"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Récupérer toutes les transactions d'un utilisateur avec filtres optionnels"""
-    query = db.query(Transaction).filter(Transaction.user_id == user_id)
+    """
+    Récupérer toutes les transactions d'un utilisateur avec filtres optionnels
+
+    Pagination par offset (limit/offset) ou par curseur : si la page est
+    pleine, l'en-tête X-Next-Cursor contient le curseur de la page suivante.
+    Le curseur évite de parcourir toutes les lignes des pages précédentes.
+    """
+    query = select(Transaction).where(Transaction.user_id == user_id)
 
     if category:
-        query = query.filter(Transaction.category == category)
+        query = query.where(Transaction.category == category)
     if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
-
-    transactions = query.order_by(desc(Transaction.created_at)).offset(offset).limit(limit).all()
+        query = query.where(Transaction.transaction_type == transaction_type)
+
+    if cursor:
+        if offset:
+            raise HTTPException(status_code=400, detail="Utilisez soit cursor, soit offset")
+        try:
+            last_created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+        query = query.where(tuple_(Transaction.created_at, Transaction.id) < (last_created_at, last_id))
+
+    transactions = (await db.scalars(
+        query.order_by(desc(Transaction.created_at), desc(Transaction.id)).offset(offset).limit(limit)
+    )).all()
+
+    if len(transactions) == limit:
+        last = transactions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     return transactions
 
 
-@router.get("/summary")
-def get_transactions_summary(
+@router.get("/summary", dependencies=[Depends(conditional_get)])
+async def get_transactions_summary(
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtenir un résumé des transactions (total dépenses, revenus, etc.)"""
-    transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
-
-    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
-    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
-
-    # Répartition par catégorie
-    by_category = {}
-    for t in transactions:
-        if t.transaction_type == "expense":
-            cat = t.category.value
-            by_category[cat] = by_category.get(cat, 0) + t.amount
+    totals = await transaction_totals(db, user_id)
 
     return {
-        "total_expenses": total_expenses,
-        "total_income": total_income,
-        "balance": total_income - total_expenses,
-        "transaction_count": len(transactions),
-        "by_category": by_category
+        "total_expenses": totals["total_expenses"],
+        "total_income": totals["total_income"],
+        "balance": totals["total_income"] - totals["total_expenses"],
+        "transaction_count": totals["transaction_count"],
+        "by_category": totals["by_category"]
     }
 
 
+@router.get("/export")
+async def export_transactions_history(
+    user_id: int = Query(default=1),
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = Query(default=None, description="Date de début (incluse)"),
+    end: Optional[datetime] = Query(default=None, description="Date de fin (exclue)"),
+    category: Optional[CategoryEnum] = None,
+):
+    """
+    Exporter l'historique des transactions en CSV ou NDJSON
+
+    Les lignes sont lues par un curseur côté serveur et envoyées au fur et à
+    mesure : la mémoire utilisée ne dépend pas de la taille de l'historique.
+    """
+    async def content():
+        # Session propre au flux : elle reste ouverte jusqu'au dernier octet
+        async with read_session_scope(user_id) as db:
+            async for chunk in export_transactions(db, user_id, format, start, end, category):
+                yield chunk
+
+    return StreamingResponse(
+        content(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    )
+
+
 @router.get("/{transaction_id}", response_model=TransactionResponse)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
+async def get_transaction(transaction_id: int, db: AsyncSession = Depends(get_db)):
     """Récupérer une transaction par son ID"""
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = await db.get(Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée")
     return transaction
 
 
 @router.put("/{transaction_id}", response_model=TransactionResponse)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction_update: TransactionUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour une transaction"""
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    # Agrégats, statistiques, version des données et commit en un seul appel
+    transaction, expense = await amend_transaction(
+        db, transaction_id, transaction_update.model_dump(exclude_unset=True)
+    )
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée")
-
-    # Mettre à jour les champs fournis
-    update_data = transaction_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(transaction, key, value)
-
-    db.commit()
-    db.refresh(transaction)
+    if expense:
+        await invalidate_context(transaction.user_id)
     return transaction
 
 
 @router.delete("/{transaction_id}")
-def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
+async def delete_transaction(transaction_id: int, db: AsyncSession = Depends(get_db)):
     """Supprimer une transaction"""
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    # Si c'était une dépense, le montant est remis dans le budget
+    transaction, refunded = await remove_transaction(db, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée")
-
-    # Si c'était une dépense, remettre le montant dans le budget
     if transaction.transaction_type == "expense":
-        budget = db.query(Budget).filter(
-            Budget.user_id == transaction.user_id,
-            Budget.category == transaction.category
-        ).first()
-        if budget:
-            budget.current_spent = max(0, budget.current_spent - transaction.amount)
-
-    db.delete(transaction)
-    db.commit()
+        await invalidate_context(transaction.user_id)
 
     return {"message": "Transaction supprimée avec succès"}
@@ -0,0 +1,202 @@
+"""
+Écritures comptables atomiques sur les budgets, objectifs et transactions.
+
+Les montants sont modifiés par `UPDATE ... SET x = x + :montant RETURNING` :
+pas de lecture préalable, donc pas de mise à jour perdue entre deux requêtes
+simultanées du même utilisateur.
+
+Chaque écriture (débit, insertion ou modification, agrégat mensuel, version
+des données, commit) s'exécute en un seul appel `run_sync` : une
+transaction SQL, et en mode synchrone un seul passage dans le threadpool. Les verrous de ligne ne
+sont donc jamais gardés pendant que la requête attend un thread ; sinon,
+sous forte concurrence, les threads bloqués sur ces verrous ou sur le pool
+empêchent le détenteur du verrou de finir.
+
+Le nombre de requêtes ne baisse pas : une dépense avec budget en exécute
+six (débit, statistiques et esquisse de la catégorie, insertion, agrégat
+mensuel, version), autant que l'ancienne lecture-modification-écriture.
+Le gain est l'exactitude sous concurrence, pas les allers-retours.
+
+Une dépense met aussi à jour les statistiques de sa catégorie et reçoit son
+score d'anomalie (voir anomalies) dans cette transaction.
+
+Avec une clé d'idempotence, la réponse est enregistrée dans cette même
+transaction ; si la clé est déjà prise, tout est annulé (voir idempotency).
+"""
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import Float, Row, case, cast, delete, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.budget import Budget, CategoryEnum
+from ..models.goal import Goal
+from ..models.transaction import Transaction
+from .anomalies import forget_expense, record_expense, restate_expense
+from .data_version import bump_statement
+from .idempotency import IdempotentRequest, store_statement
+from .rollups import bucket_of, recompute_buckets_sync, transaction_rollup
+
+# (catégorie, montant, plafond, dépensé avant) -> colonnes ai_score / ai_recommendation
+Scorer = Callable[[CategoryEnum, float, float, float], Dict[str, object]]
+
+
+def charge_statement(user_id: int, category: CategoryEnum, amount: float):
+    """Débit du budget ; RETURNING (monthly_limit, current_spent) après débit"""
+    return (
+        update(Budget)
+        .where(Budget.user_id == user_id, Budget.category == category)
+        .values(current_spent=func.coalesce(Budget.current_spent, 0.0) + amount)
+        # SQLite renvoie un REAL sans décimale comme entier dans RETURNING
+        .returning(
+            cast(Budget.monthly_limit, Float).label("monthly_limit"),
+            cast(Budget.current_spent, Float).label("current_spent"),
+        )
+    )
+
+
+def refund_statement(user_id: int, category: CategoryEnum, amount: float):
+    """Recrédit du budget, sans passer sous zéro"""
+    spent = func.coalesce(Budget.current_spent, 0.0)
+    return (
+        update(Budget)
+        .where(Budget.user_id == user_id, Budget.category == category)
+        .values(current_spent=case((spent > amount, spent - amount), else_=0.0))
+        .returning(Budget.id)
+    )
+
+
+def _post_transaction(
+    session: Session, values: Dict[str, object], scorer: Optional[Scorer],
+    idempotency: Optional[IdempotentRequest]
+) -> Tuple[Optional[Transaction], Optional[Row]]:
+    budget = None
+    if values.get("transaction_type", "expense") == "expense":
+        budget = session.execute(
+            charge_statement(values["user_id"], values["category"], values["amount"])
+        ).first()
+        if budget and scorer:
+            # Score calculé sur l'état du budget juste avant ce débit
+            values = {**values, **scorer(
+                values["category"], values["amount"],
+                budget.monthly_limit, budget.current_spent - values["amount"]
+            )}
+        values = {**values, "anomaly_score": record_expense(
+            session, values["user_id"], values["category"], values["amount"]
+        )}
+
+    transaction = session.scalar(insert(Transaction).values(**values).returning(Transaction))
+    session.execute(transaction_rollup(transaction))
+    session.execute(bump_statement(transaction.user_id))
+    if idempotency is not None:
+        body = idempotency.render(transaction, budget)
+        if session.scalar(store_statement(idempotency, body)) is None:
+            # Même clé enregistrée entre-temps par une requête concurrente
+            session.rollback()
+            return None, None
+    session.commit()
+    return transaction, budget
+
+
+async def post_transaction(
+    db: AsyncSession,
+    scorer: Optional[Scorer] = None,
+    idempotency: Optional[IdempotentRequest] = None,
+    **values
+) -> Tuple[Optional[Transaction], Optional[Row]]:
+    """
+    Enregistrer une transaction et, pour une dépense, débiter le budget de sa
+    catégorie ; renvoie la transaction et le budget après débit (ou None).
+
+    Renvoie (None, None) si la clé d'idempotence a été enregistrée par une
+    requête concurrente : rien n'est écrit, rejouer sa réponse.
+    """
+    return await db.run_sync(_post_transaction, values, scorer, idempotency)
+
+
+def _remove_transaction(session: Session, transaction_id: int) -> Tuple[Optional[Transaction], bool]:
+    transaction = session.scalar(
+        delete(Transaction)
+        .where(Transaction.id == transaction_id)
+        .returning(Transaction)
+        .execution_options(synchronize_session=False)
+    )
+    if transaction is None:
+        return None, False
+
+    refunded = False
+    if transaction.transaction_type == "expense":
+        refunded = session.execute(
+            refund_statement(transaction.user_id, transaction.category, transaction.amount)
+        ).first() is not None
+        forget_expense(session, transaction.user_id, transaction.category, transaction.amount)
+    recompute_buckets_sync(session, [bucket_of(transaction)])
+    session.execute(bump_statement(transaction.user_id))
+    session.commit()
+    return transaction, refunded
+
+
+async def remove_transaction(db: AsyncSession, transaction_id: int) -> Tuple[Optional[Transaction], bool]:
+    """
+    Supprimer une transaction et recréditer le budget s'il s'agissait d'une
+    dépense ; renvoie (transaction supprimée ou None, budget recrédité)
+    """
+    return await db.run_sync(_remove_transaction, transaction_id)
+
+
+def _amend_transaction(
+    session: Session, transaction_id: int, changes: Dict[str, object]
+) -> Tuple[Optional[Transaction], bool]:
+    transaction = session.get(Transaction, transaction_id)
+    if transaction is None:
+        return None, False
+
+    previous_bucket = bucket_of(transaction)
+    previous = {
+        "transaction_type": transaction.transaction_type,
+        "category": transaction.category,
+        "amount": transaction.amount,
+    }
+    for key, value in changes.items():
+        setattr(transaction, key, value)
+
+    session.flush()
+    recompute_buckets_sync(session, [previous_bucket, bucket_of(transaction)])
+    if any(getattr(transaction, key) != value for key, value in previous.items()):
+        restate_expense(session, transaction, previous)
+    session.execute(bump_statement(transaction.user_id))
+    session.commit()
+    return transaction, "expense" in (previous["transaction_type"], transaction.transaction_type)
+
+
+async def amend_transaction(
+    db: AsyncSession, transaction_id: int, changes: Dict[str, object]
+) -> Tuple[Optional[Transaction], bool]:
+    """
+    Modifier une transaction (agrégats mensuels et statistiques reportés) ;
+    renvoie (transaction modifiée ou None, dépense avant ou après)
+    """
+    return await db.run_sync(_amend_transaction, transaction_id, changes)
+
+
+def _credit_goal(session: Session, goal_id: int, amount: float) -> Optional[Goal]:
+    current = func.coalesce(Goal.current_amount, 0.0)
+    goal = session.scalar(
+        update(Goal)
+        .where(Goal.id == goal_id)
+        .values(
+            current_amount=current + amount,
+            # Les deux expressions lisent les valeurs d'avant la mise à jour
+            is_completed=case((current + amount >= Goal.target_amount, True), else_=Goal.is_completed),
+        )
+        .returning(Goal)
+        .execution_options(synchronize_session=False)
+    )
+    if goal is None:
+        return None
+    session.execute(bump_statement(goal.user_id))
+    session.commit()
+    return goal
+
+
+async def credit_goal(db: AsyncSession, goal_id: int, amount: float) -> Optional[Goal]:
+    """Ajouter un montant à un objectif et le marquer atteint le cas échéant"""
+    return await db.run_sync(_credit_goal, goal_id, amount)
@@ -0,0 +1,103 @@
+"""
+Agrégats calculés en SQL (GROUP BY / SUM / COUNT) pour les endpoints de résumé.
+
+Aucune de ces fonctions ne charge les lignes individuelles : le coût mémoire
+est borné par le nombre de catégories, quel que soit l'historique.
+"""
+from typing import Dict, Any
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.budget import Budget
+from ..models.goal import Goal
+from ..models.rollup import MonthlyRollup
+
+
+async def transaction_totals(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Totaux par type et répartition des dépenses par catégorie (depuis monthly_rollups)"""
+    rows = (await db.execute(
+        select(
+            MonthlyRollup.transaction_type,
+            MonthlyRollup.category,
+            func.sum(MonthlyRollup.total_amount),
+            func.sum(MonthlyRollup.transaction_count),
+        )
+        .where(MonthlyRollup.user_id == user_id)
+        .group_by(MonthlyRollup.transaction_type, MonthlyRollup.category)
+    )).all()
+
+    total_expenses = 0
+    total_income = 0
+    transaction_count = 0
+    by_category = {}
+    for transaction_type, category, amount, count in rows:
+        transaction_count += count
+        if transaction_type == "expense":
+            total_expenses += amount
+            by_category[category.value] = by_category.get(category.value, 0) + amount
+        elif transaction_type == "income":
+            total_income += amount
+
+    return {
+        "total_expenses": total_expenses,
+        "total_income": total_income,
+        "transaction_count": transaction_count,
+        "by_category": by_category,
+    }
+
+
+async def month_expense_totals(db: AsyncSession, user_id: int, month: str) -> Dict[str, Dict[str, float]]:
+    """Dépenses d'un mois par catégorie : total, nombre, min et max"""
+    rows = (await db.execute(
+        select(MonthlyRollup).where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.month == month,
+            MonthlyRollup.transaction_type == "expense",
+        )
+    )).scalars().all()
+
+    return {
+        r.category.value: {
+            "total": r.total_amount,
+            "count": r.transaction_count,
+            "min": r.min_amount,
+            "max": r.max_amount,
+        }
+        for r in rows
+    }
+
+
+async def budget_totals(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Somme des plafonds et des dépenses de tous les budgets"""
+    total_limit, total_spent, budget_count = (await db.execute(
+        select(
+            func.coalesce(func.sum(Budget.monthly_limit), 0),
+            func.coalesce(func.sum(Budget.current_spent), 0),
+            func.count(Budget.id),
+        ).where(Budget.user_id == user_id)
+    )).one()
+
+    return {
+        "total_limit": total_limit,
+        "total_spent": total_spent,
+        "budget_count": budget_count,
+    }
+
+
+async def goal_totals(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Nombre d'objectifs atteints / en cours et montants cumulés"""
+    total_goals, completed, total_target, total_saved = (await db.execute(
+        select(
+            func.count(Goal.id),
+            func.coalesce(func.sum(case((Goal.is_completed == True, 1), else_=0)), 0),
+            func.coalesce(func.sum(Goal.target_amount), 0),
+            func.coalesce(func.sum(Goal.current_amount), 0),
+        ).where(Goal.user_id == user_id)
+    )).one()
+
+    return {
+        "total_goals": total_goals,
+        "completed": completed,
+        "in_progress": total_goals - completed,
+        "total_target": total_target,
+        "total_saved": total_saved,
+    }
@@ -1,21 +1,25 @@
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
 import os
-import re
+from .nlu import CATEGORY_KEYWORDS, parse_amount, parse_query, voice_intent
+from .metrics import record_intent, record_score, record_scores
 
 
-# Mapping des catégories en français vers l'enum
-CATEGORY_KEYWORDS = {
-    "alimentation": ["manger", "nourriture", "repas", "restaurant", "courses", "alimentation", "bouffe", "déjeuner", "dîner", "petit-déjeuner"],
-    "transport": ["transport", "taxi", "uber", "bus", "essence", "carburant", "voiture", "moto", "déplacement", "trajet"],
-    "logement": ["loyer", "logement", "maison", "appartement", "électricité", "eau", "facture"],
-    "sante": ["santé", "médecin", "pharmacie", "médicament", "hôpital", "consultation", "ordonnance"],
-    "education": ["école", "formation", "cours", "livre", "études", "éducation", "scolarité"],
-    "loisirs": ["loisirs", "divertissement", "cinéma", "sortie", "jeux", "sport", "abonnement", "netflix"],
-    "epargne": ["épargne", "économie", "investissement", "placement"],
-    "vetements": ["vêtements", "habits", "chaussures", "mode", "shopping"],
-    "communication": ["téléphone", "internet", "forfait", "crédit", "communication", "data"],
-    "autre": ["autre", "divers", "cadeau", "don"]
-}
+# Recommandations indexées par code (0 = rouge, 1 = orange, 2 = vert)
+RECOMMENDATIONS = [
+    ("⛔ Attention ! Cette dépense risque de compromettre vos objectifs financiers.", "red"),
+    ("⚠️ Prudence recommandée. Votre budget est presque épuisé pour cette catégorie.", "orange"),
+    ("✅ Cette dépense est raisonnable par rapport à votre budget.", "green"),
+]
+
+
+def recommendation_code(score: int) -> int:
+    if score <= 3:
+        return 0
+    elif score <= 6:
+        return 1
+    return 2
 
 
 class AIEngine:
@@ -57,16 +61,8 @@ class AIEngine:
             score = 1
 
         score = max(1, min(10, score))
-
-        if score <= 3:
-            recommendation = "⛔ Attention ! Cette dépense risque de compromettre vos objectifs financiers."
-            color = "red"
-        elif score <= 6:
-            recommendation = "⚠️ Prudence recommandée. Votre budget est presque épuisé pour cette catégorie."
-            color = "orange"
-        else:
-            recommendation = "✅ Cette dépense est raisonnable par rapport à votre budget."
-            color = "green"
+        recommendation, color = RECOMMENDATIONS[recommendation_code(score)]
+        record_score(score)
 
         return {
             "score": score,
@@ -77,6 +73,46 @@ class AIEngine:
             "remaining_budget": round(budget_remaining, 2)
         }
 
+    def calculate_scores(
+        self,
+        amounts,
+        budget_remaining,
+        monthly_spent,
+        monthly_limit
+    ) -> Dict[str, np.ndarray]:
+        """
+        Version vectorisée de calculate_score pour des tableaux de transactions.
+
+        Mêmes règles, mêmes résultats élément par élément : "score" (entiers
+        de 1 à 10) et "code" (index dans RECOMMENDATIONS), plus les
+        pourcentages non arrondis.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        budget_remaining = np.asarray(budget_remaining, dtype=np.float64)
+        monthly_spent = np.asarray(monthly_spent, dtype=np.float64)
+        monthly_limit = np.asarray(monthly_limit, dtype=np.float64)
+
+        has_limit = monthly_limit > 0
+        safe_limit = np.where(has_limit, monthly_limit, 1.0)
+        budget_percentage = np.where(has_limit, (monthly_spent / safe_limit) * 100, 100.0)
+        transaction_percentage = np.where(has_limit, (amounts / safe_limit) * 100, 100.0)
+
+        score = np.full(amounts.shape, 10, dtype=np.int64)
+        score -= np.select(
+            [budget_percentage > 90, budget_percentage > 75, budget_percentage > 50], [5, 3, 1], 0
+        )
+        score -= np.select([transaction_percentage > 20, transaction_percentage > 10], [2, 1], 0)
+        score = np.where(budget_remaining < amounts, 1, score)
+        score = np.clip(score, 1, 10)
+        record_scores(score)
+
+        return {
+            "score": score,
+            "code": np.select([score <= 3, score <= 6], [0, 1], 2),
+            "budget_percentage": budget_percentage,
+            "transaction_percentage": transaction_percentage,
+        }
+
     def generate_monthly_advice(
         self,
         total_spent: float,
@@ -122,22 +158,21 @@ class AIEngine:
         goals: List
     ) -> str:
         """Traiter une requête vocale et générer une réponse contextuelle"""
-        query_lower = query.lower()
-
         # Détecter l'intention
-        if any(word in query_lower for word in ["combien", "reste", "disponible", "solde"]):
+        intent = voice_intent(query)
+        if intent == "balance":
             return self._handle_balance_query(remaining, total_budget, total_spent)
 
-        if any(word in query_lower for word in ["acheter", "dépenser", "payer", "puis-je"]):
-            return self._handle_purchase_query(query_lower, remaining, budgets)
+        if intent == "purchase":
+            return self._handle_purchase_query(parse_amount(query), remaining, budgets)
 
-        if any(word in query_lower for word in ["objectif", "épargne", "économie"]):
+        if intent == "goals":
             return self._handle_goals_query(goals)
 
-        if any(word in query_lower for word in ["budget", "catégorie"]):
+        if intent == "budget":
             return self._handle_budget_query(budgets)
 
-        if any(word in query_lower for word in ["conseil", "recommandation", "aide"]):
+        if intent == "advice":
             return self._handle_advice_query(total_spent, total_budget, remaining)
 
         # Réponse par défaut
@@ -155,28 +190,22 @@ class AIEngine:
             f"Vous avez dépensé {total_spent:,.0f} FCFA soit {usage:.0f}% de votre budget."
         )
 
-    def _handle_purchase_query(self, query: str, remaining: float, budgets: List) -> str:
+    def _handle_purchase_query(self, amount: Optional[float], remaining: float, budgets: List) -> str:
         """Gérer les questions sur les achats potentiels"""
-        # Essayer d'extraire un montant de la requête
-        amounts = re.findall(r'(\d+[\s,.]?\d*)', query.replace(' ', ''))
-        if amounts:
-            try:
-                amount = float(amounts[0].replace(',', '.').replace(' ', ''))
-                if amount <= remaining:
-                    percentage = (amount / remaining * 100)
-                    return (
-                        f"✅ Oui, vous pouvez dépenser {amount:,.0f} FCFA. "
-                        f"Cela représente {percentage:.0f}% de votre budget restant. "
-                        f"Après cet achat, il vous restera {remaining - amount:,.0f} FCFA."
-                    )
-                else:
-                    return (
-                        f"⚠️ Attention ! Vous voulez dépenser {amount:,.0f} FCFA mais "
-                        f"il ne vous reste que {remaining:,.0f} FCFA. "
-                        f"Je vous conseille de reporter cet achat ou de trouver une alternative moins chère."
-                    )
-            except ValueError:
-                pass
+        if amount is not None:
+            if amount <= remaining:
+                percentage = (amount / remaining * 100)
+                return (
+                    f"✅ Oui, vous pouvez dépenser {amount:,.0f} FCFA. "
+                    f"Cela représente {percentage:.0f}% de votre budget restant. "
+                    f"Après cet achat, il vous restera {remaining - amount:,.0f} FCFA."
+                )
+            else:
+                return (
+                    f"⚠️ Attention ! Vous voulez dépenser {amount:,.0f} FCFA mais "
+                    f"il ne vous reste que {remaining:,.0f} FCFA. "
+                    f"Je vous conseille de reporter cet achat ou de trouver une alternative moins chère."
+                )
 
         return (
             f"💰 Pour savoir si vous pouvez faire un achat, dites-moi le montant ! "
@@ -251,37 +280,11 @@ class AIEngine:
 
     def detect_category(self, text: str) -> Optional[str]:
         """Détecter la catégorie à partir du texte"""
-        text_lower = text.lower()
-        for category, keywords in CATEGORY_KEYWORDS.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return category
-        return None
+        return parse_query(text).category
 
     def extract_amount(self, text: str) -> Optional[float]:
-        """Extraire le montant d'un texte"""
-        # Patterns pour les montants: "5000", "5 000", "5000 francs", "5k", etc.
-        patterns = [
-            r'(\d+[\s]?\d*)\s*(?:francs?|fcfa|f|cfa)',
-            r'(\d+)k\b',  # 5k = 5000
-            r'(\d+[\s]?\d*)\s*(?:euros?|€)',
-            r'(\d+[\s.,]?\d*)',
-        ]
-
-        text_lower = text.lower()
-
-        for pattern in patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                try:
-                    amount_str = matches[0].replace(' ', '').replace(',', '.')
-                    amount = float(amount_str)
-                    # Si "k" était dans le pattern original
-                    if 'k' in text_lower and amount < 1000:
-                        amount *= 1000
-                    return amount
-                except ValueError:
-                    continue
-        return None
+        """Extraire le montant d'un texte : "5000", "5 000", "5.000 francs", "5k", "20 €"..."""
+        return parse_amount(text)
 
     def sika_process_query(
         self,
@@ -289,7 +292,8 @@ class AIEngine:
         budgets: List,
         goals: List,
         total_budget: float,
-        total_spent: float
+        total_spent: float,
+        spending: Optional[List] = None
     ) -> Dict[str, Any]:
         """
         Traiter une requête pour Sika et retourner une réponse structurée
@@ -299,6 +303,7 @@ class AIEngine:
                 "message": str,           # Message de Sika
                 "intent": str,            # intention détectée
                 "can_add_transaction": bool,  # Si on peut proposer d'ajouter une transaction
+                "unusual": bool,          # Dépense inhabituelle pour l'utilisateur (profils `spending`)
                 "suggested_transaction": {    # Transaction suggérée (si applicable)
                     "amount": float,
                     "category": str,
@@ -307,37 +312,35 @@ class AIEngine:
                 }
             }
         """
-        query_lower = query.lower()
-        remaining = total_budget - total_spent
+        answer = self._sika_answer(query, budgets, goals, total_budget, total_spent, spending or [])
+        record_intent(answer["intent"])
+        return answer
 
-        # Extraire les informations de la requête
-        amount = self.extract_amount(query)
-        category = self.detect_category(query)
-
-        # Détecter l'intention
-        is_expense_query = any(word in query_lower for word in [
-            "acheter", "dépenser", "payer", "prendre", "commander",
-            "je veux", "je voudrais", "puis-je", "est-ce que je peux",
-            "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris"
-        ])
-
-        is_past_expense = any(word in query_lower for word in [
-            "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris",
-            "je viens de", "j'ai fait"
-        ])
+    def _sika_answer(
+        self,
+        query: str,
+        budgets: List,
+        goals: List,
+        total_budget: float,
+        total_spent: float,
+        spending: Sequence = ()
+    ) -> Dict[str, Any]:
+        remaining = total_budget - total_spent
 
-        is_balance_query = any(word in query_lower for word in [
-            "combien", "reste", "disponible", "solde", "budget"
-        ])
+        # Montant, catégorie et intentions de la requête
+        parsed = parse_query(query)
+        amount = parsed.amount
+        category = parsed.category
 
-        is_advice_query = any(word in query_lower for word in [
-            "conseil", "aide", "recommandation", "que faire"
-        ])
+        is_expense_query = parsed.has("sika:expense")
+        is_past_expense = parsed.has("sika:past_expense")
+        is_balance_query = parsed.has("sika:balance")
+        is_advice_query = parsed.has("sika:advice")
 
         # Traiter selon l'intention
         if is_expense_query and amount:
             return self._sika_handle_expense(
-                amount, category, remaining, budgets, is_past_expense, query
+                amount, category, remaining, budgets, is_past_expense, query, spending
             )
         elif is_balance_query:
             return self._sika_handle_balance(remaining, total_budget, total_spent, budgets)
@@ -363,7 +366,8 @@ class AIEngine:
         remaining: float,
         budgets: List,
         is_past: bool,
-        original_query: str
+        original_query: str,
+        spending: Sequence = ()
     ) -> Dict[str, Any]:
         """Gérer une requête de dépense"""
 
@@ -388,6 +392,11 @@ class AIEngine:
         else:
             score = 7 if amount <= remaining * 0.3 else 5 if amount <= remaining else 2
 
+        # Dépense inhabituelle pour cet utilisateur : profil de la catégorie, sans requête
+        profile = next((p for p in spending if p.category.value == category), None)
+        unusual = profile is not None and profile.anomaly_score(amount) is not None
+        note = f" (Inhabituel pour toi : d'habitude ~{profile.median:,.0f} FCFA en {category}.)" if unusual else ""
+
         # Générer le message de Sika
         if is_past:
             # Dépense déjà effectuée
@@ -409,9 +418,10 @@ class AIEngine:
                 )
 
             return {
-                "message": message,
+                "message": message + note,
                 "intent": "expense_past",
                 "can_add_transaction": True,
+                "unusual": unusual,
                 "suggested_transaction": {
                     "amount": amount,
                     "category": category,
@@ -451,9 +461,10 @@ class AIEngine:
                 can_add = True
 
             return {
-                "message": message,
+                "message": message + note,
                 "intent": "expense_future",
                 "can_add_transaction": can_add,
+                "unusual": unusual,
                 "suggested_transaction": {
                     "amount": amount,
                     "category": category,
@@ -543,3 +554,9 @@ class AIEngine:
             "can_add_transaction": False,
             "suggested_transaction": None
         }
+
+
+@lru_cache(maxsize=None)
+def get_ai_engine() -> AIEngine:
+    """Moteur partagé par les routes, créé au premier appel"""
+    return AIEngine()
@@ -0,0 +1,301 @@
+"""
+Dépenses inhabituelles : statistiques courantes par utilisateur et catégorie.
+
+Chaque dépense écrite met à jour, dans la transaction SQL de son écriture
+(accounting), deux structures compactes :
+- spending_stats : effectif, moyenne et m2 (Welford), fusionnés par un
+  upsert qui renvoie l'état après mise à jour ; l'état d'avant s'en déduit,
+  sans lecture préalable ni mise à jour perdue ;
+- spending_sketch_buckets : esquisse de quantiles (app.utils.stats), un
+  compteur par compartiment logarithmique.
+La détection ne relit donc jamais l'historique. Une dépense est inhabituelle
+si, avec au moins ANOMALY_MIN_COUNT dépenses passées dans la catégorie :
+- elle est à ANOMALY_Z_SCORE écarts types ou plus au-dessus de la moyenne ;
+- au plus ANOMALY_TAIL des dépenses passées tombent dans son compartiment
+  ou au-dessus (requête supplémentaire, seulement si le premier test passe).
+Son écart (en écarts types) est gardé dans transactions.anomaly_score.
+
+Sika juge une dépense envisagée sur les profils du contexte en cache
+(SpendingProfile), sans requête.
+
+Reconstruction (après la migration 0005 ou un import hors API) :
+
+    python -m app.services.anomalies [--user-id ID]
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional
+from pydantic import BaseModel
+from sqlalchemy import Float, case, cast, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.budget import CategoryEnum
+from ..models.database import dialect_name
+from ..models.spending_stats import SpendingSketchBucket, SpendingStats
+from ..models.transaction import Transaction
+from ..utils.stats import RunningStats, sketch_bucket, sketch_quantiles
+import os
+
+ANOMALY_MIN_COUNT = int(os.getenv("ANOMALY_MIN_COUNT", 10))
+# Les montants ont une queue lourde (log-normale) : 3 écarts types donnent trop d'alertes
+ANOMALY_Z_SCORE = float(os.getenv("ANOMALY_Z_SCORE", 4.0))
+ANOMALY_TAIL = float(os.getenv("ANOMALY_TAIL", 0.01))
+ANOMALY_RECENT_DAYS = int(os.getenv("ANOMALY_RECENT_DAYS", 30))
+ANOMALY_RECENT_LIMIT = int(os.getenv("ANOMALY_RECENT_LIMIT", 5))
+
+
+def deviation(stats: RunningStats, amount: float) -> Optional[float]:
+    """Écart à la moyenne (en écarts types) s'il atteint le seuil, sinon None"""
+    if stats.count < ANOMALY_MIN_COUNT:
+        return None
+    score = stats.z_score(amount)
+    return round(score, 2) if score >= ANOMALY_Z_SCORE else None
+
+
+def tail_bucket(buckets: Dict[int, int], share: float = ANOMALY_TAIL) -> int:
+    """
+    Plus petit compartiment b tel qu'au plus `share` des montants soient dans
+    b ou au-dessus (un de plus que le dernier si même lui est trop peuplé)
+    """
+    total = sum(buckets.values())
+    bucket, above = max(buckets, default=0) + 1, 0
+    for candidate in sorted(buckets, reverse=True):
+        above += buckets[candidate]
+        if above > share * total:
+            break
+        bucket = candidate
+    return bucket
+
+
+class SpendingProfile(BaseModel):
+    """Dépenses habituelles d'une catégorie, pour juger une dépense sans requête"""
+    category: CategoryEnum
+    count: int
+    mean: float
+    m2: float
+    median: float
+    tail_bucket: int
+
+    @property
+    def stats(self) -> RunningStats:
+        return RunningStats(self.count, self.mean, self.m2)
+
+    def anomaly_score(self, amount: float) -> Optional[float]:
+        """Même règle qu'à l'écriture (record_expense)"""
+        if sketch_bucket(amount) < self.tail_bucket:
+            return None
+        return deviation(self.stats, amount)
+
+
+def _insert(table):
+    return (postgresql if dialect_name() == "postgresql" else sqlite).insert(table)
+
+
+def stats_upsert(user_id: int, category: CategoryEnum, stats: RunningStats):
+    """
+    Fusionner une série (Chan et al.) dans les statistiques de la catégorie ;
+    RETURNING (count, mean, m2) après fusion
+    """
+    table = SpendingStats.__table__
+    stmt = _insert(table).values(
+        user_id=user_id, category=category, count=stats.count, mean=stats.mean, m2=stats.m2
+    )
+    added = stmt.excluded
+    total = table.c.count + added.count
+    delta = added.mean - table.c.mean
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "category"],
+        set_={
+            # Toutes les expressions lisent les valeurs d'avant la mise à jour
+            "count": total,
+            "mean": table.c.mean + delta * added.count / total,
+            "m2": table.c.m2 + added.m2 + delta * delta * table.c.count * added.count / total,
+        }
+    ).returning(
+        table.c.count,
+        # SQLite renvoie un REAL sans décimale comme entier dans RETURNING
+        cast(table.c.mean, Float).label("mean"),
+        cast(table.c.m2, Float).label("m2"),
+    )
+
+
+def buckets_upsert():
+    """Ajout aux compteurs de l'esquisse (executemany sur user_id, category, bucket, count)"""
+    table = SpendingSketchBucket.__table__
+    stmt = _insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "category", "bucket"],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+
+
+def bucket_rows(user_id: int, category: CategoryEnum, counts: Dict[int, int]) -> List[Dict[str, object]]:
+    return [
+        {"user_id": user_id, "category": category, "bucket": bucket, "count": count}
+        for bucket, count in counts.items()
+    ]
+
+
+def record_expense(session: Session, user_id: int, category: CategoryEnum, amount: float) -> Optional[float]:
+    """
+    Ajouter une dépense aux statistiques de sa catégorie ; renvoie son score
+    d'anomalie (None si elle est habituelle), jugé sur les dépenses d'avant.
+    Version synchrone, dans la transaction de l'écriture (run_sync).
+    """
+    after = session.execute(stats_upsert(user_id, category, RunningStats(1, amount, 0.0))).one()
+    bucket = sketch_bucket(amount)
+    session.execute(buckets_upsert(), bucket_rows(user_id, category, {bucket: 1}))
+
+    score = deviation(RunningStats(after.count, after.mean, after.m2).without(amount), amount)
+    if score is None:
+        return None
+    # Dépenses passées dans ce compartiment ou au-dessus (celle-ci exclue)
+    above = session.scalar(
+        select(func.coalesce(func.sum(SpendingSketchBucket.count), 0)).where(
+            SpendingSketchBucket.user_id == user_id,
+            SpendingSketchBucket.category == category,
+            SpendingSketchBucket.bucket >= bucket,
+        )
+    ) - 1
+    return score if above <= ANOMALY_TAIL * (after.count - 1) else None
+
+
+def forget_expense(session: Session, user_id: int, category: CategoryEnum, amount: float):
+    """Retirer une dépense supprimée ou modifiée des statistiques (inverse de Welford)"""
+    count, mean = SpendingStats.count, SpendingStats.mean
+    remaining = (count * mean - amount) / (count - 1)
+    m2 = SpendingStats.m2 - (amount - remaining) * (amount - mean)
+    session.execute(
+        update(SpendingStats)
+        .where(SpendingStats.user_id == user_id, SpendingStats.category == category)
+        .values(
+            count=case((count > 1, count - 1), else_=0),
+            mean=case((count > 1, remaining), else_=0.0),
+            # CASE évalue ses conditions dans l'ordre : pas de division par zéro
+            m2=case((count <= 1, 0.0), (m2 > 0, m2), else_=0.0),
+        )
+    )
+    located = (
+        SpendingSketchBucket.user_id == user_id,
+        SpendingSketchBucket.category == category,
+        SpendingSketchBucket.bucket == sketch_bucket(amount),
+    )
+    session.execute(update(SpendingSketchBucket).where(*located).values(count=SpendingSketchBucket.count - 1))
+    session.execute(delete(SpendingSketchBucket).where(*located, SpendingSketchBucket.count <= 0))
+
+
+def restate_expense(session: Session, transaction: Transaction, previous: Dict[str, object]):
+    """
+    Reporter la modification d'une transaction (flushée) dans les statistiques
+    et rejuger son score ; `previous` : type, catégorie et montant d'avant
+    """
+    if previous["transaction_type"] == "expense":
+        forget_expense(session, transaction.user_id, previous["category"], previous["amount"])
+    transaction.anomaly_score = None
+    if transaction.transaction_type == "expense":
+        transaction.anomaly_score = record_expense(
+            session, transaction.user_id, transaction.category, transaction.amount
+        )
+
+
+def profiles_from_rows(stats_rows, sketch_rows) -> List[SpendingProfile]:
+    sketches: Dict[CategoryEnum, Dict[int, int]] = {}
+    for category, bucket, count in sketch_rows:
+        sketches.setdefault(category, {})[bucket] = count
+    profiles = []
+    for category, count, mean, m2 in stats_rows:
+        sketch = sketches.get(category, {})
+        profiles.append(SpendingProfile(
+            category=category,
+            count=count,
+            mean=mean,
+            m2=m2,
+            median=sketch_quantiles(sketch.items(), [0.5])[0],
+            tail_bucket=tail_bucket(sketch),
+        ))
+    return profiles
+
+
+async def load_profiles(db: AsyncSession, user_id: int) -> List[SpendingProfile]:
+    """Profils des catégories ayant des dépenses (deux lectures par clé primaire)"""
+    stats_rows = (await db.execute(
+        select(SpendingStats.category, SpendingStats.count, SpendingStats.mean, SpendingStats.m2)
+        .where(SpendingStats.user_id == user_id, SpendingStats.count > 0)
+    )).all()
+    if not stats_rows:
+        return []
+    sketch_rows = (await db.execute(
+        select(SpendingSketchBucket.category, SpendingSketchBucket.bucket, SpendingSketchBucket.count)
+        .where(SpendingSketchBucket.user_id == user_id)
+    )).all()
+    return profiles_from_rows(stats_rows, sketch_rows)
+
+
+async def recent_outliers(db: AsyncSession, user_id: int, days: int = ANOMALY_RECENT_DAYS,
+                          limit: int = ANOMALY_RECENT_LIMIT) -> List[Transaction]:
+    """Dépenses signalées des `days` derniers jours, les plus récentes d'abord"""
+    return (await db.scalars(
+        select(Transaction)
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.created_at >= datetime.utcnow() - timedelta(days=days),
+            Transaction.anomaly_score.isnot(None),
+        )
+        .order_by(Transaction.created_at.desc())
+        .limit(limit)
+    )).all()
+
+
+def merge_series(session, user_id: int, category: CategoryEnum, amounts: Iterable[float]):
+    """Fusionner une série de dépenses (import, reconstruction) : deux requêtes par catégorie"""
+    stats = RunningStats()
+    counts: Dict[int, int] = {}
+    for amount in amounts:
+        stats.add(amount)
+        bucket = sketch_bucket(amount)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    if stats.count:
+        session.execute(stats_upsert(user_id, category, stats))
+        session.execute(buckets_upsert(), bucket_rows(user_id, category, counts))
+
+
+def rebuild_spending_stats(connection, user_id: Optional[int] = None) -> int:
+    """
+    Reconstruire statistiques et esquisses à partir des dépenses, lues en
+    flux par (utilisateur, catégorie) ; renvoie le nombre de séries
+    """
+    clear_stats, clear_buckets = delete(SpendingStats), delete(SpendingSketchBucket)
+    source = (
+        select(Transaction.user_id, Transaction.category, Transaction.amount)
+        .where(func.coalesce(Transaction.transaction_type, "expense") == "expense")
+        .order_by(Transaction.user_id, Transaction.category)
+    )
+    if user_id is not None:
+        clear_stats = clear_stats.where(SpendingStats.user_id == user_id)
+        clear_buckets = clear_buckets.where(SpendingSketchBucket.user_id == user_id)
+        source = source.where(Transaction.user_id == user_id)
+
+    connection.execute(clear_stats)
+    connection.execute(clear_buckets)
+    series = 0
+    rows = connection.execution_options(yield_per=10000).execute(source)
+    for (owner, category), group in groupby(rows, key=lambda row: (row.user_id, row.category)):
+        merge_series(connection, owner, category, (row.amount for row in group))
+        series += 1
+    return series
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconstruire spending_stats et spending_sketch_buckets")
+    parser.add_argument("--user-id", type=int, default=None, help="limiter à un utilisateur")
+    args = parser.parse_args()
+
+    from ..models.database import get_engine
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        count = rebuild_spending_stats(conn, args.user_id)
+    print(f"{count} séries (utilisateur, catégorie) reconstruites")
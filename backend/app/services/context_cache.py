@@ -0,0 +1,225 @@
+"""
+Contexte financier d'un utilisateur (budgets, objectifs en cours, totaux,
+dépenses habituelles par catégorie) mis en cache pour les endpoints /ai.
+
+Une conversation avec Sika relit les mêmes budgets et objectifs à chaque
+message ; l'instantané est donc gardé CONTEXT_CACHE_TTL secondes et
+invalidé par toute écriture qui modifie un budget ou un objectif.
+
+Backends (CONTEXT_CACHE_BACKEND) :
+- "memory" (défaut) : LRU + TTL dans le processus ;
+- "redis" : partagé entre workers via CONTEXT_CACHE_URL
+  (redis://localhost:6379/0, paquet `redis` requis) ;
+- "none" : pas de cache.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.budget import Budget, CategoryEnum
+from ..models.goal import Goal
+from ..utils.cache import TTLCache
+from .anomalies import SpendingProfile, load_profiles
+import os
+
+CONTEXT_CACHE_BACKEND = os.getenv("CONTEXT_CACHE_BACKEND", "memory").lower()
+CONTEXT_CACHE_URL = os.getenv("CONTEXT_CACHE_URL", "redis://localhost:6379/0")
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", 30))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", 10000))
+
+
+class BudgetSnapshot(BaseModel):
+    id: int
+    category: CategoryEnum
+    monthly_limit: float
+    current_spent: float
+    period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class GoalSnapshot(BaseModel):
+    id: int
+    name: str
+    target_amount: float
+    current_amount: float
+    target_date: Optional[datetime] = None
+    is_completed: bool
+
+    class Config:
+        from_attributes = True
+
+
+class FinancialContext(BaseModel):
+    user_id: int
+    budgets: List[BudgetSnapshot]
+    goals: List[GoalSnapshot]  # objectifs en cours uniquement
+    total_budget: float
+    total_spent: float
+    spending: List[SpendingProfile] = []  # catégories ayant des dépenses
+
+    @property
+    def remaining(self) -> float:
+        return self.total_budget - self.total_spent
+
+    def budget_for(self, category: str) -> Optional[BudgetSnapshot]:
+        return next((b for b in self.budgets if b.category.value == category), None)
+
+    def profile_for(self, category: str) -> Optional[SpendingProfile]:
+        return next((p for p in self.spending if p.category.value == category), None)
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, user_id: int) -> Optional[FinancialContext]:
+        return self.cache.get(user_id)
+
+    async def set(self, context: FinancialContext):
+        self.cache.set(context.user_id, context)
+
+    async def delete(self, user_id: int):
+        self.cache.invalidate(user_id)
+
+    async def clear(self):
+        self.cache.clear()
+
+
+class RedisBackend:
+    """Instantanés sérialisés en JSON, expirés par Redis"""
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "CONTEXT_CACHE_BACKEND=redis nécessite le paquet `redis` (pip install redis)"
+            ) from exc
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"gertonargent:context:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[FinancialContext]:
+        raw = await self.client.get(self.key(user_id))
+        return FinancialContext.model_validate_json(raw) if raw else None
+
+    async def set(self, context: FinancialContext):
+        await self.client.set(
+            self.key(context.user_id), context.model_dump_json(), px=int(self.ttl * 1000)
+        )
+
+    async def delete(self, user_id: int):
+        await self.client.delete(self.key(user_id))
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.key("*"), count=1000)]
+        for start in range(0, len(keys), 1000):
+            await self.client.delete(*keys[start:start + 1000])
+
+
+class ContextCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+        # Générations locales : un instantané lu avant une invalidation n'est
+        # pas remis en cache après elle. Une génération ne sert que le temps
+        # d'un chargement : bornée en taille comme les instantanés, elle vit
+        # au moins aussi longtemps qu'eux ; une entrée perdue se lit 0, qui
+        # diffère de toute génération invalidée
+        self._generations = TTLCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+        self._epoch = 0  # invalidations globales
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession, user_id: int) -> FinancialContext:
+        if self.backend is not None:
+            context = await self.backend.get(user_id)
+            if context is not None:
+                self.hits += 1
+                return context
+        self.misses += 1
+
+        generation = self._generation(user_id)
+        context = await load_context(db, user_id)
+        if self.backend is not None and self._generation(user_id) == generation:
+            await self.backend.set(context)
+        return context
+
+    def _generation(self, user_id: int) -> tuple:
+        return self._epoch, self._generations.get(user_id) or 0
+
+    async def invalidate(self, user_id: int):
+        self._generations.set(user_id, (self._generations.get(user_id) or 0) + 1)
+        self.invalidations += 1
+        if self.backend is not None:
+            await self.backend.delete(user_id)
+
+    async def invalidate_all(self):
+        self._epoch += 1
+        self.invalidations += 1
+        if self.backend is not None:
+            await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "ttl_s": CONTEXT_CACHE_TTL,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+async def load_context(db: AsyncSession, user_id: int) -> FinancialContext:
+    budgets = (await db.scalars(select(Budget).where(Budget.user_id == user_id))).all()
+    goals = (await db.scalars(select(Goal).where(
+        Goal.user_id == user_id,
+        Goal.is_completed == False
+    ))).all()
+    return FinancialContext(
+        user_id=user_id,
+        budgets=[BudgetSnapshot.model_validate(b) for b in budgets],
+        goals=[GoalSnapshot.model_validate(g) for g in goals],
+        total_budget=sum(b.monthly_limit for b in budgets),
+        total_spent=sum(b.current_spent for b in budgets),
+        spending=await load_profiles(db, user_id),
+    )
+
+
+def create_backend(name: str):
+    if name == "none":
+        return None
+    if name == "redis":
+        return RedisBackend(CONTEXT_CACHE_URL, CONTEXT_CACHE_TTL)
+    return MemoryBackend(CONTEXT_CACHE_SIZE, CONTEXT_CACHE_TTL)
+
+
+context_cache = ContextCache(create_backend(CONTEXT_CACHE_BACKEND))
+
+
+async def get_financial_context(db: AsyncSession, user_id: int) -> FinancialContext:
+    """Instantané en cache, ou relu en base"""
+    return await context_cache.get(db, user_id)
+
+
+async def invalidate_context(user_id: int):
+    """À appeler après le commit de toute écriture sur les budgets, objectifs ou dépenses"""
+    await context_cache.invalidate(user_id)
+
+
+async def invalidate_all_contexts():
+    """
+    Après une écriture en masse (remise à zéro mensuelle) ; avec le backend
+    "memory", les autres workers gardent leurs instantanés au plus
+    CONTEXT_CACHE_TTL secondes
+    """
+    await context_cache.invalidate_all()
@@ -0,0 +1,103 @@
+"""
+Version des données par utilisateur et GET conditionnels (ETag / If-None-Match).
+
+Chaque route d'écriture appelle bump_data_version dans sa transaction, avant
+le commit : la version change donc exactement quand les données changent.
+
+Les GET de liste et de résumé déclarent la dépendance `conditional_get` :
+- l'ETag combine l'utilisateur, sa version et l'URL (chemin + paramètres) ;
+- si If-None-Match le contient, la réponse est un 304 sans corps, après une
+  seule lecture par clé primaire de user_data_versions.
+
+La version est lue avant les données : une écriture intercalée donne au
+pire un ETag plus ancien que le contenu, donc un 200 de trop au prochain
+appel, jamais un 304 sur des données périmées.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import dialect_name, get_read_db
+from ..models.replicas import note_write
+from ..models.data_version import UserDataVersion
+
+# Le client doit revalider à chaque affichage ; un 304 coûte un aller-retour
+CACHE_CONTROL = "private, no-cache"
+
+
+def bump_statement(user_id: int):
+    """
+    Upsert version = version + 1 (à exécuter avant le commit de l'écriture).
+    Toute écriture passe par ici : l'utilisateur lit ensuite sur la base
+    principale pendant REPLICA_STICKY_SECONDS.
+    """
+    note_write(user_id)
+    table = UserDataVersion.__table__
+    dialect = postgresql if dialect_name() == "postgresql" else sqlite
+    stmt = dialect.insert(table).values(user_id=user_id, version=1)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": table.c.version + 1},
+    )
+
+
+def bump_many_statement(user_ids):
+    """
+    Même upsert pour les utilisateurs d'une sous-requête (écritures en masse,
+    hors requête HTTP : pas de lecture collante sur la base principale)
+    """
+    table = UserDataVersion.__table__
+    dialect = postgresql if dialect_name() == "postgresql" else sqlite
+    stmt = dialect.insert(table).from_select(["user_id", "version"], user_ids)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": table.c.version + 1},
+    )
+
+
+async def bump_data_version(db: AsyncSession, user_id: int):
+    """Incrémenter la version, dans la transaction de l'écriture (avant le commit)"""
+    await db.execute(bump_statement(user_id))
+
+
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    version = await db.scalar(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    )
+    return version or 0
+
+
+def make_etag(request: Request, user_id: int, version: int) -> str:
+    # Une même version sert plusieurs représentations (filtres, pages, résumés)
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{query}".encode(), digest_size=6).hexdigest()
+    return f'W/"{user_id}.{version}.{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible (RFC 9110) : le préfixe W/ est ignoré"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    user_id: int = Query(default=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Dépendance : 304 si le client a déjà cette version, sinon ETag sur la réponse"""
+    etag = make_etag(request, user_id, await get_data_version(db, user_id))
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
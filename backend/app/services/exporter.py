@@ -0,0 +1,79 @@
+"""
+Export en streaming de l'historique des transactions (CSV / NDJSON).
+
+Les lignes sont lues par partitions depuis un curseur côté serveur et
+sérialisées partition par partition : seule la partition en cours est en mémoire.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.transaction import Transaction
+from ..models.budget import CategoryEnum
+
+PARTITION_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "id", "created_at", "amount", "category", "description",
+    "transaction_type", "ai_score", "ai_recommendation", "was_approved",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_query(
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[CategoryEnum] = None
+):
+    query = select(*(getattr(Transaction, c) for c in EXPORT_COLUMNS)).where(Transaction.user_id == user_id)
+    if start:
+        query = query.where(Transaction.created_at >= start)
+    if end:
+        query = query.where(Transaction.created_at < end)
+    if category:
+        query = query.where(Transaction.category == category)
+    return query.order_by(Transaction.created_at, Transaction.id)
+
+
+def serialize_row(row) -> dict:
+    record = dict(zip(EXPORT_COLUMNS, row))
+    record["created_at"] = record["created_at"].isoformat() if record["created_at"] else None
+    record["category"] = record["category"].value
+    return record
+
+
+async def export_transactions(
+    db: AsyncSession,
+    user_id: int,
+    fmt: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[CategoryEnum] = None
+) -> AsyncIterator[bytes]:
+    result = await db.stream(
+        export_query(user_id, start, end, category).execution_options(yield_per=PARTITION_SIZE)
+    )
+
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+    async for rows in result.partitions(PARTITION_SIZE):
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer)
+            for row in rows:
+                record = serialize_row(row)
+                writer.writerow(record[c] for c in EXPORT_COLUMNS)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(serialize_row(row), ensure_ascii=False))
+                buffer.write("\n")
+        yield buffer.getvalue().encode()
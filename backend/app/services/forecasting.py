@@ -0,0 +1,228 @@
+"""
+Prévision des dépenses de fin de période (POST /ai/predict).
+
+Les dépenses journalières par catégorie (et les revenus, pour la simulation
+de app.services.simulation) sont agrégées en SQL (GROUP BY catégorie et jour) sur les FORECAST_LOOKBACK_DAYS derniers jours complets :
+la requête parcourt l'index (user_id, created_at) sur cette seule fenêtre et
+le calcul porte sur une matrice catégories × jours, quel que soit
+l'historique.
+
+Deux modèles, ajustés en NumPy sur toutes les catégories à la fois :
+- "ewma" : taux journalier moyen à pondération exponentielle (demi-vie
+  FORECAST_HALFLIFE_DAYS) ;
+- "weekday" : ce taux modulé par jour de semaine, facteurs rétrécis vers 1
+  quand peu de semaines sont observées (FORECAST_WEEKDAY_PRIOR).
+Pour chaque catégorie, le modèle retenu est celui qui prévoit le mieux les
+FORECAST_BACKTEST_DAYS derniers jours à partir des précédents.
+
+La période est celle du budget (period_start, period_end), à défaut le
+mois calendaire en cours ; aujourd'hui compte au prorata de ce qu'il en
+reste. L'intervalle (FORECAST_INTERVAL, 80 % par défaut) vient de la
+dispersion des résidus journaliers et de l'incertitude sur le taux.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from statistics import NormalDist
+from typing import List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.budget import CategoryEnum
+from ..models.transaction import Transaction
+from .rollups import day_expr
+import math
+import numpy as np
+import os
+
+FORECAST_LOOKBACK_DAYS = int(os.getenv("FORECAST_LOOKBACK_DAYS", 84))
+FORECAST_HALFLIFE_DAYS = float(os.getenv("FORECAST_HALFLIFE_DAYS", 14))
+FORECAST_BACKTEST_DAYS = int(os.getenv("FORECAST_BACKTEST_DAYS", 14))
+FORECAST_WEEKDAY_PRIOR = float(os.getenv("FORECAST_WEEKDAY_PRIOR", 4))
+FORECAST_INTERVAL = float(os.getenv("FORECAST_INTERVAL", 0.8))
+
+CATEGORIES = list(CategoryEnum)
+CATEGORY_ROW = {category: i for i, category in enumerate(CATEGORIES)}
+
+
+@dataclass
+class Fit:
+    """Modèle ajusté, une ligne par catégorie"""
+    rate: np.ndarray      # (C,) dépense journalière moyenne
+    factors: np.ndarray   # (C, 7) facteurs par jour de semaine (moyenne 1)
+    sigma: np.ndarray     # (C,) écart type des résidus journaliers
+    n_eff: float          # effectif équivalent des poids
+    models: List[str] = field(default_factory=list)
+
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Date en UTC sans fuseau, comme datetime.utcnow()"""
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def next_month(moment: datetime) -> datetime:
+    """Premier jour du mois suivant, à minuit"""
+    first = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return (first + timedelta(days=32)).replace(day=1)
+
+
+def period_bounds(period_start: Optional[datetime], period_end: Optional[datetime],
+                  now: datetime) -> Tuple[datetime, datetime]:
+    """
+    Début et fin (exclue) de la période budgétaire en cours : celle du
+    budget si elle contient `now`, sinon du début du mois (ou de la remise
+    à zéro, si elle a eu lieu ce mois-ci) au début du mois suivant
+    """
+    start, end = naive_utc(period_start), naive_utc(period_end)
+    if start is not None and end is not None and start <= now < end:
+        return start, end
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start is not None and month_start <= start <= now:
+        return start, next_month(now)
+    return month_start, next_month(now)
+
+
+def period_days(start: datetime, end: datetime, now: datetime) -> Tuple[int, int]:
+    """Jours écoulés (aujourd'hui compris) et jours restants après aujourd'hui dans la période"""
+    elapsed = (now.date() - start.date()).days + 1
+    remaining = max(0, (end - timedelta(microseconds=1)).date().toordinal() - now.date().toordinal())
+    return elapsed, remaining
+
+
+def horizon(now: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """Part restante de chaque jour d'ici `end` (aujourd'hui au prorata) et son jour de semaine"""
+    today = datetime.combine(now.date(), time.min)
+    days = max(0, math.ceil((end - today).total_seconds() / 86400))
+    weights = np.array([
+        (min(today + timedelta(days=i + 1), end) - max(today + timedelta(days=i), now)).total_seconds() / 86400
+        for i in range(days)
+    ], dtype=float)
+    return np.clip(weights, 0.0, 1.0), (now.weekday() + np.arange(days)) % 7
+
+
+def fit(series: np.ndarray, weekdays: np.ndarray, by_weekday: bool,
+        halflife: float = FORECAST_HALFLIFE_DAYS, prior: float = FORECAST_WEEKDAY_PRIOR) -> Fit:
+    """Ajuster un modèle sur la série (C, D), jours du plus ancien au plus récent"""
+    categories, days = series.shape
+    weights = 0.5 ** (np.arange(days - 1, -1, -1) / halflife)
+    total = weights.sum()
+    rate = series @ weights / total
+
+    factors = np.ones((categories, 7))
+    if by_weekday:
+        onehot = weekdays[:, None] == np.arange(7)
+        weighted = weights[:, None] * onehot
+        mass = weighted.sum(axis=0)
+        means = series @ weighted / np.where(mass > 0, mass, 1.0)
+        raw = np.divide(means, rate[:, None], out=np.ones_like(means), where=rate[:, None] > 0)
+        seen = onehot.sum(axis=0)
+        shrunk = (seen * raw + prior) / (seen + prior)
+        factors = shrunk / shrunk.mean(axis=1, keepdims=True)
+
+    residuals = series - rate[:, None] * factors[:, weekdays]
+    return Fit(
+        rate=rate,
+        factors=factors,
+        sigma=np.sqrt((residuals ** 2) @ weights / total),
+        n_eff=float(total ** 2 / (weights ** 2).sum()),
+        models=["weekday" if by_weekday else "ewma"] * categories,
+    )
+
+
+def project(model: Fit, weights: np.ndarray, weekdays: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Somme attendue sur l'horizon (un poids par jour) et son écart type"""
+    exposure = model.factors[:, weekdays] @ weights
+    # Bruit journalier indépendant + erreur d'estimation du taux
+    sd = model.sigma * np.sqrt(weights.sum() + exposure ** 2 / model.n_eff)
+    return model.rate * exposure, sd
+
+
+def bounds(mean, sd, interval: float = FORECAST_INTERVAL):
+    """Intervalle de prévision (loi normale), dépense restante jamais négative"""
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    return np.maximum(0.0, mean - z * sd), mean + z * sd
+
+
+def fit_series(series: np.ndarray, first_day: date, backtest: int = FORECAST_BACKTEST_DAYS) -> Fit:
+    """
+    Ajuster les deux modèles et garder, par catégorie, celui qui prévoit le
+    mieux les `backtest` derniers jours à partir des précédents (ewma tant
+    que l'historique est trop court pour en juger)
+    """
+    days = series.shape[1]
+    weekdays = (first_day.weekday() + np.arange(days)) % 7
+    ewma = fit(series, weekdays, False)
+    if days < backtest + 14:
+        return ewma
+    weekday = fit(series, weekdays, True)
+
+    ones = np.ones(backtest)
+    actual = series[:, -backtest:].sum(axis=1)
+    errors = [
+        np.abs(project(fit(series[:, :-backtest], weekdays[:-backtest], by_weekday), ones,
+                       weekdays[-backtest:])[0] - actual)
+        for by_weekday in (False, True)
+    ]
+    chosen = errors[1] < errors[0]
+    return Fit(
+        rate=np.where(chosen, weekday.rate, ewma.rate),
+        factors=np.where(chosen[:, None], weekday.factors, ewma.factors),
+        sigma=np.where(chosen, weekday.sigma, ewma.sigma),
+        n_eff=ewma.n_eff,
+        models=["weekday" if flag else "ewma" for flag in chosen],
+    )
+
+
+@dataclass
+class DailySeries:
+    """Montants journaliers de la fenêtre, du jour le plus ancien au plus récent"""
+    expenses: np.ndarray  # (C, D) dépenses par catégorie
+    income: np.ndarray    # (D,) revenus
+    first_day: date
+
+    @property
+    def days(self) -> int:
+        return self.expenses.shape[1]
+
+
+async def daily_series(db: AsyncSession, user_id: int, first_day: date, last_day: date) -> DailySeries:
+    """
+    Dépenses par catégorie et revenus, par jour sur [first_day, last_day[ ;
+    les jours précédant la première transaction de la fenêtre (compte
+    récent) sont retirés
+    """
+    day = day_expr(Transaction.created_at)
+    rows = (await db.execute(
+        select(Transaction.transaction_type, Transaction.category, day, func.sum(Transaction.amount))
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.created_at >= datetime.combine(first_day, time.min),
+            Transaction.created_at < datetime.combine(last_day, time.min),
+        )
+        .group_by(Transaction.transaction_type, Transaction.category, day)
+    )).all()
+
+    if not rows:
+        return DailySeries(np.zeros((len(CATEGORIES), 0)), np.zeros(0), last_day)
+    span = (last_day - first_day).days
+    is_expense = np.array([kind == "expense" for kind, _, _, _ in rows])
+    categories = np.array([CATEGORY_ROW[category] for _, category, _, _ in rows])
+    offsets = (np.array([bucket for _, _, bucket, _ in rows], dtype="datetime64[D]")
+               - np.datetime64(first_day, "D")).astype(int)
+    amounts = np.array([total for _, _, _, total in rows], dtype=float)
+
+    expenses = np.zeros((len(CATEGORIES), span))
+    np.add.at(expenses, (categories[is_expense], offsets[is_expense]), amounts[is_expense])
+    income = np.bincount(offsets[~is_expense], weights=amounts[~is_expense], minlength=span)
+
+    start = int(offsets.min())
+    return DailySeries(expenses[:, start:], income[start:], first_day + timedelta(days=start))
+
+
+async def fit_user(db: AsyncSession, user_id: int, today: date,
+                   lookback: int = FORECAST_LOOKBACK_DAYS) -> Optional[Fit]:
+    """Modèle des dépenses de l'utilisateur, None sans dépense sur la fenêtre"""
+    series = await daily_series(db, user_id, today - timedelta(days=lookback), today)
+    if not series.expenses.any():
+        return None
+    return fit_series(series.expenses, series.first_day)
@@ -0,0 +1,133 @@
+"""
+Idempotence des routes qui créent une transaction (en-tête Idempotency-Key).
+
+L'application mobile renvoie POST /transactions/ et POST /ai/sika/confirm
+quand le réseau coupe avant la réponse. Avec une clé :
+- 1re requête : l'écriture et l'enregistrement de sa réponse (table
+  idempotency_keys) partagent la même transaction SQL ;
+- tentatives suivantes : une lecture par clé primaire (user_id, key), sans
+  écriture, renvoie la réponse enregistrée avec `Idempotent-Replayed: true`.
+
+Deux envois simultanés de la même clé passent tous deux la lecture : le
+second bute sur la clé primaire à l'insertion (ON CONFLICT ... DO UPDATE
+WHERE expirée), annule sa transaction (débit du budget compris) et rejoue
+la réponse du premier. La même clé avec un autre corps ou sur une autre
+route est refusée (422).
+
+Une clé expirée (IDEMPOTENCY_TTL, 24 h par défaut) est réutilisable. Purge
+des lignes expirées (tâche planifiée) :
+
+    python -m app.services.idempotency
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.database import dialect_name
+from ..models.idempotency import IdempotencyKey
+import os
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+
+
+@dataclass
+class IdempotentRequest:
+    user_id: int
+    key: str
+    fingerprint: str
+    # (objet créé, ...) -> corps JSON de la réponse, appelé avant le commit
+    render: Optional[Callable[..., dict]] = None
+
+
+def idempotent_request(
+    key: Optional[str], user_id: int, route: str, payload: dict
+) -> Optional[IdempotentRequest]:
+    """None sans en-tête Idempotency-Key ; l'empreinte couvre la route et le corps"""
+    if not key:
+        return None
+    canonical = json.dumps([route, payload], sort_keys=True, default=str)
+    fingerprint = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    return IdempotentRequest(user_id=user_id, key=key, fingerprint=fingerprint)
+
+
+def _stored_response(session: Session, request: IdempotentRequest):
+    row = session.execute(
+        select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.body)
+        .where(
+            IdempotencyKey.user_id == request.user_id,
+            IdempotencyKey.key == request.key,
+            IdempotencyKey.expires_at > int(time.time()),
+        )
+    ).first()
+    # Rendre la connexion au pool avant l'écriture : en mode synchrone, une
+    # connexion gardée entre deux passages dans le threadpool bloque les
+    # rafales de requêtes (voir accounting)
+    session.rollback()
+    return row
+
+
+async def replay_response(db: AsyncSession, request: IdempotentRequest) -> Optional[JSONResponse]:
+    """Réponse enregistrée pour cette clé (lecture par clé primaire), ou None"""
+    row = await db.run_sync(_stored_response, request)
+    if row is None:
+        return None
+    if row.fingerprint != request.fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key déjà utilisée pour une autre requête"
+        )
+    return JSONResponse(
+        content=json.loads(row.body),
+        status_code=row.status_code,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def store_statement(request: IdempotentRequest, body: dict, status_code: int = 200):
+    """
+    Insertion de la réponse ; RETURNING vide si une réponse non expirée
+    existe déjà pour cette clé (l'appelant doit alors annuler son écriture)
+    """
+    table = IdempotencyKey.__table__
+    dialect = postgresql if dialect_name() == "postgresql" else sqlite
+    stmt = dialect.insert(table).values(
+        user_id=request.user_id,
+        key=request.key,
+        fingerprint=request.fingerprint,
+        status_code=status_code,
+        body=json.dumps(body, default=str),
+        expires_at=int(time.time()) + IDEMPOTENCY_TTL,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "fingerprint": stmt.excluded.fingerprint,
+            "status_code": stmt.excluded.status_code,
+            "body": stmt.excluded.body,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=table.c.expires_at <= int(time.time()),
+    ).returning(table.c.key)
+
+
+def purge_expired_keys(session: Session) -> int:
+    """Supprimer les clés expirées ; renvoie le nombre de lignes supprimées"""
+    result = session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= int(time.time()))
+    )
+    session.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from ..models.database import SessionLocal
+
+    with SessionLocal() as session:
+        print(f"{purge_expired_keys(session)} clés d'idempotence expirées supprimées")
@@ -0,0 +1,282 @@
+"""
+Import en masse de transactions depuis un flux CSV ou NDJSON.
+
+Le corps de la requête est lu morceau par morceau : seules la ligne en cours,
+le lot à insérer et des agrégats par catégorie / mois sont gardés en mémoire.
+Les lignes valides sont insérées par lots (executemany), puis les budgets,
+les agrégats mensuels et les statistiques de dépenses (anomalies) sont mis
+à jour une seule fois par catégorie. Les lignes importées ne reçoivent pas
+de score d'anomalie : un relevé arrive dans le désordre et en bloc.
+
+Seules les dépenses datées de la période en cours d'un budget
+(period_start <= created_at < period_end) sont débitées de ce budget ; un
+historique de mois clos ne va que dans les agrégats et les statistiques.
+"""
+import codecs
+import csv
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, Any, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.transaction import Transaction
+from ..models.budget import Budget
+from ..utils.stats import RunningStats, sketch_bucket
+from .anomalies import bucket_rows, buckets_upsert, stats_upsert
+from .data_version import bump_data_version
+from .forecasting import naive_utc, period_bounds
+from .rollups import add_to_rollup, month_key
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Découper un flux d'octets UTF-8 en lignes, sans le charger en entier"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class _LineFeed:
+    """Itérateur de lignes alimenté au fur et à mesure, lu par un seul csv.reader"""
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Enregistrements CSV d'un seul csv.reader : un champ entre guillemets peut
+    contenir des sauts de ligne. Les lignes lui sont données par
+    enregistrement complet (nombre pair de guillemets), il ne manque donc
+    jamais de la suite d'un champ.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    quotes = 0
+
+    def parse() -> Optional[Tuple[int, Any]]:
+        nonlocal header
+        line_no = reader.line_num + 1  # première ligne de l'enregistrement
+        try:
+            values = next(reader)
+        except csv.Error as e:
+            return line_no, f"CSV invalide : {e}"
+        if not "".join(values).strip():
+            return None
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            return None
+        if len(values) != len(header):
+            return line_no, f"{len(header)} colonnes attendues, {len(values)} trouvées"
+        # Les cellules vides prennent la valeur par défaut du modèle
+        return line_no, {k: v for k, v in zip(header, values) if v != ""}
+
+    async for line in lines:
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            # Fin de ligne rendue au lecteur : elle fait partie d'un champ multiligne
+            feed.lines.extend(line + "\n" for line in pending)
+            pending, quotes = [], 0
+            record = parse()
+            if record is not None:
+                yield record
+    if pending:
+        # Guillemet jamais refermé : la fin du flux forme le dernier enregistrement
+        feed.lines.extend(line + "\n" for line in pending)
+        record = parse()
+        if record is not None:
+            yield record
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Produire (numéro de ligne, enregistrement) ; l'enregistrement est un dict,
+    ou une chaîne décrivant l'erreur de lecture de la ligne
+    """
+    if fmt != "ndjson":
+        async for item in iter_csv_records(iter_lines(chunks)):
+            yield item
+        return
+
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, f"JSON invalide : {e.msg}"
+            continue
+        yield line_no, record if isinstance(record, dict) else "objet JSON attendu"
+
+
+class TransactionImporter:
+    """Valider, insérer par lots et cumuler les effets d'un import"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        row_model: type,
+        scorer=None,
+        batch_size: int = BATCH_SIZE
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.row_model = row_model
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.now = datetime.utcnow()
+
+        self.batch: List[Dict[str, Any]] = []
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.spent_by_category: Dict[Any, float] = {}  # toutes les dépenses importées
+        self.charged_by_category: Dict[Any, float] = {}  # celles de la période en cours du budget
+        self.rollups: Dict[Tuple, List[float]] = {}
+        self.stats: Dict[Any, RunningStats] = {}
+        self.sketches: Dict[Any, Dict[int, int]] = {}
+        self.budgets: Dict[Any, Budget] = {}
+        self.periods: Dict[Any, Tuple[datetime, datetime]] = {}
+
+    async def load_budgets(self):
+        """Charger les budgets et leur période en cours, une fois avant les lignes"""
+        budgets = (await self.db.scalars(select(Budget).where(Budget.user_id == self.user_id))).all()
+        self.budgets = {b.category: b for b in budgets}
+        self.periods = {
+            b.category: period_bounds(b.period_start, b.period_end, self.now) for b in budgets
+        }
+
+    def in_period(self, category, created_at: datetime) -> bool:
+        period = self.periods.get(category)
+        return period is not None and period[0] <= created_at < period[1]
+
+    def reject(self, line_no: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": error})
+
+    def score(self, row) -> Tuple[Optional[float], Optional[str]]:
+        budget = self.budgets.get(row.category)
+        if row.transaction_type != "expense" or budget is None:
+            return None, None
+        spent = (budget.current_spent or 0.0) + self.charged_by_category.get(row.category, 0.0)
+        result = self.scorer.calculate_score(
+            amount=row.amount,
+            category=row.category.value,
+            budget_remaining=budget.monthly_limit - spent,
+            monthly_spent=spent,
+            monthly_limit=budget.monthly_limit
+        )
+        return result["score"], result["recommendation"]
+
+    async def add(self, line_no: int, record: Any):
+        if isinstance(record, str):
+            self.reject(line_no, record)
+            return
+        try:
+            row = self.row_model(**record)
+        except ValidationError as e:
+            self.reject(line_no, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            return
+
+        ai_score, ai_recommendation = self.score(row) if self.scorer else (None, None)
+        # UTC sans fuseau, comme les autres écritures : même mois que rebuild_rollups
+        created_at = naive_utc(row.created_at) or self.now
+        self.batch.append({
+            "user_id": self.user_id,
+            "amount": row.amount,
+            "category": row.category,
+            "description": row.description,
+            "transaction_type": row.transaction_type,
+            "ai_score": ai_score,
+            "ai_recommendation": ai_recommendation,
+            "was_approved": True,
+            "created_at": created_at,
+        })
+
+        if row.transaction_type == "expense":
+            self.spent_by_category[row.category] = self.spent_by_category.get(row.category, 0.0) + row.amount
+            if self.in_period(row.category, created_at):
+                self.charged_by_category[row.category] = (
+                    self.charged_by_category.get(row.category, 0.0) + row.amount
+                )
+            self.stats.setdefault(row.category, RunningStats()).add(row.amount)
+            sketch = self.sketches.setdefault(row.category, {})
+            bucket = sketch_bucket(row.amount)
+            sketch[bucket] = sketch.get(bucket, 0) + 1
+
+        key = (month_key(created_at), row.category, row.transaction_type)
+        bucket = self.rollups.get(key)
+        if bucket is None:
+            self.rollups[key] = [row.amount, 1, row.amount, row.amount]
+        else:
+            bucket[0] += row.amount
+            bucket[1] += 1
+            bucket[2] = min(bucket[2], row.amount)
+            bucket[3] = max(bucket[3], row.amount)
+
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if self.batch:
+            await self.db.execute(insert(Transaction), self.batch)
+            self.imported += len(self.batch)
+            self.batch = []
+
+    async def finish(self) -> Dict[str, Any]:
+        """Insérer le dernier lot puis appliquer budgets, agrégats et statistiques en une passe"""
+        await self.flush()
+
+        for category, amount in self.charged_by_category.items():
+            await self.db.execute(
+                update(Budget)
+                .where(Budget.user_id == self.user_id, Budget.category == category)
+                .values(current_spent=func.coalesce(Budget.current_spent, 0.0) + amount)
+            )
+        for (month, category, transaction_type), (total, count, smallest, largest) in self.rollups.items():
+            await add_to_rollup(
+                self.db, self.user_id, month, category, transaction_type,
+                total, count, smallest, largest
+            )
+        for category, stats in self.stats.items():
+            await self.db.execute(stats_upsert(self.user_id, category, stats))
+            await self.db.execute(buckets_upsert(), bucket_rows(self.user_id, category, self.sketches[category]))
+        if self.imported:
+            await bump_data_version(self.db, self.user_id)
+        await self.db.commit()
+
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "expenses_by_category": {c.value: round(a, 2) for c, a in self.spent_by_category.items()},
+        }
@@ -0,0 +1,115 @@
+"""
+Métriques de l'API exposées au format Prometheus (GET /metrics).
+
+HTTP, par route (gabarit FastAPI, ex. /budgets/{budget_id}, jamais l'URL
+brute : le nombre de séries reste borné) et méthode :
+- http_request_duration_seconds : histogramme des latences ;
+- http_requests_total : compteur par code de statut ;
+- http_response_size_bytes : histogramme des tailles de corps envoyés ;
+- http_requests_in_flight : requêtes en cours, par méthode (la route
+  n'est connue qu'après le routage).
+
+Métier :
+- sika_intents_total : intentions détectées par AIEngine.sika_process_query ;
+- transaction_scores_total : scores (1 à 10) produits par calculate_score
+  et calculate_scores.
+
+Le middleware est un middleware ASGI pur (pas BaseHTTPMiddleware) : ni
+tâche ni copie du corps par requête. METRICS_ENABLED=false le retire.
+"""
+from typing import Callable, Dict
+import os
+import time
+import numpy as np
+from ..utils.metrics import Registry
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+UNMATCHED_ROUTE = "<unmatched>"
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Durée de traitement des requêtes HTTP", ("method", "route")
+)
+REQUESTS = registry.counter(
+    "http_requests_total", "Requêtes HTTP terminées, par code de statut", ("method", "route", "status")
+)
+RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "Taille du corps des réponses HTTP", ("method", "route"),
+    buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+)
+IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "Requêtes HTTP en cours de traitement", ("method",)
+)
+SIKA_INTENTS = registry.counter(
+    "sika_intents_total", "Intentions détectées par Sika", ("intent",)
+)
+TRANSACTION_SCORES = registry.counter(
+    "transaction_scores_total", "Scores de transaction calculés par le moteur IA", ("score",)
+)
+SCORE_LABELS = tuple(str(score) for score in range(11))
+
+
+def record_intent(intent: str):
+    SIKA_INTENTS.inc(intent)
+
+
+def record_score(score: int):
+    TRANSACTION_SCORES.inc(SCORE_LABELS[score])
+
+
+def record_scores(scores: np.ndarray):
+    """Version vectorisée : un incrément par valeur de score présente"""
+    for score, count in enumerate(np.bincount(np.ravel(scores), minlength=11)):
+        if count:
+            TRANSACTION_SCORES.inc(SCORE_LABELS[score], amount=int(count))
+
+
+class MetricsMiddleware:
+    """Mesure chaque requête HTTP ; la route est lue dans le scope après le routage"""
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint -> gabarit de route, construit au premier appel
+        self._routes: Dict[Callable, str] = {}
+
+    def route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        label = self._routes.get(endpoint)
+        if label is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is not None:
+                    self._routes.setdefault(route.endpoint, route.path)
+            label = self._routes.setdefault(endpoint, UNMATCHED_ROUTE)
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec(method)
+            route = self.route_label(scope)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            RESPONSE_SIZE.observe(size, method, route)
+            REQUESTS.inc(method, route, str(status))
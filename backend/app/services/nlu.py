@@ -0,0 +1,199 @@
+"""
+Analyse des requêtes en langage naturel de Sika et de l'assistant vocal.
+
+Tous les mots-clés (catégories et intentions) sont compilés à l'import en
+une expression régulière, arbre de préfixes qui commence par un caractère
+littéral : le moteur saute d'un coup jusqu'au prochain début de mot-clé
+possible. Les montants ont leur propre expression, ancrée sur un chiffre.
+
+Les mots-clés sont reconnus comme sous-chaînes, comme auparavant avec
+`any(word in text ...)`. À une même position, l'alternative la plus longue
+est retenue ; les mots-clés qui en sont des préfixes y sont forcément aussi
+présents, leurs étiquettes lui sont donc rattachées dès la compilation. La
+recherche reprend au caractère suivant le début de chaque mot-clé trouvé :
+les mots-clés imbriqués ("sport" dans "transport") sont vus aussi.
+
+L'assistant vocal s'arrête à la première intention trouvée dans l'ordre de
+priorité (recherche de sous-chaînes) et ne cherche un montant que pour un
+achat.
+"""
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+import re
+
+
+# Mapping des catégories en français vers l'enum (ordre = priorité)
+CATEGORY_KEYWORDS = {
+    "alimentation": ["manger", "nourriture", "repas", "restaurant", "courses", "alimentation", "bouffe", "déjeuner", "dîner", "petit-déjeuner"],
+    "transport": ["transport", "taxi", "uber", "bus", "essence", "carburant", "voiture", "moto", "déplacement", "trajet"],
+    "logement": ["loyer", "logement", "maison", "appartement", "électricité", "eau", "facture"],
+    "sante": ["santé", "médecin", "pharmacie", "médicament", "hôpital", "consultation", "ordonnance"],
+    "education": ["école", "formation", "cours", "livre", "études", "éducation", "scolarité"],
+    "loisirs": ["loisirs", "divertissement", "cinéma", "sortie", "jeux", "sport", "abonnement", "netflix"],
+    "epargne": ["épargne", "économie", "investissement", "placement"],
+    "vetements": ["vêtements", "habits", "chaussures", "mode", "shopping"],
+    "communication": ["téléphone", "internet", "forfait", "crédit", "communication", "data"],
+    "autre": ["autre", "divers", "cadeau", "don"]
+}
+
+# Intentions de Sika
+SIKA_INTENT_KEYWORDS = {
+    "expense": [
+        "acheter", "dépenser", "payer", "prendre", "commander",
+        "je veux", "je voudrais", "puis-je", "est-ce que je peux",
+        "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris"
+    ],
+    "past_expense": [
+        "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris",
+        "je viens de", "j'ai fait"
+    ],
+    "balance": ["combien", "reste", "disponible", "solde", "budget"],
+    "advice": ["conseil", "aide", "recommandation", "que faire"],
+}
+
+# Intentions de l'assistant vocal (ordre = priorité)
+VOICE_INTENT_KEYWORDS = {
+    "balance": ["combien", "reste", "disponible", "solde"],
+    "purchase": ["acheter", "dépenser", "payer", "puis-je"],
+    "goals": ["objectif", "épargne", "économie"],
+    "budget": ["budget", "catégorie"],
+    "advice": ["conseil", "recommandation", "aide"],
+}
+
+CATEGORY_PRIORITY = {category: rank for rank, category in enumerate(CATEGORY_KEYWORDS)}
+
+# Rang des unités : un montant suivi de francs prime sur "k", puis sur les euros,
+# puis sur un nombre nu (même ordre de préférence que l'ancien extracteur)
+UNIT_RANK = {"franc": 0, "k": 1, "euro": 2, None: 3}
+
+
+def _build_lexicon() -> Dict[str, FrozenSet[str]]:
+    tags: Dict[str, set] = {}
+    for prefix, groups in (
+        ("cat", CATEGORY_KEYWORDS),
+        ("sika", SIKA_INTENT_KEYWORDS),
+        ("voice", VOICE_INTENT_KEYWORDS),
+    ):
+        for name, keywords in groups.items():
+            for keyword in keywords:
+                tags.setdefault(keyword, set()).add(f"{prefix}:{name}")
+
+    # Un mot-clé reconnu implique tous ses préfixes qui sont aussi des mots-clés
+    return {
+        keyword: frozenset().union(*(tags[other] for other in tags if keyword.startswith(other)))
+        for keyword in tags
+    }
+
+
+def _trie_pattern(words) -> str:
+    """Alternative factorisée en arbre de préfixes : un échec coûte un caractère"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
+LEXICON = _build_lexicon()
+
+# Catégorie prioritaire (rang, nom) portée par chaque mot-clé
+KEYWORD_CATEGORY: Dict[str, Tuple[int, str]] = {
+    keyword: min(
+        (CATEGORY_PRIORITY[tag[4:]], tag[4:]) for tag in tags if tag.startswith("cat:")
+    )
+    for keyword, tags in LEXICON.items()
+    if any(tag.startswith("cat:") for tag in tags)
+}
+
+KEYWORD_PATTERN = re.compile(_trie_pattern(LEXICON))
+
+AMOUNT_PATTERN = re.compile(
+    r"""
+    (?P<number>
+        [0-9]{1,3}(?P<sep>[\ .,\u00a0\u202f])[0-9]{3}(?:(?P=sep)[0-9]{3})*(?![0-9])  # 5 000 / 5.000
+      | [0-9]+(?:[.,][0-9]+)?                                                      # 5000 / 2,5
+    )
+    (?:\s*(?P<k>k)\b)?
+    (?:\s*(?P<unit>francs?\b|fcfa\b|cfa\b|f\b|euros?\b|€))?
+    """,
+    re.VERBOSE,
+)
+
+
+class ParsedQuery(NamedTuple):
+    tags: FrozenSet[str]
+    category: Optional[str]
+    amount: Optional[float]
+
+    def has(self, tag: str) -> bool:
+        return tag in self.tags
+
+
+def _parse_number(number: str, separator: Optional[str]) -> float:
+    if separator:
+        return float(number.replace(separator, ""))
+    return float(number.replace(",", "."))
+
+
+def _amount(text: str) -> Optional[float]:
+    amount = None
+    amount_rank = len(UNIT_RANK)
+    for match in AMOUNT_PATTERN.finditer(text):
+        unit = match.group("unit")
+        if unit is None:
+            rank = UNIT_RANK["k"] if match.group("k") else UNIT_RANK[None]
+        else:
+            rank = UNIT_RANK["euro"] if unit[0] in "e€" else UNIT_RANK["franc"]
+        if rank < amount_rank:
+            value = _parse_number(match.group("number"), match.group("sep"))
+            amount = value * 1000 if match.group("k") else value
+            amount_rank = rank
+    return amount
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """Montant de la requête : "5000", "5 000", "5.000 francs", "5k", "20 €"..."""
+    return _amount(text.lower())
+
+
+def parse_query(text: str) -> ParsedQuery:
+    """Étiquettes d'intention / catégorie et montant de la requête"""
+    text = text.lower()
+    tags: FrozenSet[str] = frozenset()
+    category = None
+
+    search = KEYWORD_PATTERN.search
+    match = search(text)
+    while match is not None:
+        keyword = match.group()
+        tags |= LEXICON[keyword]
+        ranked = KEYWORD_CATEGORY.get(keyword)
+        if ranked is not None and (category is None or ranked < category):
+            category = ranked
+        match = search(text, match.start() + 1)
+
+    return ParsedQuery(tags, category and category[1], _amount(text))
+
+
+def voice_intent(text: str) -> Optional[str]:
+    """
+    Première intention vocale présente, selon l'ordre de priorité. Quelques
+    mots-clés courts : la recherche de sous-chaîne (en C) est plus rapide
+    qu'un parcours par expression régulière, et s'arrête au premier trouvé.
+    """
+    text = text.lower()
+    return next(
+        (name for name, keywords in VOICE_INTENT_KEYWORDS.items() if any(word in text for word in keywords)),
+        None
+    )
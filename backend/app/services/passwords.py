@@ -0,0 +1,113 @@
+"""
+Hachage et vérification des mots de passe (bcrypt) hors de la boucle d'événements.
+
+bcrypt coûte volontairement cher en CPU (~250 ms au coût 12). Les calculs
+tournent dans un exécuteur dédié et borné, séparé du threadpool qui sert les
+sessions de base de données : un afflux de connexions ne retarde donc pas les
+autres routes. Au-delà de PASSWORD_HASHER_MAX_PENDING calculs en attente,
+les nouvelles demandes sont refusées (HasherBusy) au lieu de s'accumuler.
+
+Variables d'environnement :
+- BCRYPT_ROUNDS : coût des nouveaux hachages (12 par défaut). Un hachage
+  d'un autre coût est recalculé à la connexion suivante.
+- PASSWORD_HASHER_MODE : "thread" (défaut) ou "process" (contourne le GIL).
+- PASSWORD_HASHER_WORKERS : nombre de workers (défaut : min(4, nb de CPU)).
+- PASSWORD_HASHER_MAX_PENDING : calculs en cours ou en file (défaut : 8 par worker).
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from passlib.context import CryptContext
+import asyncio
+import os
+import threading
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASHER_MODE = os.getenv("PASSWORD_HASHER_MODE", "thread").lower()
+HASHER_WORKERS = int(os.getenv("PASSWORD_HASHER_WORKERS", min(4, os.cpu_count() or 1)))
+HASHER_MAX_PENDING = int(os.getenv("PASSWORD_HASHER_MAX_PENDING", HASHER_WORKERS * 8))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HasherBusy(Exception):
+    """Trop de calculs bcrypt en attente : réessayer plus tard"""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Exécuteur bcrypt borné, créé au premier usage"""
+
+    def __init__(self, mode: str, workers: int, max_pending: int):
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="bcrypt"
+                    )
+            return self._executor
+
+    async def run(self, fn, *args):
+        # Compteur manipulé uniquement depuis la boucle d'événements
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hasher = PasswordHasher(HASHER_MODE, HASHER_WORKERS, HASHER_MAX_PENDING)
+
+
+async def hash_password(password: str) -> str:
+    """Lève HasherBusy si la file est pleine"""
+    return await hasher.run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Retourne (valide, nouveau_hachage). Le nouveau hachage est fourni quand
+    le hachage stocké n'utilise pas le coût courant ; il faut alors l'enregistrer.
+    Lève HasherBusy si la file est pleine.
+    """
+    return await hasher.run(_verify_and_update, password, hashed_password)
@@ -0,0 +1,76 @@
+"""
+Profil SQL de chaque requête HTTP (voir app/models/profiling.py).
+
+QueryProfilingMiddleware ouvre un QueryProfile par requête et, à la fin,
+journalise les formes de requête répétées (N+1). Avec SQL_DEBUG_HEADERS=true
+le résumé part aussi dans la réponse :
+
+    Server-Timing: db;dur=3.412;desc="12 queries", app;dur=9.870
+    X-DB-Queries: 12
+    X-DB-N-Plus-One: 10x SELECT budgets.id, ... WHERE budgets.user_id = ?
+
+Les en-têtes sont écrits au début de la réponse : pour une réponse en
+streaming (export), seules les requêtes émises avant le premier octet
+sont comptées. À réserver au débogage : ils décrivent le schéma.
+"""
+import logging
+import os
+import time
+from ..models.profiling import QueryProfile, current_profile, shorten
+
+logger = logging.getLogger(__name__)
+
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+PROFILING_HEADERS = ["Server-Timing", "X-DB-Queries", "X-DB-N-Plus-One"]
+
+
+def profile_headers(profile: QueryProfile, elapsed: float):
+    timing = (
+        f'db;dur={profile.seconds * 1000:.3f};desc="{profile.count} queries", '
+        f"app;dur={elapsed * 1000:.3f}"
+    )
+    headers = [(b"server-timing", timing.encode()), (b"x-db-queries", str(profile.count).encode())]
+    repeated = profile.repeated()
+    if repeated:
+        statement, count = repeated[0]
+        value = f"{count}x {shorten(statement)}"
+        headers.append((b"x-db-n-plus-one", value.encode("latin-1", "replace")))
+    return headers
+
+
+class QueryProfilingMiddleware:
+    """Attribue les requêtes SQL à la requête HTTP et signale les N+1"""
+
+    def __init__(self, app, debug_headers: bool = SQL_DEBUG_HEADERS):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.debug_headers:
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        *profile_headers(profile, time.perf_counter() - start),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            for statement, count in profile.repeated():
+                logger.warning(
+                    "N+1 probable sur %s %s : %d exécutions de %s",
+                    scope["method"], scope["path"], count, shorten(statement, 300)
+                )
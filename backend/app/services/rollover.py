@@ -0,0 +1,242 @@
+"""
+Remise à zéro mensuelle des budgets de tous les utilisateurs.
+
+Les budgets dont la période est close passent à la période du mois en cours
+par lots de BUDGET_ROLLOVER_BATCH_SIZE, dans l'ordre des id. Un lot est une
+transaction de requêtes ensemblistes, sans charger un seul budget en Python :
+1. INSERT ... SELECT : dépense de la période close archivée (budget_periods),
+   hors dépenses datées du nouveau mois ;
+2. version des données des utilisateurs du lot (ETag des GET) ;
+3. UPDATE : period_start / period_end du mois ; la dépense repart des
+   dépenses datées du nouveau mois, débitées si le passage a lieu après
+   minuit le 1er (elles ne sont pas archivées dans la période close) ;
+4. avancement du mois (budget_rollovers.last_budget_id).
+
+Reprise : un lot est appliqué en entier ou pas du tout, et l'avancement est
+écrit dans sa transaction ; après un arrêt, le traitement repart du dernier
+budget enregistré. Idempotence : seul un budget dont la période est close
+(period_end passé ; à défaut, period_start antérieur au mois) est traité, et
+un mois terminé n'est plus relu ; relancer ne change rien.
+
+Déclenchement :
+- dans l'API avec BUDGET_ROLLOVER_SCHEDULER=true : vérification toutes les
+  BUDGET_ROLLOVER_INTERVAL secondes (une lecture par clé primaire une fois le
+  mois traité). Si plusieurs workers l'activent, un lot déjà archivé par un
+  autre échoue sur la clé primaire de budget_periods et est annulé ;
+- en ligne de commande (cron, job planifié) :
+
+    python -m app.services.rollover [--batch-size N] [--at 2026-11-01T00:00]
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+from sqlalchemy import DateTime, and_, case, func, insert, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ..models.budget import Budget
+from ..models.budget_period import BudgetPeriod, BudgetRollover
+from ..models.database import dialect_name, get_engine
+from ..models.transaction import Transaction
+from .context_cache import invalidate_all_contexts
+from .data_version import bump_many_statement, bump_statement
+from .forecasting import next_month
+from .rollups import month_key
+import os
+
+BUDGET_ROLLOVER_SCHEDULER = os.getenv("BUDGET_ROLLOVER_SCHEDULER", "false").lower() in ("1", "true", "yes")
+BUDGET_ROLLOVER_INTERVAL = float(os.getenv("BUDGET_ROLLOVER_INTERVAL", 3600))
+BUDGET_ROLLOVER_BATCH_SIZE = int(os.getenv("BUDGET_ROLLOVER_BATCH_SIZE", 10000))
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED = ["budget_id", "period_start", "period_end", "user_id", "category", "monthly_limit", "spent"]
+
+
+@dataclass
+class RolloverResult:
+    period: str          # "YYYY-MM" de la période ouverte
+    rolled: int = 0      # budgets remis à zéro par cet appel
+    batches: int = 0
+    resumed_from: int = 0  # dernier budget traité avant cet appel (0 : début)
+    completed: bool = False
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def due_clause(now: datetime):
+    """Budgets dont la période est close à `now`"""
+    return or_(
+        Budget.period_end <= now,
+        and_(
+            Budget.period_end.is_(None),
+            or_(Budget.period_start.is_(None), Budget.period_start < month_start(now)),
+        ),
+    )
+
+
+def spent_since(moment: datetime):
+    """Dépenses de la catégorie du budget depuis `moment` (sous-requête corrélée)"""
+    return select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(
+        Transaction.user_id == Budget.user_id,
+        Transaction.category == Budget.category,
+        Transaction.transaction_type == "expense",
+        Transaction.created_at >= moment,
+    ).scalar_subquery()
+
+
+def archive_statement(where, default_start: datetime, period_end, spent=None):
+    """
+    Archiver la période en cours des budgets sélectionnés, close à
+    `period_end` (expression SQL) ; `spent` : dépense archivée (par défaut
+    current_spent)
+    """
+    return insert(BudgetPeriod).from_select(ARCHIVED, select(
+        Budget.id,
+        func.coalesce(Budget.period_start, default_start),
+        period_end,
+        Budget.user_id,
+        Budget.category,
+        Budget.monthly_limit,
+        func.coalesce(Budget.current_spent, 0.0) if spent is None else spent,
+    ).where(where))
+
+
+def roll_batch(connection, now: datetime, after: int, batch_size: int) -> Tuple[Optional[int], int]:
+    """
+    Traiter les `batch_size` budgets échus suivant l'id `after` ; renvoie le
+    dernier id du lot (None s'il n'en reste plus) et le nombre de budgets
+    """
+    due = due_clause(now)
+    batch = select(Budget.id).where(due, Budget.id > after).order_by(Budget.id).limit(batch_size).subquery()
+    last = connection.scalar(select(func.max(batch.c.id)))
+    if last is None:
+        return None, 0
+
+    start = month_start(now)
+    where = and_(Budget.id > after, Budget.id <= last, due)
+    # Les dépenses du nouveau mois déjà débitées (avant ce passage) y restent
+    carried = spent_since(start)
+    previous = func.coalesce(Budget.current_spent, 0.0) - carried
+    connection.execute(archive_statement(
+        where, month_start(start - timedelta(days=1)), func.coalesce(Budget.period_end, start),
+        case((previous > 0, previous), else_=0.0)
+    ))
+    connection.execute(bump_many_statement(select(Budget.user_id, literal(1)).where(where).distinct()))
+    rolled = connection.execute(
+        update(Budget).where(where).values(current_spent=carried, period_start=start, period_end=next_month(now))
+    ).rowcount
+    connection.execute(
+        update(BudgetRollover)
+        .where(BudgetRollover.period == month_key(start))
+        .values(last_budget_id=last, budgets_rolled=BudgetRollover.budgets_rolled + rolled)
+    )
+    return last, rolled
+
+
+def run_rollover(engine=None, now: Optional[datetime] = None, batch_size: int = BUDGET_ROLLOVER_BATCH_SIZE,
+                 on_batch: Optional[Callable[[RolloverResult], None]] = None) -> RolloverResult:
+    """
+    Remettre à zéro tous les budgets échus, un lot par transaction ; reprend
+    là où un appel interrompu s'est arrêté. `on_batch` est appelé après
+    chaque lot validé.
+    """
+    engine = engine or get_engine()
+    now = now or datetime.utcnow()
+    result = RolloverResult(period=month_key(now))
+    state = BudgetRollover.__table__
+
+    with engine.begin() as conn:
+        row = conn.execute(select(state).where(state.c.period == result.period)).first()
+        if row is None:
+            dialect = postgresql if dialect_name() == "postgresql" else sqlite
+            conn.execute(dialect.insert(state).values(
+                period=result.period, last_budget_id=0, budgets_rolled=0, started_at=datetime.utcnow()
+            ).on_conflict_do_nothing(index_elements=["period"]))
+            row = conn.execute(select(state).where(state.c.period == result.period)).one()
+    if row.completed_at is not None:
+        result.completed = True
+        return result
+
+    after = result.resumed_from = row.last_budget_id
+    while True:
+        with engine.begin() as conn:
+            last, rolled = roll_batch(conn, now, after, batch_size)
+            if last is None:
+                conn.execute(update(state).where(state.c.period == result.period)
+                             .values(completed_at=datetime.utcnow()))
+        if last is None:
+            result.completed = True
+            return result
+        after = last
+        result.rolled += rolled
+        result.batches += 1
+        if on_batch is not None:
+            on_batch(result)
+
+
+def _reset_user_budgets(session: Session, user_id: int, now: datetime) -> int:
+    mine = Budget.user_id == user_id
+    session.execute(archive_statement(mine, month_start(now), literal(now, DateTime(timezone=True))))
+    reset = session.execute(
+        update(Budget).where(mine).values(current_spent=0.0, period_start=now, period_end=next_month(now))
+    ).rowcount
+    session.execute(bump_statement(user_id))
+    session.commit()
+    return reset
+
+
+async def reset_user_budgets(db, user_id: int, now: Optional[datetime] = None) -> int:
+    """
+    Clore tout de suite la période des budgets d'un utilisateur (archivée) et
+    en ouvrir une jusqu'à la fin du mois ; renvoie le nombre de budgets
+    """
+    return await db.run_sync(_reset_user_budgets, user_id, now or datetime.utcnow())
+
+
+async def rollover_loop(interval: float = BUDGET_ROLLOVER_INTERVAL):
+    """Tâche de fond de l'API : remise à zéro dès qu'un nouveau mois commence"""
+    while True:
+        try:
+            result = await run_in_threadpool(run_rollover)
+            if result.rolled:
+                await invalidate_all_contexts()
+                logger.info("Remise à zéro %s : %d budgets", result.period, result.rolled)
+        except IntegrityError:
+            logger.info("Remise à zéro en cours dans un autre worker")
+        except Exception:
+            logger.exception("Échec de la remise à zéro mensuelle des budgets")
+        await asyncio.sleep(interval)
+
+
+def start_scheduler() -> Optional[asyncio.Task]:
+    """Lancer la tâche de fond si BUDGET_ROLLOVER_SCHEDULER est activé"""
+    if not BUDGET_ROLLOVER_SCHEDULER:
+        return None
+    return asyncio.create_task(rollover_loop())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Remettre à zéro les budgets dont la période est close")
+    parser.add_argument("--batch-size", type=int, default=BUDGET_ROLLOVER_BATCH_SIZE)
+    parser.add_argument("--at", type=datetime.fromisoformat, default=None,
+                        help="date de référence UTC (par défaut : maintenant)")
+    args = parser.parse_args()
+
+    def progress(result: RolloverResult):
+        print(f"{result.period} : {result.rolled} budgets ({result.batches} lots)", flush=True)
+
+    result = run_rollover(now=args.at, batch_size=args.batch_size, on_batch=progress)
+    if result.rolled:
+        # Instantanés partagés (backend redis) ; ceux des workers expirent d'eux-mêmes
+        asyncio.run(invalidate_all_contexts())
+    resumed = f", repris après le budget {result.resumed_from}" if result.resumed_from else ""
+    print(f"{result.period} : {result.rolled} budgets remis à zéro{resumed}"
+          f"{'' if result.rolled or not result.completed else ' (déjà fait)'}")
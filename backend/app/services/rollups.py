@@ -0,0 +1,233 @@
+"""
+Maintenance de la table monthly_rollups.
+
+Chaque écriture de transaction met à jour l'agrégat de son mois dans la même
+transaction SQL que l'écriture elle-même :
+- création : upsert incrémental (somme, nombre, min, max) ;
+- modification / suppression : recalcul du seul compartiment touché
+  (un utilisateur, un mois, une catégorie, un type).
+
+Reconstruction complète (réparation ; les migrations remplissent la table à sa création) :
+
+    python -m app.services.rollups [--user-id ID]
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import String, select, delete, insert, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.database import dialect_name
+from ..models.rollup import MonthlyRollup
+from ..models.transaction import Transaction
+
+
+def month_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def month_expr(column):
+    """Expression SQL 'YYYY-MM' pour une colonne date selon le dialecte"""
+    if dialect_name() == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def day_expr(column):
+    """Expression SQL 'YYYY-MM-DD' pour une colonne date selon le dialecte"""
+    if dialect_name() == "postgresql":
+        return func.to_char(column, "YYYY-MM-DD")
+    return func.strftime("%Y-%m-%d", column)
+
+
+def _upsert(values: Dict[str, Any]):
+    table = MonthlyRollup.__table__
+    if dialect_name() == "postgresql":
+        stmt = postgresql.insert(table).values(**values)
+        smallest, largest = func.least, func.greatest
+    else:
+        stmt = sqlite.insert(table).values(**values)
+        smallest, largest = func.min, func.max
+
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "month", "category", "transaction_type"],
+        set_={
+            "total_amount": table.c.total_amount + stmt.excluded.total_amount,
+            "transaction_count": table.c.transaction_count + stmt.excluded.transaction_count,
+            "min_amount": smallest(table.c.min_amount, stmt.excluded.min_amount),
+            "max_amount": largest(table.c.max_amount, stmt.excluded.max_amount),
+        }
+    )
+
+
+async def add_to_rollup(
+    db: AsyncSession,
+    user_id: int,
+    month: str,
+    category,
+    transaction_type: str,
+    total_amount: float,
+    transaction_count: int,
+    min_amount: float,
+    max_amount: float
+):
+    """Ajouter un lot de montants (déjà agrégés) à un compartiment mensuel"""
+    await db.execute(_upsert({
+        "user_id": user_id,
+        "month": month,
+        "category": category,
+        "transaction_type": transaction_type,
+        "total_amount": total_amount,
+        "transaction_count": transaction_count,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+    }))
+
+
+def transaction_rollup(transaction: Transaction):
+    """Upsert ajoutant une transaction nouvellement insérée à son agrégat mensuel"""
+    return _upsert({
+        "user_id": transaction.user_id,
+        "month": month_key(transaction.created_at),
+        "category": transaction.category,
+        "transaction_type": transaction.transaction_type,
+        "total_amount": transaction.amount,
+        "transaction_count": 1,
+        "min_amount": transaction.amount,
+        "max_amount": transaction.amount,
+    })
+
+
+async def record_transaction(db: AsyncSession, transaction: Transaction):
+    """Ajouter une transaction nouvellement insérée à son agrégat mensuel"""
+    await db.execute(transaction_rollup(transaction))
+
+
+def bucket_of(transaction: Transaction) -> Tuple:
+    return (
+        transaction.user_id,
+        month_key(transaction.created_at),
+        transaction.category,
+        transaction.transaction_type,
+    )
+
+
+def _recompute_upsert(user_id: int, month: str, category, transaction_type: str):
+    """Compartiment recalculé depuis les transactions, écrit en un seul upsert"""
+    table = MonthlyRollup.__table__
+    dialect = postgresql if dialect_name() == "postgresql" else sqlite
+    source = select(
+        Transaction.user_id,
+        literal(month, String),
+        Transaction.category,
+        Transaction.transaction_type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+        func.min(Transaction.amount),
+        func.max(Transaction.amount),
+    ).where(
+        Transaction.user_id == user_id,
+        Transaction.category == category,
+        Transaction.transaction_type == transaction_type,
+        month_expr(Transaction.created_at) == month,
+    ).group_by(Transaction.user_id, Transaction.category, Transaction.transaction_type)
+    stmt = dialect.insert(table).from_select(
+        ["user_id", "month", "category", "transaction_type",
+         "total_amount", "transaction_count", "min_amount", "max_amount"],
+        source
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "month", "category", "transaction_type"],
+        set_={
+            "total_amount": stmt.excluded.total_amount,
+            "transaction_count": stmt.excluded.transaction_count,
+            "min_amount": stmt.excluded.min_amount,
+            "max_amount": stmt.excluded.max_amount,
+        }
+    )
+
+
+def recompute_buckets_sync(session: Session, buckets: List[Tuple]):
+    """
+    Recalculer des compartiments à partir des transactions (après modification
+    ou suppression, le min/max ne peut pas être décrémenté).
+    Un seul upsert par compartiment : un ajout concurrent (transaction_rollup)
+    n'est jamais perdu entre une suppression et une réinsertion. Seuls les
+    compartiments devenus vides sont supprimés.
+    Les changements de la transaction en cours doivent avoir été flushés.
+    Version synchrone, pour les écritures exécutées en un seul appel (run_sync).
+    """
+    for user_id, month, category, transaction_type in set(buckets):
+        session.execute(_recompute_upsert(user_id, month, category, transaction_type))
+        remaining = select(Transaction.id).where(
+            Transaction.user_id == user_id,
+            Transaction.category == category,
+            Transaction.transaction_type == transaction_type,
+            month_expr(Transaction.created_at) == month,
+        )
+        session.execute(delete(MonthlyRollup).where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.month == month,
+            MonthlyRollup.category == category,
+            MonthlyRollup.transaction_type == transaction_type,
+            ~remaining.exists(),
+        ))
+
+
+async def get_rollups(
+    db: AsyncSession,
+    user_id: int,
+    month: Optional[str] = None
+) -> List[MonthlyRollup]:
+    """Agrégats d'un utilisateur, tous mois confondus ou pour un mois donné"""
+    query = select(MonthlyRollup).where(MonthlyRollup.user_id == user_id)
+    if month:
+        query = query.where(MonthlyRollup.month == month)
+    return (await db.scalars(query)).all()
+
+
+def rebuild_rollups(connection, user_id: Optional[int] = None) -> int:
+    """Reconstruire la table (ou la partie d'un utilisateur) en un INSERT ... SELECT"""
+    clear = delete(MonthlyRollup)
+    source = select(
+        Transaction.user_id,
+        month_expr(Transaction.created_at).label("month"),
+        Transaction.category,
+        func.coalesce(Transaction.transaction_type, "expense"),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+        func.min(Transaction.amount),
+        func.max(Transaction.amount),
+    )
+    if user_id is not None:
+        clear = clear.where(MonthlyRollup.user_id == user_id)
+        source = source.where(Transaction.user_id == user_id)
+    source = source.group_by(
+        Transaction.user_id,
+        month_expr(Transaction.created_at),
+        Transaction.category,
+        func.coalesce(Transaction.transaction_type, "expense"),
+    )
+
+    connection.execute(clear)
+    result = connection.execute(insert(MonthlyRollup).from_select(
+        ["user_id", "month", "category", "transaction_type",
+         "total_amount", "transaction_count", "min_amount", "max_amount"],
+        source
+    ))
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconstruire la table monthly_rollups")
+    parser.add_argument("--user-id", type=int, default=None, help="limiter à un utilisateur")
+    args = parser.parse_args()
+
+    from ..models.database import get_engine
+
+    # Table créée par les migrations (alembic upgrade head)
+    with get_engine().begin() as conn:
+        count = rebuild_rollups(conn, args.user_id)
+    print(f"{count} agrégats mensuels reconstruits")
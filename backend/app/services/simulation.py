@@ -0,0 +1,144 @@
+"""
+Simulation Monte Carlo « et si » des achats envisagés (POST /ai/simulate).
+
+Les jours restants sont tirés avec remise parmi ceux de la fenêtre de
+prévision (forecasting.daily_series), jours récents plus probables
+(demi-vie SIMULATION_HALFLIFE_DAYS) :
+- dépenses : un jour de même jour de la semaine, qui apporte ensemble les
+  dépenses de toutes les catégories (leurs corrélations sont gardées) ;
+- revenus : un jour de même quantième, les salaires tombant à date fixe.
+
+- Budgets : dépense simulée jusqu'à la fin de la période de chaque budget.
+- Objectifs : l'épargne (revenus − dépenses hors catégorie épargne) finance
+  les objectifs par date cible croissante. Au-delà de la dernière période
+  budgétaire, la somme des jours tirés est remplacée par une loi normale de
+  mêmes moments : un tirage par chemin et par objectif au lieu d'un par
+  jour, quelle que soit l'échéance.
+
+Tout est vectorisé sur les chemins : mémoire en (budgets + objectifs) ×
+chemins, une boucle Python par jour restant de la période.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+import numpy as np
+import os
+from ..models.budget import CategoryEnum
+from .forecasting import CATEGORY_ROW, DailySeries, horizon
+
+SIMULATION_PATHS = int(os.getenv("SIMULATION_PATHS", 10000))
+SIMULATION_MAX_PATHS = int(os.getenv("SIMULATION_MAX_PATHS", 100000))
+SIMULATION_HALFLIFE_DAYS = float(os.getenv("SIMULATION_HALFLIFE_DAYS", 28))
+
+
+@dataclass
+class Simulation:
+    spend: np.ndarray    # (B, P) dépense simulée d'ici la fin de période de chaque budget
+    savings: np.ndarray  # (G, P) épargne cumulée d'ici la date cible de chaque objectif
+
+
+def calendar_keys(first_day: date, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Jour de la semaine (0-6) et quantième (0-30) de `days` jours consécutifs"""
+    dates = np.datetime64(first_day, "D") + np.arange(days)
+    weekdays = (first_day.weekday() + np.arange(days)) % 7
+    months = dates.astype("datetime64[M]")
+    return weekdays, (dates - months).astype(int)
+
+
+def draw_days(rng: np.random.Generator, keys: np.ndarray, weights: np.ndarray,
+              ahead: np.ndarray, paths: int) -> np.ndarray:
+    """Indices des jours d'historique tirés (P, H), de même clé que le jour simulé"""
+    drawn = np.zeros((paths, len(ahead)), dtype=np.intp)
+    for key in np.unique(ahead):
+        columns = np.flatnonzero(ahead == key)
+        pool = np.flatnonzero(keys == key)
+        if not len(pool):
+            pool = np.arange(len(keys))  # jamais observé (historique court, 31 du mois)
+        cumulative = np.cumsum(weights[pool])
+        picks = np.searchsorted(cumulative, rng.random((paths, len(columns))) * cumulative[-1], side="right")
+        drawn[:, columns] = pool[np.minimum(picks, len(pool) - 1)]
+    return drawn
+
+
+def key_moments(values: np.ndarray, keys: np.ndarray, weights: np.ndarray, groups: int):
+    """Moyenne et variance de la loi de tirage, par clé (groups,)"""
+    onehot = keys[:, None] == np.arange(groups)
+    onehot[:, ~onehot.any(axis=0)] = True  # clé jamais observée : tous les jours
+    probabilities = weights[:, None] * onehot
+    probabilities /= probabilities.sum(axis=0)
+    mean = values @ probabilities
+    return mean, ((values[:, None] - mean) ** 2 * probabilities).sum(axis=0)
+
+
+def _exposure(start: datetime, end: datetime, groups: int, by_weekday: bool) -> np.ndarray:
+    """Nombre de jours (au prorata) de chaque clé dans [start, end["""
+    weights, _ = horizon(start, end)
+    weekdays, monthdays = calendar_keys(start.date(), len(weights))
+    return np.bincount(weekdays if by_weekday else monthdays, weights=weights, minlength=groups)
+
+
+def simulate(series: DailySeries, now: datetime, categories: List[CategoryEnum], budget_ends: List[datetime],
+             goal_dates: List[datetime], paths: int = SIMULATION_PATHS,
+             rng: Optional[np.random.Generator] = None,
+             halflife: float = SIMULATION_HALFLIFE_DAYS) -> Simulation:
+    """
+    Simuler `paths` fins de période : dépense par budget (catégorie, fin de
+    période) et épargne cumulée à chaque date cible (dates croissantes)
+    """
+    rng = rng or np.random.default_rng()
+    days = series.days
+    end = max(budget_ends, default=now)
+    weights, ahead = horizon(now, end)
+
+    spend = np.zeros((len(categories), paths))
+    savings = np.zeros((len(goal_dates), paths))
+    if days == 0:
+        return Simulation(spend, savings)
+
+    history_weekdays, history_monthdays = calendar_keys(series.first_day, days)
+    ahead_monthdays = calendar_keys(now.date(), len(weights))[1]
+    recency = 0.5 ** (np.arange(days - 1, -1, -1) / halflife)
+    expenses = series.expenses[[CATEGORY_ROW[category] for category in categories]]
+    # Les versements en catégorie épargne ne réduisent pas l'épargne
+    consumed = series.expenses.sum(axis=0) - series.expenses[CATEGORY_ROW[CategoryEnum.EPARGNE]]
+
+    # Poids de chaque jour simulé pour chaque budget et chaque objectif (0 au-delà de l'échéance)
+    budget_weights = np.zeros((len(categories), len(weights)))
+    for i, budget_end in enumerate(budget_ends):
+        own = horizon(now, budget_end)[0]
+        budget_weights[i, :len(own)] = own
+    goal_weights = np.zeros((len(goal_dates), len(weights)))
+    for i, goal_date in enumerate(goal_dates):
+        own = horizon(now, min(goal_date, end))[0]
+        goal_weights[i, :len(own)] = own
+
+    spending_days = draw_days(rng, history_weekdays, recency, ahead, paths)
+    income_days = draw_days(rng, history_monthdays, recency, ahead_monthdays, paths)
+    for day in range(len(weights)):
+        picked = spending_days[:, day]
+        spend += expenses[:, picked] * budget_weights[:, day, None]
+        savings += (series.income[income_days[:, day]] - consumed[picked]) * goal_weights[:, day, None]
+
+    # Échéances au-delà de la période : incréments normaux enchaînés, un par objectif
+    spending_mean, spending_variance = key_moments(consumed, history_weekdays, recency, 7)
+    income_mean, income_variance = key_moments(series.income, history_monthdays, recency, 31)
+    previous, carried = end, np.zeros(paths)
+    for i, goal_date in enumerate(goal_dates):
+        if goal_date <= end:
+            continue
+        by_weekday = _exposure(previous, goal_date, 7, True)
+        by_monthday = _exposure(previous, goal_date, 31, False)
+        mean = by_monthday @ income_mean - by_weekday @ spending_mean
+        sd = np.sqrt(by_monthday @ income_variance + by_weekday @ spending_variance)
+        carried = carried + rng.normal(mean, sd, paths)
+        savings[i] += carried
+        previous = goal_date
+    return Simulation(spend, savings)
+
+
+def goal_shortfall(savings: np.ndarray, remaining: np.ndarray, purchases: float) -> np.ndarray:
+    """
+    Objectifs (G, P) non atteints à leur date : l'épargne, amputée des achats,
+    couvre d'abord les objectifs les plus proches
+    """
+    return savings - purchases < np.cumsum(remaining)[:, None]
@@ -0,0 +1,95 @@
+"""
+Statistiques incrémentales : moyenne / variance de Welford et esquisse de
+quantiles à compartiments logarithmiques.
+
+L'esquisse range un montant x > 0 dans le compartiment ceil(log_γ(x)), avec
+γ = (1 + α) / (1 - α) : tout quantile est estimé à α près en valeur
+relative (α = 5 %), avec au plus ~130 compartiments de 25 FCFA à 10
+millions. Ajouter ou retirer un montant ne touche qu'un compteur ; les
+compartiments de deux esquisses s'additionnent.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+import math
+
+SKETCH_ACCURACY = 0.05  # change la numérotation des compartiments : reconstruire les esquisses
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+
+@dataclass
+class RunningStats:
+    """Effectif, moyenne et somme des carrés des écarts (Welford)"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        """Fusion de deux séries (Chan et al.)"""
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def without(self, value: float) -> "RunningStats":
+        """Statistiques de la série privée d'une de ses valeurs"""
+        if self.count <= 1:
+            return RunningStats()
+        count = self.count - 1
+        mean = (self.count * self.mean - value) / count
+        return RunningStats(count, mean, max(0.0, self.m2 - (value - mean) * (value - self.mean)))
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def z_score(self, value: float) -> float:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else 0.0
+
+
+def sketch_bucket(value: float) -> int:
+    """Compartiment d'un montant (0 pour les montants inférieurs ou égaux à 1)"""
+    return math.ceil(math.log(value) / _LOG_GAMMA) if value > 1 else 0
+
+
+def bucket_value(bucket: int) -> float:
+    """Montant représentatif d'un compartiment (erreur relative ≤ α)"""
+    return 2 * GAMMA ** bucket / (GAMMA + 1) if bucket > 0 else 1.0
+
+
+def sketch_quantiles(buckets: Iterable[Tuple[int, int]], quantiles: List[float]) -> List[float]:
+    """Quantiles (croissants) d'une esquisse donnée en (compartiment, effectif)"""
+    ordered = sorted((bucket, count) for bucket, count in buckets if count > 0)
+    total = sum(count for _, count in ordered)
+    if not total:
+        return [0.0] * len(quantiles)
+    results, seen, position = [], 0, 0
+    for q in quantiles:
+        rank = q * (total - 1)
+        while seen + ordered[position][1] <= rank:
+            seen += ordered[position][1]
+            position += 1
+        results.append(bucket_value(ordered[position][0]))
+    return results
+
+
+def count_buckets(values: Iterable[float]) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for value in values:
+        bucket = sketch_bucket(value)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
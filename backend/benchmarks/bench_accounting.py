@@ -0,0 +1,263 @@
+"""
+Débit des budgets : mises à jour perdues et latence, lecture-modification-écriture
+contre UPDATE ... RETURNING.
+
+    python -m benchmarks.bench_accounting --parallel 1000 --sequential 300
+
+Pour chaque mode (sync, async), dans un sous-processus car DB_ASYNC est lu
+à l'import, et pour chaque implémentation de POST /transactions/ :
+- `legacy` : l'ancienne route (SELECT du budget, += en Python, deux commits),
+  montée sur /legacy/transactions/ ;
+- `atomic` : la route actuelle.
+
+1. --parallel dépenses envoyées simultanément pour un même utilisateur :
+   le total final du budget doit valoir exactement la somme des montants.
+   L'ancienne route n'en reçoit que --legacy-parallel : en mode sync, ses
+   verrous gardés entre deux passages dans le threadpool la bloquent
+   jusqu'aux timeouts du pool (30 s par vague) dès quelques dizaines de
+   requêtes simultanées.
+2. --sequential dépenses une à une : latence et requêtes SQL par écriture.
+
+Le script se termine en erreur si l'implémentation atomique perd une mise
+à jour (l'ancienne en perd : c'est attendu et affiché). Sous SQLite, une
+écriture peut échouer sur « database is locked » (attente du verrou
+d'écriture > 5 s) : elle est comptée comme erreur, sans transaction ni
+débit, et le total final doit rester exact. tests/test_accounting.py
+vérifie ce total pour 1000 dépenses simultanées.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, latency_stats, load_app
+
+# Montants entiers : la somme en flottants est exacte
+AMOUNT = 7.0
+LIMIT = 1e9
+
+
+def legacy_router():
+    """Copie de create_transaction avant UPDATE ... RETURNING"""
+    from fastapi import APIRouter, Depends, Query
+    from sqlalchemy import select
+    from app.models.database import get_db
+    from app.models.budget import Budget
+    from app.models.transaction import Transaction
+    from app.routes.transactions import TransactionCreate, TransactionResponse
+    from app.services.ai_engine import get_ai_engine
+    from app.services.context_cache import invalidate_context
+    from app.services.data_version import bump_data_version
+    from app.services.rollups import record_transaction
+
+    router = APIRouter(prefix="/legacy/transactions")
+
+    @router.post("/", response_model=TransactionResponse)
+    async def create_transaction(transaction: TransactionCreate, user_id: int = Query(default=1),
+                                 db=Depends(get_db)):
+        ai_score = None
+        ai_recommendation = None
+        if transaction.transaction_type == "expense":
+            budget = await db.scalar(select(Budget).where(
+                Budget.user_id == user_id,
+                Budget.category == transaction.category
+            ))
+            if budget:
+                result = get_ai_engine().calculate_score(
+                    amount=transaction.amount,
+                    category=transaction.category.value,
+                    budget_remaining=budget.monthly_limit - budget.current_spent,
+                    monthly_spent=budget.current_spent,
+                    monthly_limit=budget.monthly_limit
+                )
+                ai_score = result["score"]
+                ai_recommendation = result["recommendation"]
+                budget.current_spent += transaction.amount
+                await db.commit()
+
+        new_transaction = Transaction(
+            user_id=user_id,
+            amount=transaction.amount,
+            category=transaction.category,
+            description=transaction.description,
+            transaction_type=transaction.transaction_type,
+            ai_score=ai_score,
+            ai_recommendation=ai_recommendation,
+            was_approved=True
+        )
+        db.add(new_transaction)
+        await db.flush()
+        await db.refresh(new_transaction)
+        await record_transaction(db, new_transaction)
+        await bump_data_version(db, user_id)
+        await db.commit()
+        if ai_score is not None:
+            await invalidate_context(user_id)
+        return new_transaction
+
+    return router
+
+
+def seed(user_id: int):
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.user import User
+
+    db = SessionLocal()
+    db.add(User(id=user_id, email=f"{user_id}@bench", username=f"u{user_id}", phone=str(user_id),
+                hashed_password="x"))
+    db.add(Budget(user_id=user_id, category=CategoryEnum.ALIMENTATION, monthly_limit=LIMIT, current_spent=0.0))
+    db.commit()
+    db.close()
+
+
+def budget_state(user_id: int):
+    from sqlalchemy import func, select
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget
+    from app.models.transaction import Transaction
+
+    db = SessionLocal()
+    try:
+        spent = db.scalar(select(Budget.current_spent).where(Budget.user_id == user_id))
+        count = db.scalar(select(func.count(Transaction.id)).where(Transaction.user_id == user_id))
+        return spent, count
+    finally:
+        db.close()
+
+
+def count_statements():
+    from sqlalchemy import event
+    from app.models.database import async_engine, engine
+
+    counter = {"statements": 0}
+
+    def on_execute(*_):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+    return counter
+
+
+async def parallel(client, prefix: str, user_id: int, total: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def expense():
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                f"{prefix}/?user_id={user_id}", json={"amount": AMOUNT, "category": "alimentation"}
+            )
+        except Exception as e:
+            # Erreur remontée par l'application (ex. SQLite : database is locked)
+            error = str(getattr(e, "orig", None) or type(e).__name__)
+            errors[error] = errors.get(error, 0) + 1
+            return
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(expense() for _ in range(total)))
+    stats = latency_stats(latencies, time.perf_counter() - start)
+
+    spent, count = budget_state(user_id)
+    stats["errors"] = sum(errors.values())
+    stats["error_types"] = errors
+    stats["expected_spent"] = count * AMOUNT
+    stats["final_spent"] = spent
+    stats["lost_updates"] = round((count * AMOUNT - spent) / AMOUNT)
+    return stats
+
+
+async def sequential(client, counter, prefix: str, user_id: int, total: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    before = counter["statements"]
+    start = time.perf_counter()
+    for _ in range(total):
+        t = time.perf_counter()
+        response = await client.post(
+            f"{prefix}/?user_id={user_id}", json={"amount": AMOUNT, "category": "alimentation"}
+        )
+        latencies.append(time.perf_counter() - t)
+        response.raise_for_status()
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["sql_per_write"] = round((counter["statements"] - before) / total, 2)
+    return stats
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    app.include_router(legacy_router())
+    from app.models.database import dispose_engines
+    for user_id in (1, 2, 3, 4):
+        seed(user_id)
+    counter = count_statements()
+
+    results = {}
+    async with asgi_client(app) as client:
+        for user_id, (name, prefix, total) in enumerate((
+            ("legacy", "/legacy/transactions", args.legacy_parallel),
+            ("atomic", "/transactions", args.parallel),
+        ), start=1):
+            results[name] = {
+                "parallel": await parallel(client, prefix, user_id, total),
+                "sequential": await sequential(client, counter, prefix, user_id + 2, args.sequential),
+            }
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--parallel", type=int, default=1000)
+    parser.add_argument("--legacy-parallel", type=int, default=100)
+    parser.add_argument("--sequential", type=int, default=300)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        configure_database(f"accounting_{args.mode}")
+        os.environ["DB_ASYNC"] = "true" if args.mode == "async" else "false"
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {}
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_accounting", "--mode", mode,
+             "--parallel", str(args.parallel), "--legacy-parallel", str(args.legacy_parallel),
+             "--sequential", str(args.sequential)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<7}{'route':<8}{'envoyées':>9}{'perdues':>9}{'erreurs':>9}{'total attendu':>15}"
+          f"{'total final':>13}{'p99 //':>9}{'SQL/écr.':>10}{'p50 seq':>9}{'p99 seq':>9}")
+    failed = False
+    for mode, routes in report.items():
+        for name, r in routes.items():
+            p, s = r["parallel"], r["sequential"]
+            print(f"{mode:<7}{name:<8}{p['requests'] + p['errors']:>9}{p['lost_updates']:>9}{p['errors']:>9}"
+                  f"{p['expected_spent']:>15,.0f}{p['final_spent']:>13,.0f}{p['p99_ms']:>9}{s['sql_per_write']:>10}"
+                  f"{s['p50_ms']:>9}{s['p99_ms']:>9}")
+        atomic = routes["atomic"]["parallel"]
+        if atomic["error_types"]:
+            print(f"  {mode} atomic, erreurs : {atomic['error_types']}")
+        # Seule erreur tolérée : le délai d'attente du verrou d'écriture SQLite
+        unexpected = set(atomic["error_types"]) - {"database is locked"}
+        if atomic["lost_updates"] or unexpected or atomic["final_spent"] != atomic["expected_spent"]:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latence de /transactions/summary quand l'historique d'un utilisateur grossit,
+comparée à l'ancienne approche (chargement de toutes les lignes + sommes Python)
+et à un GROUP BY direct sur transactions.
+
+    python -m benchmarks.bench_aggregations --sizes 100 1000 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import asgi_client, configure_database, load_app, seed_transactions
+
+
+def group_by_summary(user_id: int):
+    """GROUP BY sur la table transactions (sans monthly_rollups)"""
+    from sqlalchemy import select, func
+    from app.models.database import engine
+    from app.models.transaction import Transaction
+
+    with engine.connect() as conn:
+        return conn.execute(
+            select(Transaction.transaction_type, Transaction.category, func.sum(Transaction.amount))
+            .where(Transaction.user_id == user_id)
+            .group_by(Transaction.transaction_type, Transaction.category)
+        ).all()
+
+
+def legacy_summary(user_id: int):
+    """Reproduction de l'implémentation d'origine (toutes les lignes en mémoire)"""
+    from app.models.database import SessionLocal
+    from app.models.transaction import Transaction
+
+    db = SessionLocal()
+    transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
+    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
+    by_category = {}
+    for t in transactions:
+        if t.transaction_type == "expense":
+            by_category[t.category.value] = by_category.get(t.category.value, 0) + t.amount
+    db.close()
+    return total_expenses, by_category
+
+
+async def timed_get(client, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def run(args):
+    configure_database("aggregations")
+    app = load_app()
+    from app.models.database import dispose_engines, engine
+    from app.services.rollups import rebuild_rollups
+
+    print(f"{'transactions':>14}{'rollups (ms)':>14}{'GROUP BY (ms)':>15}{'legacy (ms)':>14}")
+    seeded = 0
+    async with asgi_client(app) as client:
+        for size in sorted(args.sizes):
+            seed_transactions(user_id=1, count=size - seeded, offset=seeded)
+            seeded = size
+            with engine.begin() as conn:
+                rebuild_rollups(conn, user_id=1)
+            start = time.perf_counter()
+            group_by_summary(1)
+            group_by_ms = (time.perf_counter() - start) * 1000
+            sql_ms = await timed_get(client, "/transactions/summary?user_id=1", args.repeat)
+            legacy_ms = "-"
+            if size <= args.legacy_max:
+                start = time.perf_counter()
+                legacy_summary(1)
+                legacy_ms = f"{(time.perf_counter() - start) * 1000:.1f}"
+            print(f"{size:>14}{sql_ms:>14.1f}{group_by_ms:>15.1f}{legacy_ms:>14}")
+    await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="taille maximale pour mesurer l'ancienne approche")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Dépenses inhabituelles : coût de la détection à l'écriture selon la
+longueur de l'historique, puis qualité de la détection.
+
+    python -m benchmarks.bench_anomalies --history 1000 10000 100000 --users 2000
+
+Coût : l'historique de l'utilisateur 1 (une catégorie) est prolongé puis
+ses statistiques reconstruites (rebuild_spending_stats). Pour chaque
+longueur, latence de POST /transactions/ et coût, dans une transaction
+annulée, de record_expense (upsert + esquisse ; plus la requête de queue
+pour un montant à grand écart), comparé au même jugement par relecture de
+l'historique (moyenne, écart type et quantile recalculés en NumPy).
+
+Qualité (sans base) : --users utilisateurs synthétiques, dépenses
+log-normales par catégorie (médiane et dispersion propres à chacun), 1 %
+d'achats exceptionnels (×8 à ×30 la médiane) ; chaque dépense est jugée
+sur les précédentes, comme à l'écriture. Taux de fausses alertes et part
+des achats exceptionnels signalés, face à l'ancienne règle (seuil fixe de
+50 000 FCFA).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.common import asgi_client, configure_database, load_app
+
+LEGACY_THRESHOLD = 50000
+OUTLIER_SHARE = 0.01
+
+
+def seed_history(count: int, offset: int, rng: np.random.Generator):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app.models import CategoryEnum, Transaction
+    from app.models.database import get_engine
+
+    start = datetime(2020, 1, 1)
+    amounts = np.round(rng.lognormal(np.log(2500), 0.6, count), -1)
+    with get_engine().begin() as conn:
+        conn.execute(insert(Transaction), [
+            {"user_id": 1, "amount": float(amounts[i]), "category": CategoryEnum.ALIMENTATION,
+             "transaction_type": "expense", "was_approved": True,
+             "created_at": start + timedelta(minutes=offset + i)}
+            for i in range(count)
+        ])
+
+
+def time_in_rollback(function, repeat: int) -> float:
+    """Temps moyen (ms) d'un appel dans une transaction annulée, connexion déjà ouverte"""
+    from sqlalchemy import text
+    from app.models.database import SessionLocal
+
+    timings = []
+    for _ in range(repeat):
+        session = SessionLocal()
+        try:
+            session.execute(text("SELECT 1"))
+            start = time.perf_counter()
+            function(session)
+            timings.append(time.perf_counter() - start)
+        finally:
+            session.rollback()
+            session.close()
+    return statistics.mean(timings) * 1000
+
+
+def rescan(session, amount: float):
+    """Ancienne façon de faire : relire les montants de la catégorie"""
+    from sqlalchemy import select
+    from app.models import CategoryEnum, Transaction
+
+    amounts = np.array(session.scalars(select(Transaction.amount).where(
+        Transaction.user_id == 1, Transaction.category == CategoryEnum.ALIMENTATION,
+        Transaction.transaction_type == "expense",
+    )).all())
+    return (amount - amounts.mean()) / amounts.std(), np.quantile(amounts, 0.99)
+
+
+async def cost(args):
+    configure_database("anomalies")
+    app = load_app()
+    from app.models import CategoryEnum
+    from app.models.database import dispose_engines, get_engine
+    from app.services.anomalies import rebuild_spending_stats, record_expense
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'dépenses':>9}{'POST /transactions/ (ms)':>26}{'record_expense (ms)':>21}"
+          f"{'grand écart (ms)':>18}{'relecture (ms)':>16}")
+    seeded = 0
+    async with app.router.lifespan_context(app):
+        async with asgi_client(app) as client:
+            for size in sorted(args.history):
+                seed_history(size - seeded, seeded, rng)
+                seeded = size
+                with get_engine().begin() as conn:
+                    rebuild_spending_stats(conn, 1)
+
+                latencies = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await client.post("/transactions/?user_id=1",
+                                                 json={"amount": 2500, "category": "alimentation"})
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                usual = time_in_rollback(
+                    lambda s: record_expense(s, 1, CategoryEnum.ALIMENTATION, 2500.0), args.repeat)
+                large = time_in_rollback(
+                    lambda s: record_expense(s, 1, CategoryEnum.ALIMENTATION, 90000.0), args.repeat)
+                naive = time_in_rollback(lambda s: rescan(s, 2500.0), args.repeat)
+                print(f"{size:>9}{statistics.mean(latencies) * 1000:>26.2f}{usual:>21.3f}"
+                      f"{large:>18.3f}{naive:>16.2f}")
+    await dispose_engines()
+
+
+def quality(args):
+    from app.services.anomalies import ANOMALY_MIN_COUNT, ANOMALY_TAIL, deviation
+    from app.utils.stats import RunningStats, sketch_bucket
+
+    rng = np.random.default_rng(args.seed)
+    flagged = {"normal": 0, "exceptionnel": 0}
+    legacy = {"normal": 0, "exceptionnel": 0}
+    totals = {"normal": 0, "exceptionnel": 0}
+    judged = 0
+
+    for _ in range(args.users):
+        median = rng.lognormal(np.log(3000), 0.8)
+        sigma = rng.uniform(0.3, 0.9)
+        count = int(rng.integers(20, 400))
+        amounts = rng.lognormal(np.log(median), sigma, count)
+        exceptional = rng.random(count) < OUTLIER_SHARE
+        amounts[exceptional] = median * rng.uniform(8, 30, int(exceptional.sum()))
+
+        stats, buckets = RunningStats(), {}
+        for amount, kind in zip(np.round(amounts, -1), np.where(exceptional, "exceptionnel", "normal")):
+            bucket = sketch_bucket(amount)
+            if stats.count >= ANOMALY_MIN_COUNT:
+                judged += 1
+                totals[kind] += 1
+                above = sum(n for b, n in buckets.items() if b >= bucket)
+                flagged[kind] += deviation(stats, amount) is not None and above <= ANOMALY_TAIL * stats.count
+                legacy[kind] += amount > LEGACY_THRESHOLD
+            stats.add(amount)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    print(f"\n{args.users} utilisateurs, {judged} dépenses jugées ({totals['exceptionnel']} exceptionnelles)")
+    print(f"{'règle':<28}{'fausses alertes':>16}{'exceptionnelles signalées':>27}")
+    for name, counts in (("statistiques par catégorie", flagged), (f"seuil fixe {LEGACY_THRESHOLD:,}", legacy)):
+        print(f"{name:<28}{counts['normal'] / totals['normal']:>16.2%}"
+              f"{counts['exceptionnel'] / totals['exceptionnel']:>27.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000], help="dépenses")
+    parser.add_argument("--users", type=int, default=2000, help="utilisateurs synthétiques (qualité)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(cost(args))
+    quality(args)
+
+
+if __name__ == "__main__":
+    main()
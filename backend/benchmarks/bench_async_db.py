@@ -0,0 +1,96 @@
+"""
+Comparer le débit des routes en mode synchrone (Session dans le threadpool)
+et en mode async (AsyncSession) sur /transactions et /ai/sika.
+
+    python -m benchmarks.bench_async_db --concurrency 100 --requests 2000
+
+Chaque mode tourne dans un sous-processus car DB_ASYNC est lu à l'import.
+Pour mesurer contre Postgres : BENCH_DATABASE_URL=postgresql://... (base jetable).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, hammer, load_app
+
+SIKA_QUERY = {"query": "Est-ce que je peux acheter un repas à 3500 francs ?"}
+
+
+def seed(transactions: int):
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.goal import Goal
+    from app.models.transaction import Transaction
+
+    db = SessionLocal()
+    categories = list(CategoryEnum)
+    for category in categories:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=25000))
+    db.add(Goal(user_id=1, name="Moto", target_amount=500000, current_amount=120000))
+    db.add_all(
+        Transaction(
+            user_id=1,
+            amount=500 + (i * 37) % 20000,
+            category=categories[i % len(categories)],
+            transaction_type="expense",
+        )
+        for i in range(transactions)
+    )
+    db.commit()
+    db.close()
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+    seed(args.transactions)
+    results = {}
+    async with asgi_client(app) as client:
+        # Échauffement : ouverture des connexions du pool
+        await hammer(client, "GET", "/transactions/?user_id=1", args.concurrency, args.concurrency)
+        results["GET /transactions"] = await hammer(
+            client, "GET", "/transactions/?user_id=1&limit=50", args.concurrency, args.requests
+        )
+        results["POST /ai/sika"] = await hammer(
+            client, "POST", "/ai/sika?user_id=1", args.concurrency, args.requests, json=SIKA_QUERY
+        )
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        configure_database(f"async_db_{args.mode}")
+        os.environ["DB_ASYNC"] = "true" if args.mode == "async" else "false"
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {}
+    for mode in ("sync", "async"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_async_db", "--mode", mode,
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests),
+             "--transactions", str(args.transactions)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'endpoint':<22}{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint in report["sync"]:
+        for mode in ("sync", "async"):
+            r = report[mode][endpoint]
+            print(f"{endpoint:<22}{mode:<8}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Cache du contexte financier : requêtes SQL et débit d'une conversation Sika.
+
+    python -m benchmarks.bench_context --requests 2000 --concurrency 20
+
+Pour chaque backend (none, memory), dans un sous-processus car
+CONTEXT_CACHE_BACKEND est lu à l'import : une rafale de POST /ai/sika
+entrecoupée d'une dépense toutes les --write-every requêtes (qui invalide
+le contexte). On compte les requêtes SQL émises par appel à /ai/sika et on
+vérifie que la réponse suivant chaque dépense voit le nouveau solde.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, latency_stats, load_app
+
+SIKA_QUERY = {"query": "combien il me reste ?"}
+EXPENSE = {"amount": 100, "category": "alimentation", "transaction_type": "expense"}
+
+
+def seed():
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.goal import Goal
+
+    db = SessionLocal()
+    for category in CategoryEnum:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=25000))
+    for i in range(5):
+        db.add(Goal(user_id=1, name=f"Objectif {i}", target_amount=500000, current_amount=1000 * i))
+    db.commit()
+    db.close()
+
+
+def count_statements():
+    from sqlalchemy import event
+    from app.models.database import async_engine, engine
+
+    counter = {"statements": 0}
+
+    def on_execute(*_):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+    return counter
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+    from app.models.budget import CategoryEnum
+    seed()
+    counter = count_statements()
+
+    latencies: List[float] = []
+    stale = 0
+    async with asgi_client(app) as client:
+        await client.post("/ai/sika?user_id=1", json=SIKA_QUERY)
+        sika_statements = 0
+        start = time.perf_counter()
+        expected_spent = 25000 * len(CategoryEnum)
+        for batch_start in range(0, args.requests, args.write_every):
+            batch = min(args.write_every, args.requests - batch_start)
+            # Dépense : invalide le contexte, la réponse suivante doit la voir
+            (await client.post("/transactions/?user_id=1", json=EXPENSE)).raise_for_status()
+            expected_spent += EXPENSE["amount"]
+
+            before = counter["statements"]
+            first = await client.post("/ai/sika?user_id=1", json=SIKA_QUERY)
+            if first.json()["context"]["total_spent"] != expected_spent:
+                stale += 1
+
+            async def sika():
+                t = time.perf_counter()
+                await client.post("/ai/sika?user_id=1", json=SIKA_QUERY)
+                latencies.append(time.perf_counter() - t)
+
+            for chunk in range(0, batch - 1, args.concurrency):
+                await asyncio.gather(*(sika() for _ in range(min(args.concurrency, batch - 1 - chunk))))
+            sika_statements += counter["statements"] - before
+        elapsed = time.perf_counter() - start
+
+    await dispose_engines()
+    stats = latency_stats(latencies, elapsed)
+    stats["sql_per_request"] = round(sika_statements / args.requests, 2)
+    stats["stale_reads"] = stale
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--write-every", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=["none", "memory"])
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        configure_database(f"context_{args.backend}")
+        os.environ["CONTEXT_CACHE_BACKEND"] = args.backend
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {}
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_context", "--backend", backend,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+             "--write-every", str(args.write_every)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report[backend] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'backend':<9}{'SQL/req':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'périmés':>9}")
+    for backend, r in report.items():
+        print(f"{backend:<9}{r['sql_per_request']:>9}{r['rps']:>9}{r['p50_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['stale_reads']:>9}")
+    sys.exit(1 if any(r["stale_reads"] for r in report.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
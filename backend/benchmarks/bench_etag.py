@@ -0,0 +1,141 @@
+"""
+GET conditionnels : octets transférés et requêtes SQL d'une session type de l'application.
+
+    python -m benchmarks.bench_etag --screens 300 --write-every 10
+
+Une « ouverture d'écran » rejoue les appels de l'application mobile :
+budgets, objectifs et transactions (liste + résumé). Une dépense est
+enregistrée tous les --write-every écrans. Deux utilisateurs identiques
+rejouent la même session, l'un sans If-None-Match, l'autre en renvoyant
+l'ETag reçu pour chaque URL. Le script vérifie qu'après chaque écriture
+aucun 304 n'est servi pour une ressource qui a changé.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict
+
+from benchmarks.common import asgi_client, configure_database, load_app, seed_transactions
+
+SCREEN = [
+    "/budgets/",
+    "/budgets/summary",
+    "/goals/",
+    "/goals/summary",
+    "/transactions/?limit=50",
+    "/transactions/summary",
+]
+EXPENSE = {"amount": 100, "category": "alimentation", "transaction_type": "expense"}
+
+
+def seed(user_id: int, transactions: int, offset: int):
+    from app.models.database import SessionLocal, engine
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.goal import Goal
+    from app.models.user import User
+    from app.services.rollups import rebuild_rollups
+
+    db = SessionLocal()
+    db.add(User(id=user_id, email=f"{user_id}@bench", username=f"u{user_id}", phone=str(user_id),
+                hashed_password="x"))
+    for category in CategoryEnum:
+        db.add(Budget(user_id=user_id, category=category, monthly_limit=100000, current_spent=25000))
+    for i in range(5):
+        db.add(Goal(user_id=user_id, name=f"Objectif {i}", target_amount=500000, current_amount=1000 * i))
+    db.commit()
+    db.close()
+    seed_transactions(user_id, transactions, offset=offset)
+    with engine.begin() as conn:
+        rebuild_rollups(conn, user_id)
+
+
+def count_statements():
+    from sqlalchemy import event
+    from app.models.database import async_engine, engine
+
+    counter = {"statements": 0}
+
+    def on_execute(*_):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+    return counter
+
+
+async def replay(client, counter, user_id: int, args, conditional: bool) -> Dict[str, float]:
+    etags: Dict[str, str] = {}
+    bodies: Dict[str, bytes] = {}
+    stats = {"requests": 0, "not_modified": 0, "bytes": 0, "statements": 0, "stale": 0}
+    elapsed = 0.0
+
+    for screen in range(args.screens):
+        if screen and screen % args.write_every == 0:
+            response = await client.post(f"/transactions/?user_id={user_id}", json=EXPENSE)
+            response.raise_for_status()
+
+        for path in SCREEN:
+            url = f"{path}{'&' if '?' in path else '?'}user_id={user_id}"
+            headers = {"If-None-Match": etags[url]} if conditional and url in etags else {}
+            before = counter["statements"]
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            elapsed += time.perf_counter() - start
+            stats["statements"] += counter["statements"] - before
+            stats["requests"] += 1
+            stats["bytes"] += len(response.content)
+
+            if response.status_code == 304:
+                stats["not_modified"] += 1
+                # Contrôle : la ressource n'a réellement pas changé
+                fresh = await client.get(url)
+                if fresh.content != bodies[url]:
+                    stats["stale"] += 1
+                continue
+            response.raise_for_status()
+            etags[url] = response.headers["ETag"]
+            bodies[url] = response.content
+
+    stats["ms_per_request"] = round(elapsed / stats["requests"] * 1000, 3)
+    stats["sql_per_request"] = round(stats["statements"] / stats["requests"], 2)
+    return stats
+
+
+async def run(args):
+    configure_database("etag")
+    app = load_app()
+    from app.models.database import dispose_engines
+    seed(1, args.transactions, offset=0)
+    seed(2, args.transactions, offset=args.transactions)
+    counter = count_statements()
+
+    async with asgi_client(app) as client:
+        plain = await replay(client, counter, 1, args, conditional=False)
+        conditional = await replay(client, counter, 2, args, conditional=True)
+    await dispose_engines()
+    return plain, conditional
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--screens", type=int, default=300)
+    parser.add_argument("--write-every", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=5000)
+    args = parser.parse_args()
+
+    plain, conditional = asyncio.run(run(args))
+    print(f"{'client':<16}{'requêtes':>10}{'304':>7}{'octets':>12}{'SQL/req':>9}{'ms/req':>9}")
+    for name, r in (("sans ETag", plain), ("If-None-Match", conditional)):
+        print(f"{name:<16}{r['requests']:>10}{r['not_modified']:>7}{r['bytes']:>12,}"
+              f"{r['sql_per_request']:>9}{r['ms_per_request']:>9}")
+    print(f"octets économisés : {1 - conditional['bytes'] / plain['bytes']:.1%}, "
+          f"requêtes SQL : {1 - conditional['statements'] / plain['statements']:.1%}")
+    if conditional["stale"]:
+        print(f"ERREUR : {conditional['stale']} réponse(s) 304 sur une ressource modifiée")
+    sys.exit(1 if conditional["stale"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Pic de mémoire (RSS) pendant l'export de l'historique complet d'un utilisateur
+via GET /transactions/export.
+
+    python -m benchmarks.bench_export --transactions 1000000 [--format ndjson]
+
+L'application est appelée directement en ASGI et chaque morceau de la
+réponse est compté puis jeté (httpx.ASGITransport, lui, accumule tout le
+corps) : la croissance du RSS mesure donc le coût côté serveur.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import configure_database, load_app, peak_rss_mb, seed_transactions
+
+
+async def stream_get(app, path: str, query: str):
+    """Appeler une route GET en ASGI ; retourne (octets, lignes) reçus"""
+    received = 0
+    lines = 0
+
+    requested = asyncio.Event()
+
+    async def receive():
+        # Premier appel : corps vide ; ensuite, attendre (pas de déconnexion)
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal received, lines
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received += len(body)
+            lines += body.count(b"\n")
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "headers": [], "server": ("bench", 80),
+        "client": ("bench", 1234), "root_path": "",
+    }
+    await app(scope, receive, send)
+    return received, lines
+
+
+async def run(args):
+    configure_database("export")
+    app = load_app()
+    from app.models.database import dispose_engines
+
+    seed_transactions(user_id=1, count=args.transactions)
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    received, lines = await stream_get(app, "/transactions/export", f"user_id=1&format={args.format}")
+    elapsed = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+    await dispose_engines()
+
+    print(f"{lines:,} lignes, {received / 1024 / 1024:.0f} Mo exportés ({args.format}) en {elapsed:.1f} s")
+    print(f"pic RSS : {rss_after:.0f} Mo (+{rss_after - rss_before:.0f} Mo pendant l'export)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
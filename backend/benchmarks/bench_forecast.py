@@ -0,0 +1,200 @@
+"""
+Prévision de fin de mois (POST /ai/predict) : coût selon la longueur de
+l'historique, puis précision face à l'ancienne extrapolation linéaire.
+
+    python -m benchmarks.bench_forecast --history 90 365 1825 3650 --per-day 20 --users 2000
+
+Coût : l'historique de l'utilisateur 1 est prolongé vers le passé
+(--per-day dépenses par jour). Pour chaque longueur, meilleure latence de
+POST /ai/predict et de l'ajustement seul sur la fenêtre
+FORECAST_LOOKBACK_DAYS, comparée au même ajustement sur tout l'historique.
+
+Précision (NumPy seul, sans base) : --users utilisateurs synthétiques
+(tendance, profil par jour de semaine, jours sans dépense, achats
+ponctuels) sur plusieurs mois calendaires ; total du mois prévu au soir du
+jour 5, 10, 15, 20 et 25. Erreur absolue moyenne (en % du total réel) de
+l'ancienne méthode (mois de 30 jours, rythme moyen depuis le 1er), des deux
+modèles seuls et du modèle retenu par catégorie ; couverture de
+l'intervalle à FORECAST_INTERVAL.
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import asgi_client, configure_database, load_app
+
+CUTOFFS = [5, 10, 15, 20, 25]
+MONTHS = [date(2025, month, 1) for month in range(1, 13)]
+
+# Catégorie : (probabilité d'une dépense un jour donné, montant médian,
+# dispersion, facteurs du lundi au dimanche)
+PROFILES = {
+    "alimentation": (0.8, 3000, 0.5, [1.0, 0.9, 0.9, 1.0, 1.3, 2.0, 1.6]),
+    "transport": (0.7, 1500, 0.3, [1.2, 1.2, 1.2, 1.2, 1.2, 0.3, 0.1]),
+    "loisirs": (0.15, 8000, 0.8, [0.5, 0.5, 0.5, 0.7, 1.5, 2.5, 1.8]),
+}
+
+
+def seed_history(user_id: int, first_day: int, last_day: int, per_day: int, rng: np.random.Generator):
+    """Dépenses des jours [first_day, last_day[ avant aujourd'hui, par lots"""
+    from sqlalchemy import insert
+    from app.models import CategoryEnum, Transaction
+    from app.models.database import get_engine
+
+    categories = list(CategoryEnum)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    with get_engine().begin() as conn:
+        for chunk in range(first_day, last_day, 200):
+            days = np.repeat(np.arange(chunk, min(chunk + 200, last_day)), per_day)
+            seconds = rng.random(len(days)) * 86400
+            amounts = np.round(rng.lognormal(np.log(2000), 0.7, len(days)), -1)
+            picked = rng.integers(0, 5, len(days))
+            conn.execute(insert(Transaction), [
+                {
+                    "user_id": user_id,
+                    "amount": float(amounts[i]),
+                    "category": categories[picked[i]],
+                    "transaction_type": "expense",
+                    "was_approved": True,
+                    "created_at": today - timedelta(days=int(days[i])) + timedelta(seconds=float(seconds[i])),
+                }
+                for i in range(len(days))
+            ])
+
+
+def seed_budgets(user_id: int):
+    from sqlalchemy import insert
+    from app.models import Budget, CategoryEnum
+    from app.models.database import get_engine
+
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    with get_engine().begin() as conn:
+        conn.execute(insert(Budget), [
+            {"user_id": user_id, "category": category, "monthly_limit": 100000.0,
+             "current_spent": 20000.0, "period_start": month_start}
+            for category in list(CategoryEnum)[:5]
+        ])
+
+
+async def best_ms(call, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def cost(args):
+    configure_database("forecast")
+    app = load_app()
+    from app.models.database import dispose_engines, session_scope
+    from app.services.forecasting import FORECAST_LOOKBACK_DAYS, fit_user
+
+    rng = np.random.default_rng(args.seed)
+    seed_budgets(1)
+    today = datetime.utcnow().date()
+
+    async def predict():
+        response = await client.post("/ai/predict?user_id=1")
+        response.raise_for_status()
+
+    async def fit(lookback: int):
+        async with session_scope() as db:
+            await fit_user(db, 1, today, lookback=lookback)
+
+    print(f"{'jours':>7}{'transactions':>14}{'/ai/predict (ms)':>18}"
+          f"{f'fenêtre {FORECAST_LOOKBACK_DAYS} j (ms)':>22}{'tout l historique (ms)':>24}")
+    seeded = 0
+    async with app.router.lifespan_context(app):
+        async with asgi_client(app) as client:
+            for days in sorted(args.history):
+                seed_history(1, seeded + 1, days + 1, args.per_day, rng)
+                seeded = days
+                predict_ms = await best_ms(predict, args.repeat)
+                window_ms = await best_ms(lambda: fit(FORECAST_LOOKBACK_DAYS), args.repeat)
+                full_ms = await best_ms(lambda: fit(days + 1), args.repeat)
+                print(f"{days:>7}{days * args.per_day:>14}{predict_ms:>18.2f}{window_ms:>22.2f}{full_ms:>24.2f}")
+    await dispose_engines()
+
+
+def synthetic(rng: np.random.Generator, users: int, first_day: date, days: int) -> np.ndarray:
+    """Dépenses journalières (utilisateurs × catégories, jours)"""
+    weekdays = (first_day.weekday() + np.arange(days)) % 7
+    rows = []
+    for probability, median, sigma, factors in PROFILES.values():
+        level = rng.lognormal(0, 0.5, (users, 1))
+        trend = 1 + rng.normal(0, 0.3, (users, 1)) * np.arange(days) / 365
+        shape = np.array(factors)[weekdays] ** rng.uniform(0, 1.5, (users, 1))
+        spends = rng.random((users, days)) < np.minimum(1.0, probability * shape)
+        amounts = rng.lognormal(np.log(median), sigma, (users, days)) * level * trend
+        rows.append(spends * np.maximum(0.0, amounts))
+    return np.concatenate(rows)
+
+
+def accuracy(args):
+    from app.services.forecasting import (
+        FORECAST_INTERVAL, FORECAST_LOOKBACK_DAYS, bounds, fit, fit_series, horizon, project
+    )
+
+    rng = np.random.default_rng(args.seed)
+    errors: Dict[str, List[float]] = {"linéaire (30 j)": [], "ewma": [], "weekday": [], "retenu": []}
+    covered: List[np.ndarray] = []
+    totals: List[float] = []
+
+    for month_start in MONTHS:
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        length = (month_end - month_start).days
+        first_day = month_start - timedelta(days=FORECAST_LOOKBACK_DAYS)
+        series = synthetic(rng, args.users, first_day, FORECAST_LOOKBACK_DAYS + length)
+        month = series[:, FORECAST_LOOKBACK_DAYS:]
+        actual = month.sum(axis=1)
+        end = datetime.combine(month_end, datetime.min.time())
+
+        for day in CUTOFFS:
+            # Au soir du jour `day` (minuit) : l'ancienne route lisait today.day = day + 1
+            now = datetime.combine(month_start + timedelta(days=day), datetime.min.time())
+            spent = month[:, :day].sum(axis=1)
+            history = series[:, :FORECAST_LOOKBACK_DAYS + day]
+            weights, ahead = horizon(now, end)
+            weekdays = (first_day.weekday() + np.arange(history.shape[1])) % 7
+
+            legacy = spent + spent / (day + 1) * (30 - (day + 1))
+            predictions = {"linéaire (30 j)": legacy}
+            for name, by_weekday in (("ewma", False), ("weekday", True)):
+                predictions[name] = spent + project(fit(history, weekdays, by_weekday), weights, ahead)[0]
+            mean, sd = project(fit_series(history, first_day), weights, ahead)
+            predictions["retenu"] = spent + mean
+            low, high = bounds(mean, sd)
+            covered.append((actual >= spent + low) & (actual <= spent + high))
+
+            for name, predicted in predictions.items():
+                errors[name].append(float(np.abs(predicted - actual).sum()))
+            totals.append(float(actual.sum()))
+
+    scale = sum(totals)
+    print(f"\n{args.users * len(PROFILES)} séries × {len(MONTHS)} mois × jours {CUTOFFS}")
+    print(f"{'méthode':<18}{'erreur absolue moyenne':>24}")
+    for name, values in errors.items():
+        print(f"{name:<18}{sum(values) / scale:>23.1%}")
+    print(f"couverture de l'intervalle à {FORECAST_INTERVAL:.0%} : {np.concatenate(covered).mean():.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[90, 365, 1825, 3650], help="jours")
+    parser.add_argument("--per-day", type=int, default=20)
+    parser.add_argument("--users", type=int, default=2000, help="utilisateurs synthétiques (précision)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(cost(args))
+    accuracy(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Clés d'idempotence : coût d'une nouvelle tentative et doublons simultanés.
+
+    python -m benchmarks.bench_idempotency --requests 300 --keys 100 --duplicates 10
+
+Pour chaque mode (sync, async), dans un sous-processus car DB_ASYNC est lu
+à l'import :
+1. --requests dépenses sans clé, puis avec une clé neuve, puis la même
+   requête rejouée avec la même clé : latence, requêtes SQL et écritures
+   SQL (INSERT / UPDATE / DELETE) par requête ;
+2. --keys clés envoyées --duplicates fois chacune, toutes simultanément
+   (une tentative réseau qui part avant la réponse de la première) : une
+   seule transaction et un seul débit par clé, le même identifiant dans
+   toutes les réponses d'une clé.
+
+Le script se termine en erreur si une nouvelle tentative écrit en base ou
+si un doublon simultané crée une transaction ou débite le budget. Sous
+SQLite, un envoi peut échouer sur « database is locked » (attente du verrou
+d'écriture > 5 s) : il n'écrit rien et l'application le renverra.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, latency_stats, load_app
+
+AMOUNT = 7.0
+EXPENSE = {"amount": AMOUNT, "category": "alimentation"}
+
+
+def seed(user_id: int):
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.user import User
+
+    db = SessionLocal()
+    db.add(User(id=user_id, email=f"{user_id}@bench", username=f"u{user_id}", phone=str(user_id),
+                hashed_password="x"))
+    db.add(Budget(user_id=user_id, category=CategoryEnum.ALIMENTATION, monthly_limit=1e9, current_spent=0.0))
+    db.commit()
+    db.close()
+
+
+def budget_state(user_id: int):
+    from sqlalchemy import func, select
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget
+    from app.models.transaction import Transaction
+
+    db = SessionLocal()
+    try:
+        spent = db.scalar(select(Budget.current_spent).where(Budget.user_id == user_id))
+        count = db.scalar(select(func.count(Transaction.id)).where(Transaction.user_id == user_id))
+        return spent, count
+    finally:
+        db.close()
+
+
+def count_statements():
+    from sqlalchemy import event
+    from app.models.database import async_engine, engine
+
+    counter = {"statements": 0, "writes": 0}
+
+    def on_execute(conn, cursor, statement, *_):
+        counter["statements"] += 1
+        if statement.lstrip().split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            counter["writes"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+    return counter
+
+
+async def sequential(client, counter, user_id: int, keys: List[str]) -> Dict[str, float]:
+    """Une requête par élément de `keys` (None : sans en-tête)"""
+    latencies: List[float] = []
+    before = dict(counter)
+    start = time.perf_counter()
+    for key in keys:
+        headers = {"Idempotency-Key": key} if key else {}
+        t = time.perf_counter()
+        response = await client.post(f"/transactions/?user_id={user_id}", json=EXPENSE, headers=headers)
+        latencies.append(time.perf_counter() - t)
+        response.raise_for_status()
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["sql_per_request"] = round((counter["statements"] - before["statements"]) / len(keys), 2)
+    stats["writes_per_request"] = round((counter["writes"] - before["writes"]) / len(keys), 2)
+    return stats
+
+
+async def duplicates(client, user_id: int, keys: int, copies: int) -> Dict[str, float]:
+    responses: Dict[str, set] = {}
+    errors: Dict[str, int] = {}
+
+    async def send(key: str):
+        try:
+            response = await client.post(
+                f"/transactions/?user_id={user_id}", json=EXPENSE, headers={"Idempotency-Key": key}
+            )
+        except Exception as e:
+            # Erreur remontée par l'application (ex. SQLite : database is locked)
+            error = str(getattr(e, "orig", None) or type(e).__name__)
+            errors[error] = errors.get(error, 0) + 1
+            return
+        if response.status_code != 200:
+            errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            return
+        responses.setdefault(key, set()).add(response.json()["id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(f"dup-{k}") for k in range(keys) for _ in range(copies)))
+    elapsed = time.perf_counter() - start
+
+    spent, count = budget_state(user_id)
+    return {
+        "sent": keys * copies,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "elapsed_s": round(elapsed, 2),
+        "transactions": count,
+        # Une clé dont tous les envois ont échoué n'a rien écrit
+        "expected_transactions": len(responses),
+        "final_spent": spent,
+        "expected_spent": len(responses) * AMOUNT,
+        "diverging_ids": sum(len(ids) > 1 for ids in responses.values()),
+    }
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+    for user_id in (1, 2):
+        seed(user_id)
+    counter = count_statements()
+
+    keys = [f"seq-{i}" for i in range(args.requests)]
+    async with asgi_client(app) as client:
+        results = {
+            "no_key": await sequential(client, counter, 1, [None] * args.requests),
+            "first": await sequential(client, counter, 1, keys),
+            "retry": await sequential(client, counter, 1, keys),
+            "duplicates": await duplicates(client, 2, args.keys, args.duplicates),
+        }
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--duplicates", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        configure_database(f"idempotency_{args.mode}")
+        os.environ["DB_ASYNC"] = "true" if args.mode == "async" else "false"
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {}
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_idempotency", "--mode", mode,
+             "--requests", str(args.requests), "--keys", str(args.keys),
+             "--duplicates", str(args.duplicates)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<7}{'requête':<10}{'SQL/req':>9}{'écritures':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    failed = False
+    for mode, r in report.items():
+        for name in ("no_key", "first", "retry"):
+            s = r[name]
+            print(f"{mode:<7}{name:<10}{s['sql_per_request']:>9}{s['writes_per_request']:>11}"
+                  f"{s['p50_ms']:>9}{s['p99_ms']:>9}")
+        d = r["duplicates"]
+        print(f"{mode:<7}doublons : {d['sent']} envois, {d['transactions']}/{d['expected_transactions']} "
+              f"transactions, débit {d['final_spent']:,.0f}/{d['expected_spent']:,.0f}, "
+              f"{d['errors']} erreurs, {d['diverging_ids']} clés aux réponses divergentes, {d['elapsed_s']} s")
+        if d["error_types"]:
+            print(f"  {mode} doublons, erreurs : {d['error_types']}")
+        # Seule erreur tolérée : le délai d'attente du verrou d'écriture SQLite
+        unexpected = set(d["error_types"]) - {"database is locked"}
+        if (r["retry"]["writes_per_request"] or unexpected or d["diverging_ids"]
+                or d["transactions"] != d["expected_transactions"] or d["final_spent"] != d["expected_spent"]):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
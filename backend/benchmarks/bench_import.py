@@ -0,0 +1,79 @@
+"""
+Import de N transactions via POST /transactions/import (CSV ou NDJSON) :
+durée, débit et pic de mémoire (RSS) du processus.
+
+    python -m benchmarks.bench_import --rows 100000 [--format ndjson] [--score]
+
+Le corps est généré et envoyé par morceaux : ni le client ni le serveur
+ne le matérialisent en entier.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import asgi_client, configure_database, load_app, peak_rss_mb
+
+CATEGORIES = ["alimentation", "transport", "logement", "sante", "loisirs", "communication"]
+
+
+async def body(rows: int, fmt: str, chunk_rows: int = 2000):
+    if fmt == "csv":
+        yield b"amount,category,description,transaction_type,created_at\n"
+    for start in range(0, rows, chunk_rows):
+        lines = []
+        for i in range(start, min(start + chunk_rows, rows)):
+            amount = 500 + (i * 7919) % 25000
+            category = CATEGORIES[i % len(CATEGORIES)]
+            day = f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00"
+            if fmt == "csv":
+                lines.append(f"{amount},{category},ligne {i},expense,{day}")
+            else:
+                lines.append(json.dumps({"amount": amount, "category": category,
+                                         "description": f"ligne {i}", "created_at": day}))
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def run(args):
+    configure_database("import")
+    app = load_app()
+    from app.models.database import SessionLocal, dispose_engines
+    from app.models.budget import Budget, CategoryEnum
+
+    db = SessionLocal()
+    for category in CATEGORIES:
+        db.add(Budget(user_id=1, category=CategoryEnum(category), monthly_limit=10_000_000))
+    db.commit()
+    db.close()
+
+    content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+    async with asgi_client(app) as client:
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        response = await client.post(
+            f"/transactions/import?user_id=1&score={str(args.score).lower()}",
+            content=body(args.rows, args.format),
+            headers={"content-type": content_type},
+            timeout=None,
+        )
+        elapsed = time.perf_counter() - start
+        rss_after = peak_rss_mb()
+    await dispose_engines()
+
+    report = response.json()
+    print(f"{report['imported']} lignes importées, {report['failed']} rejetées "
+          f"({args.format}, score={args.score})")
+    print(f"durée : {elapsed:.2f} s  ({report['imported'] / elapsed:,.0f} lignes/s)")
+    print(f"pic RSS : {rss_after:.0f} Mo (+{rss_after - rss_before:.0f} Mo pendant l'import)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--score", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
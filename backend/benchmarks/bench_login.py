@@ -0,0 +1,127 @@
+"""
+Afflux de connexions : débit de /auth/login et latence de /budgets pendant l'afflux.
+
+    python -m benchmarks.bench_login --logins 200 --login-concurrency 50
+
+Pour chaque mode de l'exécuteur bcrypt (thread, process), dans un
+sous-processus : latence de GET /budgets au repos, puis la même charge
+pendant que `--login-concurrency` clients se connectent en boucle.
+Les réponses 503 (file bcrypt pleine) sont comptées à part.
+BCRYPT_ROUNDS et PASSWORD_HASHER_* sont transmis tels quels.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, hammer, latency_stats, load_app
+
+EMAIL = "bench@example.com"
+PASSWORD = "mot-de-passe-de-test"
+
+
+def seed():
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.user import User
+    from app.services.passwords import pwd_context
+
+    db = SessionLocal()
+    db.add(User(email=EMAIL, username="bench", phone="000", hashed_password=pwd_context.hash(PASSWORD)))
+    for category in CategoryEnum:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=25000))
+    db.commit()
+    db.close()
+
+
+async def login_storm(client, concurrency: int, total: int) -> dict:
+    latencies: List[float] = []
+    rejected = 0
+    failed = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, rejected, failed
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            elif response.status_code == 503:
+                rejected += 1
+            else:
+                failed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["rejected_503"] = rejected
+    stats["errors"] = failed
+    return stats
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+    from app.services.passwords import hasher
+    seed()
+
+    results = {}
+    async with asgi_client(app) as client:
+        await hammer(client, "GET", "/budgets/?user_id=1", args.concurrency, args.concurrency)
+        results["budgets_idle"] = await hammer(
+            client, "GET", "/budgets/?user_id=1", args.concurrency, args.requests
+        )
+
+        storm = asyncio.ensure_future(login_storm(client, args.login_concurrency, args.logins))
+        # Laisser la file bcrypt se remplir avant de mesurer
+        await asyncio.sleep(0.05)
+        results["budgets_storm"] = await hammer(
+            client, "GET", "/budgets/?user_id=1", args.concurrency, args.requests
+        )
+        results["login"] = await storm
+    await dispose_engines()
+    hasher.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"])
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        configure_database(f"login_{args.mode}")
+        os.environ["PASSWORD_HASHER_MODE"] = args.mode
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {}
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_login", "--mode", mode,
+             "--logins", str(args.logins), "--login-concurrency", str(args.login_concurrency),
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<9}{'logins/s':>10}{'login p99':>11}{'503':>6}"
+          f"{'budgets p99 repos':>19}{'budgets p99 afflux':>20}")
+    for mode, r in report.items():
+        print(f"{mode:<9}{r['login']['rps']:>10}{r['login']['p99_ms']:>11}{r['login']['rejected_503']:>6}"
+              f"{r['budgets_idle']['p99_ms']:>19}{r['budgets_storm']['p99_ms']:>20}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Surcoût du middleware de métriques par requête.
+
+    python -m benchmarks.bench_metrics --requests 5000 --concurrency 50
+
+Pour METRICS_ENABLED=false puis true, dans un sous-processus car la
+variable est lue à l'import, et pour trois routes :
+- GET /health/live : route sans base, le surcoût y est le plus visible ;
+- GET /budgets/ : lecture en base (SELECT de version + SELECT des budgets) ;
+- POST /ai/sika : requête complète (contexte, NLU, score, compteurs métier).
+
+Chaque route est d'abord appelée une à une (latence) puis avec
+--concurrency clients (débit). Les deux configurations sont lancées en
+alternance --rounds fois ; on garde la meilleure médiane de chacune. Enfin
+GET /metrics est mesuré après la charge (coût d'un scrape).
+
+D'un processus à l'autre, le bruit (fréquence CPU, cache) dépasse le coût
+du middleware : celui-ci est aussi mesuré seul, dans un même processus,
+autour d'une application ASGI vide (--iterations appels, en alternance
+avec l'application nue).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, hammer, latency_stats, load_app
+
+ROUTES = [
+    ("GET /health/live", "GET", "/health/live", None),
+    ("GET /budgets/", "GET", "/budgets/?user_id=1", None),
+    ("POST /ai/sika", "POST", "/ai/sika?user_id=1", {"query": "j'ai payé 3500 francs pour manger"}),
+]
+
+
+def seed():
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+
+    db = SessionLocal()
+    for category in CategoryEnum:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=25000))
+    db.commit()
+    db.close()
+
+
+async def sequential(client, method: str, path: str, body, total: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(total):
+        t = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        latencies.append(time.perf_counter() - t)
+        response.raise_for_status()
+    return latency_stats(latencies, time.perf_counter() - start)
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+    seed()
+
+    results = {}
+    async with asgi_client(app) as client:
+        for name, method, path, body in ROUTES:
+            await sequential(client, method, path, body, 200)  # échauffement
+            best = None
+            for _ in range(args.passes):
+                stats = await sequential(client, method, path, body, args.requests // args.passes)
+                if best is None or stats["p50_ms"] < best["p50_ms"]:
+                    best = stats
+            best["concurrent_rps"] = (await hammer(
+                client, method, path, args.concurrency, args.requests, json=body
+            ))["rps"]
+            results[name] = best
+
+        if os.environ["METRICS_ENABLED"] == "true":
+            scrape = await sequential(client, "GET", "/metrics", None, 50)
+            results["scrape"] = scrape
+            results["scrape"]["bytes"] = len((await client.get("/metrics")).content)
+    await dispose_engines()
+    return results
+
+
+async def middleware_cost(iterations: int) -> Dict[str, float]:
+    """Coût propre du middleware en ns par requête, hors framework et base"""
+    from types import SimpleNamespace
+    from app.services.metrics import MetricsMiddleware
+
+    async def endpoint():
+        pass
+
+    async def bare(scope, receive, send):
+        scope["endpoint"] = endpoint  # ce que fait le routeur
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def send(message):
+        pass
+
+    app = SimpleNamespace(routes=[SimpleNamespace(endpoint=endpoint, path="/bench")])
+    wrapped = MetricsMiddleware(bare)
+    best = {"bare": float("inf"), "wrapped": float("inf")}
+    for _ in range(10):
+        for name, target in (("bare", bare), ("wrapped", wrapped)):
+            start = time.perf_counter()
+            for _ in range(iterations // 10):
+                await target({"type": "http", "method": "GET", "app": app}, None, send)
+            best[name] = min(best[name], (time.perf_counter() - start) / (iterations // 10))
+    return {"bare_ns": round(best["bare"] * 1e9), "wrapped_ns": round(best["wrapped"] * 1e9),
+            "overhead_ns": round((best["wrapped"] - best["bare"]) * 1e9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--passes", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--enabled", choices=["true", "false"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.enabled:
+        configure_database(f"metrics_{args.enabled}")
+        os.environ["METRICS_ENABLED"] = args.enabled
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    report = {"false": {}, "true": {}}
+    for _ in range(args.rounds):
+        for enabled in ("false", "true"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_metrics", "--enabled", enabled,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                 "--passes", str(args.passes)],
+                cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+            ).stdout
+            for name, stats in json.loads(output.strip().splitlines()[-1]).items():
+                best = report[enabled].get(name)
+                if best is None or stats["p50_ms"] < best["p50_ms"]:
+                    report[enabled][name] = stats
+
+    off, on = report["false"], report["true"]
+    print(f"{'route':<20}{'p50 sans':>10}{'p50 avec':>10}{'surcoût µs':>12}{'%':>7}"
+          f"{'req/s sans':>12}{'req/s avec':>12}")
+    for name, *_ in ROUTES:
+        a, b = off[name], on[name]
+        overhead = (b["p50_ms"] - a["p50_ms"]) * 1000
+        print(f"{name:<20}{a['p50_ms']:>10}{b['p50_ms']:>10}{overhead:>12.1f}"
+              f"{overhead / (a['p50_ms'] * 1000):>7.1%}{a['concurrent_rps']:>12}{b['concurrent_rps']:>12}")
+    scrape = on["scrape"]
+    print(f"GET /metrics : p50 {scrape['p50_ms']} ms, {scrape['bytes']:,} octets")
+
+    configure_database("metrics_cost")
+    cost = asyncio.run(middleware_cost(args.iterations))
+    print(f"middleware seul : {cost['overhead_ns']:,} ns par requête "
+          f"(application ASGI vide : {cost['bare_ns']:,} ns, avec middleware : {cost['wrapped_ns']:,} ns)")
+
+
+if __name__ == "__main__":
+    main()
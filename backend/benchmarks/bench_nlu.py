@@ -0,0 +1,246 @@
+"""
+Analyse des requêtes Sika / vocales : équivalence avec l'ancien analyseur et débit.
+
+    python -m benchmarks.bench_nlu --iterations 20000
+
+1. Corpus de référence : chaque requête passe par l'ancien analyseur (copié
+   ci-dessous) et par le nouveau ; les réponses de Sika et de l'assistant
+   vocal doivent être identiques, sauf pour les cas de FIXED, où l'ancien
+   extracteur de montant se trompait et où la valeur attendue est donnée.
+2. Débit (requêtes/s) de sika_process_query et process_voice_query,
+   avant / après.
+
+Le script se termine en erreur si une réponse diffère ; la vérification du
+corpus tourne aussi dans tests/test_nlu.py.
+"""
+import argparse
+import re
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import BACKEND_DIR  # noqa: F401  (sys.path)
+from app.services.ai_engine import AIEngine
+from app.services.nlu import CATEGORY_KEYWORDS, parse_query
+
+CORPUS = [
+    "j'ai payé 5000 francs pour manger",
+    "J'ai dépensé 2500 FCFA en taxi",
+    "je veux acheter des chaussures à 15000 f",
+    "puis-je dépenser 3000 pour le cinéma ?",
+    "Est-ce que je peux acheter un repas à 3500 francs ?",
+    "je voudrais commander une pizza à 4000",
+    "j'ai acheté un livre 6000 cfa",
+    "j'ai pris un uber 1500 fcfa",
+    "je viens de payer le loyer 75000 francs",
+    "j'ai fait le plein d'essence pour 10000",
+    "j'ai payé 20 euros de forfait internet",
+    "je veux acheter un jeu à 30 €",
+    "j'ai payé 5k de courses",
+    "je veux prendre un taxi à 2k",
+    "j'ai payé la facture d'eau 12 000 francs",
+    "je veux payer 5 000 pour la pharmacie",
+    "je veux acheter 5 000",
+    "combien il me reste ?",
+    "quel est mon solde",
+    "qu'est-ce qui est disponible dans mon budget",
+    "donne moi un conseil",
+    "j'ai besoin d'aide, que faire ?",
+    "une recommandation pour mon épargne",
+    "bonjour Sika",
+    "salut",
+    "je veux acheter une moto",
+    "puis-je payer l'école des enfants",
+    "mes objectifs d'épargne",
+    "où en est mon budget transport",
+    "quelle catégorie dépasse ?",
+    "j'ai dépensé beaucoup ce mois",
+    "j'ai payé 1500 pour un abonnement netflix",
+    "je veux commander à manger pour 2500 fcfa puis un taxi à 1000",
+    "j'ai payé 300 francs de crédit téléphone",
+    "Puis-je acheter des habits à 25000 ?",
+    "j'ai dépensé 45000 à l'hôpital pour une consultation",
+    "je voudrais faire un don de 2000",
+    "j'ai payé 8000 pour le sport",
+    "je veux acheter un cadeau",
+    "combien j'ai dépensé en transport",
+    "j'ai payé 7500f au restaurant",
+    "je veux payer 100 euros de vêtements",
+]
+
+# Requêtes où l'ancien extracteur se trompait : montant attendu désormais
+FIXED = {
+    "j'ai payé 5.000 francs pour manger": 5000.0,      # ancien : 0 ("000 francs")
+    "j'ai payé 5,000 fcfa en taxi": 5000.0,            # ancien : 0
+    "je veux payer 1 500 000 francs de loyer": 1500000.0,  # ancien : 500 000
+    "j'ai payé 2,5k de courses": 2500.0,               # ancien : 5 000
+    "je veux acheter 500 de kebab": 500.0,             # ancien : 500 000 (le "k" de kebab)
+    "je veux payer 5k": 5000.0,                        # vocal, ancien : 5
+}
+
+BUDGETS = [
+    SimpleNamespace(category=SimpleNamespace(value=c), monthly_limit=limit, current_spent=spent)
+    for c, limit, spent in [
+        ("alimentation", 100000, 42000),
+        ("transport", 30000, 27000),
+        ("logement", 80000, 75000),
+        ("loisirs", 20000, 5000),
+    ]
+]
+GOALS = [
+    SimpleNamespace(name="Moto", target_amount=500000, current_amount=120000, is_completed=False),
+]
+TOTAL_BUDGET = sum(b.monthly_limit for b in BUDGETS)
+TOTAL_SPENT = sum(b.current_spent for b in BUDGETS)
+
+
+class LegacyAIEngine(AIEngine):
+    """Analyseur d'origine : un parcours du texte par liste de mots-clés"""
+
+    def process_voice_query(self, query, total_budget, total_spent, remaining, budgets, goals):
+        query_lower = query.lower()
+        if any(word in query_lower for word in ["combien", "reste", "disponible", "solde"]):
+            return self._handle_balance_query(remaining, total_budget, total_spent)
+        if any(word in query_lower for word in ["acheter", "dépenser", "payer", "puis-je"]):
+            amounts = re.findall(r'(\d+[\s,.]?\d*)', query_lower.replace(' ', ''))
+            amount = None
+            if amounts:
+                try:
+                    amount = float(amounts[0].replace(',', '.').replace(' ', ''))
+                except ValueError:
+                    pass
+            return self._handle_purchase_query(amount, remaining, budgets)
+        if any(word in query_lower for word in ["objectif", "épargne", "économie"]):
+            return self._handle_goals_query(goals)
+        if any(word in query_lower for word in ["budget", "catégorie"]):
+            return self._handle_budget_query(budgets)
+        if any(word in query_lower for word in ["conseil", "recommandation", "aide"]):
+            return self._handle_advice_query(total_spent, total_budget, remaining)
+        return super().process_voice_query("", total_budget, total_spent, remaining, budgets, goals)
+
+    def detect_category(self, text: str) -> Optional[str]:
+        text_lower = text.lower()
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if any(keyword in text_lower for keyword in keywords):
+                return category
+        return None
+
+    def extract_amount(self, text: str) -> Optional[float]:
+        patterns = [
+            r'(\d+[\s]?\d*)\s*(?:francs?|fcfa|f|cfa)',
+            r'(\d+)k\b',
+            r'(\d+[\s]?\d*)\s*(?:euros?|€)',
+            r'(\d+[\s.,]?\d*)',
+        ]
+        text_lower = text.lower()
+        for pattern in patterns:
+            matches = re.findall(pattern, text_lower)
+            if matches:
+                try:
+                    amount = float(matches[0].replace(' ', '').replace(',', '.'))
+                    if 'k' in text_lower and amount < 1000:
+                        amount *= 1000
+                    return amount
+                except ValueError:
+                    continue
+        return None
+
+    def sika_process_query(self, query, budgets, goals, total_budget, total_spent):
+        query_lower = query.lower()
+        remaining = total_budget - total_spent
+        amount = self.extract_amount(query)
+        category = self.detect_category(query)
+        is_expense_query = any(word in query_lower for word in [
+            "acheter", "dépenser", "payer", "prendre", "commander",
+            "je veux", "je voudrais", "puis-je", "est-ce que je peux",
+            "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris"
+        ])
+        is_past_expense = any(word in query_lower for word in [
+            "j'ai dépensé", "j'ai payé", "j'ai acheté", "j'ai pris",
+            "je viens de", "j'ai fait"
+        ])
+        is_balance_query = any(word in query_lower for word in [
+            "combien", "reste", "disponible", "solde", "budget"
+        ])
+        is_advice_query = any(word in query_lower for word in [
+            "conseil", "aide", "recommandation", "que faire"
+        ])
+        if is_expense_query and amount:
+            return self._sika_handle_expense(amount, category, remaining, budgets, is_past_expense, query)
+        elif is_balance_query:
+            return self._sika_handle_balance(remaining, total_budget, total_spent, budgets)
+        elif is_advice_query:
+            return self._sika_handle_advice(total_spent, total_budget, remaining, budgets, goals)
+        return {
+            "message": (
+                f"👋 Salut, je suis Sika, ton assistant financier ! "
+                f"Tu as {remaining:,.0f} FCFA disponibles. "
+                f"Dis-moi si tu veux faire une dépense ou demande-moi un conseil !"
+            ),
+            "intent": "greeting",
+            "can_add_transaction": False,
+            "suggested_transaction": None
+        }
+
+
+def answers(engine: AIEngine, query: str) -> Dict[str, Any]:
+    return {
+        "sika": engine.sika_process_query(query, BUDGETS, GOALS, TOTAL_BUDGET, TOTAL_SPENT),
+        "voice": engine.process_voice_query(
+            query, TOTAL_BUDGET, TOTAL_SPENT, TOTAL_BUDGET - TOTAL_SPENT, BUDGETS, GOALS
+        ),
+    }
+
+
+def check_corpus(legacy: AIEngine, engine: AIEngine) -> List[str]:
+    failures = []
+    for query in CORPUS:
+        if answers(legacy, query) != answers(engine, query):
+            failures.append(f"différence : {query!r}")
+    for query, expected in FIXED.items():
+        amount = parse_query(query).amount
+        if amount != expected:
+            failures.append(f"montant {amount} au lieu de {expected} : {query!r}")
+    return failures
+
+
+def throughput(engine: AIEngine, iterations: int) -> Dict[str, float]:
+    queries = CORPUS * (iterations // len(CORPUS) + 1)
+    queries = queries[:iterations]
+    remaining = TOTAL_BUDGET - TOTAL_SPENT
+
+    start = time.perf_counter()
+    for query in queries:
+        engine.sika_process_query(query, BUDGETS, GOALS, TOTAL_BUDGET, TOTAL_SPENT)
+    sika = iterations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for query in queries:
+        engine.process_voice_query(query, TOTAL_BUDGET, TOTAL_SPENT, remaining, BUDGETS, GOALS)
+    voice = iterations / (time.perf_counter() - start)
+    return {"sika": round(sika), "voice": round(voice)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    legacy, engine = LegacyAIEngine(), AIEngine()
+    failures = check_corpus(legacy, engine)
+    print(f"corpus : {len(CORPUS)} requêtes identiques attendues, {len(FIXED)} corrections")
+    for failure in failures:
+        print("  " + failure)
+
+    before = throughput(legacy, args.iterations)
+    after = throughput(engine, args.iterations)
+    print(f"{'':<8}{'avant (req/s)':>15}{'après (req/s)':>15}{'gain':>8}")
+    for name in ("sika", "voice"):
+        print(f"{name:<8}{before[name]:>15}{after[name]:>15}{after[name] / before[name]:>7.1f}x")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
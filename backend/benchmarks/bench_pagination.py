@@ -0,0 +1,80 @@
+"""
+Page 1 contre page 500 de GET /transactions, en pagination par offset et par curseur.
+
+    python -m benchmarks.bench_pagination [--transactions 200000] [--page-size 50]
+
+Avec offset, la base lit puis jette toutes les lignes des pages précédentes ;
+avec le curseur (created_at, id), elle reprend directement dans l'index.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import asgi_client, configure_database, load_app, seed_transactions
+
+
+def cursor_at(position: int) -> str:
+    """Curseur qu'aurait renvoyé la page se terminant à `position` (0-indexé)"""
+    from sqlalchemy import select, desc
+    from app.models.database import SessionLocal
+    from app.models.transaction import Transaction
+    from app.utils.pagination import encode_cursor
+
+    db = SessionLocal()
+    created_at, row_id = db.execute(
+        select(Transaction.created_at, Transaction.id)
+        .where(Transaction.user_id == 1)
+        .order_by(desc(Transaction.created_at), desc(Transaction.id))
+        .offset(position).limit(1)
+    ).one()
+    db.close()
+    return encode_cursor(created_at, row_id)
+
+
+async def best_of(client, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def run(args):
+    configure_database("pagination")
+    app = load_app()
+    from app.models.database import dispose_engines
+
+    seed_transactions(user_id=1, count=args.transactions)
+    size = args.page_size
+    base = f"/transactions/?user_id=1&limit={size}"
+
+    async with asgi_client(app) as client:
+        results = {
+            ("offset", 1): await best_of(client, base, args.repeat),
+            ("offset", args.page): await best_of(client, f"{base}&offset={(args.page - 1) * size}", args.repeat),
+            ("cursor", 1): await best_of(client, base, args.repeat),
+            ("cursor", args.page): await best_of(
+                client, f"{base}&cursor={cursor_at((args.page - 1) * size - 1)}", args.repeat
+            ),
+        }
+    await dispose_engines()
+
+    print(f"{args.transactions} transactions, pages de {size}")
+    print(f"{'mode':<8}{'page':>6}{'ms':>10}")
+    for (mode, page), ms in results.items():
+        print(f"{mode:<8}{page:>6}{ms:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--page", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Profil SQL de chaque route et coût des écouteurs de profilage.
+
+    python -m benchmarks.bench_profiling --users 20 --transactions 500
+
+1. Base remplie par benchmarks.dataset, SQL_DEBUG_HEADERS=true : chaque
+   scénario de benchmarks.loadtest est joué --samples fois et le tableau
+   reprend les en-têtes X-DB-Queries, Server-Timing (temps SQL et temps
+   total) et X-DB-N-Plus-One, seuil N+1 abaissé à --n-plus-one.
+2. Coût des écouteurs do_execute* : --iterations
+   `SELECT 1` sur une connexion, avec et sans les écouteurs, en alternance
+   dans le même processus (le bruit entre processus dépasse la mesure).
+
+DB_ASYNC choisit le mode, comme pour l'application.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from typing import Dict, List
+
+from benchmarks.common import asgi_client, configure_database, load_app
+
+TIMING = re.compile(r'db;dur=([\d.]+);desc="\d+ queries", app;dur=([\d.]+)')
+
+
+async def profile_routes(dataset, samples: int, seed: int) -> List[Dict]:
+    from benchmarks.loadtest import NEEDS_GOAL, SCENARIOS
+    from app.models.database import dispose_engines
+
+    app = load_app()
+    rng = random.Random(seed)
+    with_goals = [user for user in dataset.users if user.goal_ids]
+    rows = []
+    async with asgi_client(app) as client:
+        for name, (label, _, build) in SCENARIOS.items():
+            queries, db_ms, app_ms, repeated, statuses = [], [], [], None, set()
+            for _ in range(samples):
+                user = rng.choice(with_goals if name in NEEDS_GOAL and with_goals else dataset.users)
+                method, url, kwargs = build(rng, user)
+                response = await client.request(method, url, **kwargs)
+                statuses.add(response.status_code)
+                timing = TIMING.search(response.headers.get("server-timing", ""))
+                if timing is None:
+                    continue
+                queries.append(int(response.headers["x-db-queries"]))
+                db_ms.append(float(timing.group(1)))
+                app_ms.append(float(timing.group(2)))
+                repeated = repeated or response.headers.get("x-db-n-plus-one")
+            rows.append({
+                "route": label,
+                "status": ",".join(map(str, sorted(statuses))),
+                "queries": max(queries, default=0),
+                "db_ms": round(sorted(db_ms)[len(db_ms) // 2], 2) if db_ms else 0.0,
+                "app_ms": round(sorted(app_ms)[len(app_ms) // 2], 2) if app_ms else 0.0,
+                "n_plus_one": repeated or "",
+            })
+    await dispose_engines()
+    return rows
+
+
+def listener_cost(iterations: int) -> Dict[str, float]:
+    """ns par requête SQL ajoutées par les écouteurs de profilage"""
+    from sqlalchemy import create_engine, event, text
+    from app.models.profiling import LISTENERS
+
+    engine = create_engine("sqlite://")
+    statement = text("SELECT 1")
+    best = {"bare": float("inf"), "profiled": float("inf")}
+    with engine.connect() as conn:
+        for _ in range(10):
+            for name in ("bare", "profiled"):
+                if name == "profiled":
+                    for event_name, listener in LISTENERS.items():
+                        event.listen(engine, event_name, listener)
+                start = time.perf_counter()
+                for _ in range(iterations // 10):
+                    conn.execute(statement)
+                best[name] = min(best[name], (time.perf_counter() - start) / (iterations // 10))
+                if name == "profiled":
+                    for event_name, listener in LISTENERS.items():
+                        event.remove(engine, event_name, listener)
+    engine.dispose()
+    return {"bare_ns": round(best["bare"] * 1e9), "profiled_ns": round(best["profiled"] * 1e9),
+            "overhead_ns": round((best["profiled"] - best["bare"]) * 1e9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=500, help="par utilisateur")
+    parser.add_argument("--samples", type=int, default=5, help="appels par scénario")
+    parser.add_argument("--n-plus-one", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    configure_database("profiling")
+    os.environ["SQL_PROFILING"] = "true"
+    os.environ["SQL_DEBUG_HEADERS"] = "true"
+    os.environ["SQL_N_PLUS_ONE_THRESHOLD"] = str(args.n_plus_one)
+    # Les N+1 sont dans le tableau : pas de logs pendant la mesure
+    os.environ.setdefault("SQL_SLOW_QUERY_MS", "1000000")
+    logging.getLogger("app").setLevel(logging.ERROR)
+
+    from benchmarks.dataset import seed_dataset
+    dataset = seed_dataset(args.users, args.transactions, seed=args.seed)
+    rows = asyncio.run(profile_routes(dataset, args.samples, args.seed))
+
+    mode = "async" if os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes") else "sync"
+    print(f"mode {mode}, {len(dataset.users)} utilisateurs × {args.transactions} transactions")
+    print(f"{'route':<30}{'statut':>9}{'requêtes':>10}{'SQL ms':>9}{'total ms':>10}  N+1")
+    for row in sorted(rows, key=lambda row: -row["db_ms"]):
+        print(f"{row['route']:<30}{row['status']:>9}{row['queries']:>10}{row['db_ms']:>9}"
+              f"{row['app_ms']:>10}  {row['n_plus_one'][:60]}")
+
+    cost = listener_cost(args.iterations)
+    print(f"écouteurs de profilage : {cost['overhead_ns']:,} ns par requête SQL "
+          f"(SELECT 1 : {cost['bare_ns']:,} ns sans, {cost['profiled_ns']:,} ns avec)")
+
+
+if __name__ == "__main__":
+    main()
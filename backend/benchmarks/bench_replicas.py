@@ -0,0 +1,200 @@
+"""
+Lectures sur réplica pendant des écritures sur la base principale.
+
+    python -m benchmarks.bench_replicas --users 50 --transactions 500 --requests 3000
+
+Deux bases SQLite locales : la principale est remplie par benchmarks.dataset
+puis copiée pour servir de réplica (instantané figé, sans réplication : on
+mesure le routage). Avec BENCH_DATABASE_URL et BENCH_REPLICA_URLS, une base
+Postgres et ses vrais réplicas (la copie est alors sautée).
+
+Chaque configuration tourne dans un sous-processus (variables lues à l'import) :
+- primary : DATABASE_REPLICA_URLS vide, tout va à la principale ;
+- replica : les lectures vont à la copie.
+--concurrency lecteurs (GET /transactions/summary, GET /budgets/,
+POST /ai/sika pour des utilisateurs au hasard) tournent pendant que
+--writers clients créent des transactions : latence et débit des
+lectures, débit des écritures, erreurs (SQLite : « database is locked »).
+
+Puis deux vérifications :
+- lecture de ses écritures : une transaction créée apparaît dans le résumé
+  lu juste après, alors que la copie ne la contient pas (fenêtre
+  REPLICA_STICKY_SECONDS), et disparaît une fois la fenêtre passée ;
+- éjection : un réplica injoignable en tête de liste est éjecté à la
+  première lecture, sans erreur côté client.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, latency_stats, load_app
+
+STICKY_SECONDS = 1.0
+DEAD_REPLICA = "sqlite:////nonexistent/gertonargent/replica.db"
+
+
+def read_request(rng: random.Random, user_id: int):
+    route = rng.random()
+    if route < 0.4:
+        return "GET", f"/transactions/summary?user_id={user_id}", None
+    if route < 0.8:
+        return "GET", f"/budgets/?user_id={user_id}", None
+    return "POST", f"/ai/sika?user_id={user_id}", {"query": "combien il me reste ?"}
+
+
+async def load(client, user_ids: List[int], total: int, concurrency: int, writers: int, seed: int) -> Dict:
+    latencies: List[float] = []
+    counts = {"read_errors": 0, "writes": 0, "write_errors": 0}
+    remaining = total
+    reading = True
+
+    async def reader(index: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + index)
+        while remaining > 0:
+            remaining -= 1
+            method, path, body = read_request(rng, rng.choice(user_ids))
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            counts["read_errors"] += failed
+
+    async def writer(index: int):
+        rng = random.Random(seed * 2000 + index)
+        while reading:
+            body = {"amount": float(rng.randint(1, 40) * 250), "category": "alimentation"}
+            try:
+                response = await client.post(f"/transactions/?user_id={rng.choice(user_ids)}", json=body)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            counts["writes"] += not failed
+            counts["write_errors"] += failed
+
+    writer_tasks = [asyncio.create_task(writer(i)) for i in range(writers)]
+    start = time.perf_counter()
+    await asyncio.gather(*(reader(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    reading = False
+    await asyncio.gather(*writer_tasks)
+
+    stats = latency_stats(latencies, elapsed)
+    stats.update(counts)
+    stats["writes_per_s"] = round(counts["writes"] / elapsed, 1)
+    return stats
+
+
+async def summary_count(client, user_id: int) -> int:
+    response = await client.get(f"/transactions/summary?user_id={user_id}")
+    return response.json()["transaction_count"]
+
+
+async def read_your_writes(client, user_id: int) -> Dict:
+    await asyncio.sleep(STICKY_SECONDS + 0.2)  # fenêtre des écritures de la charge passée
+    before = await summary_count(client, user_id)
+    await client.post(f"/transactions/?user_id={user_id}", json={"amount": 1000, "category": "transport"})
+    just_after = await summary_count(client, user_id)
+    await asyncio.sleep(STICKY_SECONDS + 0.2)
+    later = await summary_count(client, user_id)
+    return {"before": before, "just_after": just_after, "after_window": later}
+
+
+async def run_child(args) -> Dict:
+    from sqlalchemy import select
+    from app.models import User
+    from app.models.database import SessionLocal
+
+    app = load_app()
+    with SessionLocal() as session:
+        user_ids = list(session.scalars(select(User.id)))
+
+    result = {}
+    async with app.router.lifespan_context(app):
+        async with asgi_client(app) as client:
+            if args.child == "eject":
+                errors = 0
+                for user_id in user_ids[:50]:
+                    response = await client.get(f"/budgets/?user_id={user_id}")
+                    errors += response.status_code >= 400
+                result["errors"] = errors
+                result["replicas"] = (await client.get("/health")).json()["replicas"]
+                return result
+
+            result["load"] = await load(client, user_ids, args.requests, args.concurrency, args.writers, args.seed)
+            if args.child == "replica":
+                result["read_your_writes"] = await read_your_writes(client, user_ids[0])
+    return result
+
+
+def spawn(config: str, env: Dict[str, str], args) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_replicas", "--child", config,
+         "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+         "--writers", str(args.writers), "--seed", str(args.seed)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=500, help="par utilisateur")
+    parser.add_argument("--requests", type=int, default=3000, help="lectures par configuration")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", choices=["primary", "replica", "eject"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_child(args))))
+        return
+
+    url = configure_database("replicas_primary")
+    replicas = os.getenv("BENCH_REPLICA_URLS")
+    from benchmarks.dataset import seed_dataset
+    from app.models.database import get_engine
+    seed_dataset(args.users, args.transactions, seed=args.seed)
+    get_engine().dispose()
+    if not replicas:
+        copy = os.path.join(tempfile.gettempdir(), "gertonargent_replicas_copy.db")
+        shutil.copyfile(url.removeprefix("sqlite:///"), copy)
+        replicas = f"sqlite:///{copy}"
+
+    env = dict(os.environ, DATABASE_URL=url, REPLICA_STICKY_SECONDS=str(STICKY_SECONDS))
+    env.pop("BENCH_DATABASE_URL", None)  # load_app ne doit pas repointer la base
+    results = {
+        "primary": spawn("primary", dict(env, DATABASE_REPLICA_URLS=""), args),
+        "replica": spawn("replica", dict(env, DATABASE_REPLICA_URLS=replicas), args),
+    }
+    eject = spawn("eject", dict(env, DATABASE_REPLICA_URLS=f"{DEAD_REPLICA},{replicas}"), args)
+
+    print(f"{'config':<10}{'lect. p50':>10}{'p99':>9}{'lect./s':>9}{'erreurs':>9}"
+          f"{'écrit./s':>10}{'erreurs':>9}")
+    for config, result in results.items():
+        stats = result["load"]
+        print(f"{config:<10}{stats['p50_ms']:>10}{stats['p99_ms']:>9}{stats['rps']:>9}"
+              f"{stats['read_errors']:>9}{stats['writes_per_s']:>10}{stats['write_errors']:>9}")
+    ryw = results["replica"]["read_your_writes"]
+    print(f"lecture de ses écritures : {ryw['before']} transactions avant, {ryw['just_after']} juste après "
+          f"l'écriture, {ryw['after_window']} une fois la fenêtre passée (copie figée)")
+    print(f"éjection : {eject['errors']} erreur(s) client ; "
+          + ", ".join(f"{r['name']} sain={r['healthy']} échecs={r['failures']} lectures={r['reads']}"
+                      for r in eject["replicas"]))
+
+
+if __name__ == "__main__":
+    main()
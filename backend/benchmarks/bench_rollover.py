@@ -0,0 +1,158 @@
+"""
+Remise à zéro mensuelle de tous les budgets (app.services.rollover).
+
+    python -m benchmarks.bench_rollover --budgets 1000000 --batch-size 1000 10000 50000
+
+--budgets budgets (10 catégories par utilisateur) dont la période a
+commencé le mois précédent. Pour chaque taille de lot : durée totale,
+débit et plus long lot (durée pendant laquelle les budgets du lot restent
+verrouillés). Vérifications : tous les budgets archivés une fois, dépense
+archivée égale à la dépense d'avant, relance sans effet.
+
+Reprise : traitement interrompu au milieu (exception après la moitié des
+lots), puis relancé ; le second appel repart du dernier lot validé.
+
+Comparaison : l'ancienne route POST /budgets/reset (budgets chargés puis
+modifiés en Python, un commit par utilisateur) sur --legacy-users
+utilisateurs, extrapolée à tous.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from benchmarks.common import configure_database, load_app
+
+CATEGORIES_PER_USER = 10
+NOW = datetime(2026, 11, 1, 0, 5)
+PREVIOUS_START = datetime(2026, 10, 1)
+
+
+def seed(budgets: int, chunk: int = 50000):
+    from sqlalchemy import insert
+    from app.models import Budget, CategoryEnum, User
+    from app.models.database import get_engine
+
+    categories = list(CategoryEnum)
+    users = budgets // CATEGORIES_PER_USER
+    with get_engine().begin() as conn:
+        for start in range(1, users + 1, chunk):
+            ids = range(start, min(start + chunk, users + 1))
+            conn.execute(insert(User), [
+                {"id": u, "email": f"u{u}@bench", "username": f"u{u}", "phone": f"{u}", "hashed_password": "x"}
+                for u in ids
+            ])
+        for start in range(0, budgets, chunk):
+            conn.execute(insert(Budget), [
+                {"user_id": i // CATEGORIES_PER_USER + 1, "category": categories[i % CATEGORIES_PER_USER],
+                 "monthly_limit": 50000.0, "current_spent": float(i % 997) * 37, "period_start": PREVIOUS_START}
+                for i in range(start, min(start + chunk, budgets))
+            ])
+
+
+def restore():
+    """Revenir à l'état d'avant la remise à zéro (budgets repris depuis l'archive)"""
+    from sqlalchemy import delete, select, update
+    from app.models import Budget, BudgetPeriod, BudgetRollover, UserDataVersion
+    from app.models.database import get_engine
+
+    archived = select(BudgetPeriod.spent).where(BudgetPeriod.budget_id == Budget.id).scalar_subquery()
+    with get_engine().begin() as conn:
+        conn.execute(update(Budget).values(current_spent=archived, period_start=PREVIOUS_START, period_end=None))
+        conn.execute(delete(BudgetPeriod))
+        conn.execute(delete(BudgetRollover))
+        conn.execute(delete(UserDataVersion))
+
+
+def totals():
+    from sqlalchemy import func, select
+    from app.models import Budget, BudgetPeriod
+    from app.models.database import get_engine
+
+    with get_engine().connect() as conn:
+        return (
+            conn.scalar(select(func.sum(Budget.current_spent))),
+            conn.scalar(select(func.count()).select_from(BudgetPeriod)),
+            conn.scalar(select(func.sum(BudgetPeriod.spent))),
+        )
+
+
+def timed_rollover(batch_size: int, stop_after: int = 0):
+    """Durée totale, plus long lot ; exception après `stop_after` lots si > 0"""
+    from app.services.rollover import run_rollover
+
+    longest, last = 0.0, time.perf_counter()
+
+    def on_batch(result):
+        nonlocal longest, last
+        now = time.perf_counter()
+        longest, last = max(longest, now - last), now
+        if stop_after and result.batches >= stop_after:
+            raise KeyboardInterrupt
+
+    start = time.perf_counter()
+    result = run_rollover(now=NOW, batch_size=batch_size, on_batch=on_batch)
+    return result, time.perf_counter() - start, longest
+
+
+def legacy(users: int) -> float:
+    """Secondes par utilisateur de l'ancienne route (chargement + boucle Python)"""
+    from sqlalchemy import select
+    from app.models import Budget
+    from app.models.database import SessionLocal
+
+    start = time.perf_counter()
+    for user_id in range(1, users + 1):
+        with SessionLocal() as db:
+            for budget in db.scalars(select(Budget).where(Budget.user_id == user_id)).all():
+                budget.current_spent = 0.0
+                budget.period_start = datetime.utcnow()
+            db.commit()
+    return (time.perf_counter() - start) / users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-users", type=int, default=2000)
+    args = parser.parse_args()
+
+    configure_database("rollover")
+    load_app()
+    start = time.perf_counter()
+    seed(args.budgets)
+    print(f"{args.budgets} budgets insérés en {time.perf_counter() - start:.1f} s")
+    spent_before = totals()[0]
+
+    print(f"{'lot':>8}{'durée (s)':>11}{'budgets/s':>12}{'plus long lot (ms)':>20}{'archivés':>10}  vérifications")
+    for batch_size in args.batch_size:
+        result, elapsed, longest = timed_rollover(batch_size)
+        spent, archived, archived_spent = totals()
+        again = timed_rollover(batch_size)[0]
+        checks = (spent == 0 and archived == args.budgets and round(archived_spent) == round(spent_before)
+                  and again.rolled == 0)
+        print(f"{batch_size:>8}{elapsed:>11.2f}{result.rolled / elapsed:>12.0f}{longest * 1000:>20.1f}"
+              f"{archived:>10}  {'ok' if checks else 'ÉCHEC'}")
+        restore()
+
+    batch_size = args.batch_size[len(args.batch_size) // 2]
+    half = args.budgets // batch_size // 2
+    try:
+        timed_rollover(batch_size, stop_after=half)
+    except KeyboardInterrupt:
+        pass
+    result, elapsed, _ = timed_rollover(batch_size)
+    spent, archived, archived_spent = totals()
+    print(f"\nReprise (lots de {batch_size}) : interruption après {half} lots, relance depuis le budget "
+          f"{result.resumed_from}, {result.rolled} budgets restants en {elapsed:.2f} s ; "
+          f"{archived} archivés, dépense archivée {'conservée' if round(archived_spent) == round(spent_before) else 'ÉCART'}")
+    restore()
+
+    per_user = legacy(args.legacy_users)
+    users = args.budgets // CATEGORIES_PER_USER
+    print(f"\nAncienne route, un utilisateur à la fois : {per_user * 1000:.2f} ms par utilisateur, "
+          f"soit ~{per_user * users:.0f} s pour {users} utilisateurs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Score vectorisé : équivalence avec calculate_score et débit.
+
+    python -m benchmarks.bench_scoring --size 200000 --seed 42
+
+1. Propriété : sur des tirages aléatoires (plus les cas limites : plafond
+   nul ou négatif, seuils exacts de 50 / 75 / 90 % et de 10 / 20 %, reste
+   égal au montant), calculate_scores donne, élément par élément, le même
+   score et la même recommandation que calculate_score.
+2. Débit en transactions/s : boucle sur calculate_score contre calculate_scores.
+3. Latence de POST /ai/analyze/batch pour un lot de --batch achats.
+
+Le script se termine en erreur si une différence est trouvée ; la propriété
+est aussi vérifiée par tests/test_scoring.py.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import asgi_client, configure_database, load_app
+from app.services.ai_engine import AIEngine, RECOMMENDATIONS, recommendation_code
+
+
+def random_cases(size: int, rng: np.random.Generator):
+    limits = rng.choice([0.0, -5000.0, 1000.0, 20000.0, 100000.0], size=size)
+    limits = np.where(rng.random(size) < 0.5, rng.uniform(-1000, 200000, size), limits)
+    spent = rng.uniform(0, 1.2, size) * np.abs(limits)
+    amounts = rng.uniform(0, 0.4, size) * np.abs(limits) + rng.uniform(0, 500, size)
+
+    # Seuils exacts, où un < à la place d'un <= changerait le résultat
+    edge = rng.random(size) < 0.3
+    spent = np.where(edge, limits * rng.choice([0.5, 0.75, 0.9], size=size), spent)
+    amounts = np.where(edge, limits * rng.choice([0.1, 0.2], size=size), amounts)
+    remaining = limits - spent
+    remaining = np.where(rng.random(size) < 0.1, amounts, remaining)
+    return amounts, remaining, spent, limits
+
+
+def check_equivalence(engine: AIEngine, size: int, seed: int) -> int:
+    amounts, remaining, spent, limits = random_cases(size, np.random.default_rng(seed))
+    vector = engine.calculate_scores(amounts, remaining, spent, limits)
+    mismatches = 0
+    for i in range(size):
+        scalar = engine.calculate_score(
+            amount=float(amounts[i]),
+            category="alimentation",
+            budget_remaining=float(remaining[i]),
+            monthly_spent=float(spent[i]),
+            monthly_limit=float(limits[i]),
+        )
+        score = int(vector["score"][i])
+        if score != scalar["score"] or RECOMMENDATIONS[int(vector["code"][i])][1] != scalar["color"]:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  différence : montant={amounts[i]} reste={remaining[i]} "
+                      f"dépensé={spent[i]} plafond={limits[i]} -> {score} / {scalar['score']}")
+        elif recommendation_code(score) != int(vector["code"][i]):
+            mismatches += 1
+    return mismatches
+
+
+def throughput(engine: AIEngine, size: int, seed: int):
+    amounts, remaining, spent, limits = random_cases(size, np.random.default_rng(seed))
+    rows = list(zip(amounts.tolist(), remaining.tolist(), spent.tolist(), limits.tolist()))
+
+    start = time.perf_counter()
+    for amount, left, used, limit in rows:
+        engine.calculate_score(amount, "alimentation", left, used, limit)
+    scalar = size / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine.calculate_scores(amounts, remaining, spent, limits)
+    vector = size / (time.perf_counter() - start)
+    return scalar, vector
+
+
+async def batch_latency(batch: int) -> float:
+    configure_database("scoring")
+    app = load_app()
+    from app.models.database import SessionLocal, dispose_engines
+    from app.models.budget import Budget, CategoryEnum
+
+    db = SessionLocal()
+    for category in CategoryEnum:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=40000))
+    db.commit()
+    db.close()
+
+    categories = [c.value for c in CategoryEnum]
+    payload = {"transactions": [
+        {"amount": 500 + (i * 7919) % 60000, "category": categories[i % len(categories)]}
+        for i in range(batch)
+    ]}
+    async with asgi_client(app) as client:
+        await client.post("/ai/analyze/batch?user_id=1", json={"transactions": payload["transactions"][:10]})
+        start = time.perf_counter()
+        response = await client.post("/ai/analyze/batch?user_id=1", json=payload)
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+    await dispose_engines()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = AIEngine()
+    mismatches = check_equivalence(engine, args.size, args.seed)
+    print(f"équivalence : {args.size:,} cas, {mismatches} différence(s)")
+
+    scalar, vector = throughput(engine, args.size, args.seed)
+    print(f"calculate_score  : {scalar:>14,.0f} transactions/s")
+    print(f"calculate_scores : {vector:>14,.0f} transactions/s ({vector / scalar:.0f}x)")
+
+    elapsed = asyncio.run(batch_latency(args.batch))
+    print(f"POST /ai/analyze/batch ({args.batch:,} achats) : {elapsed * 1000:.1f} ms")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Simulation « et si » (POST /ai/simulate) : latence selon le nombre de
+chemins, puis calibration des probabilités de dépassement.
+
+    python -m benchmarks.bench_simulate --paths 1000 10000 100000 --users 300
+
+Latence : un utilisateur avec FORECAST_LOOKBACK_DAYS jours d'historique,
+5 budgets et 3 objectifs datés ; meilleure latence de la route complète et
+de simulate() seul (tirages NumPy), par nombre de chemins. Cible : moins de
+50 ms pour 10 000 chemins.
+
+Calibration (NumPy seul, sans base) : séries synthétiques de
+benchmarks.bench_forecast, plafond tiré autour de la dépense mensuelle
+habituelle ; au soir du 10 de chaque mois, probabilité simulée de
+dépasser, comparée à la fréquence observée par tranche de probabilité.
+Score de Brier face à l'ancienne réponse binaire (extrapolation linéaire
+sur 30 jours : dépasse ou non).
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.common import asgi_client, configure_database, load_app
+
+CUTOFF = 10
+BINS = [0.0, 0.1, 0.3, 0.5, 0.7, 0.9, 1.0001]
+
+
+def seed_user(rng: np.random.Generator, lookback: int):
+    from sqlalchemy import insert
+    from app.models import Budget, CategoryEnum, Goal, Transaction
+    from app.models.database import get_engine
+
+    categories = list(CategoryEnum)[:5]
+    now = datetime.utcnow()
+    rows = []
+    for day in range(1, lookback + 1):
+        moment = now - timedelta(days=day)
+        for _ in range(rng.poisson(4)):
+            rows.append({"user_id": 1, "amount": float(np.round(rng.lognormal(np.log(2500), 0.7), -1)),
+                         "category": categories[int(rng.integers(0, 5))], "transaction_type": "expense",
+                         "was_approved": True, "created_at": moment})
+        if moment.day == 25:
+            rows.append({"user_id": 1, "amount": 400000.0, "category": CategoryEnum.AUTRE,
+                         "transaction_type": "income", "was_approved": True, "created_at": moment})
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    with get_engine().begin() as conn:
+        conn.execute(insert(Transaction), rows)
+        conn.execute(insert(Budget), [
+            {"user_id": 1, "category": category, "monthly_limit": 60000.0, "current_spent": 20000.0,
+             "period_start": month_start}
+            for category in categories
+        ])
+        conn.execute(insert(Goal), [
+            {"user_id": 1, "name": f"Objectif {i}", "target_amount": 300000.0 * i, "current_amount": 50000.0,
+             "target_date": now + timedelta(days=40 * i), "is_completed": False}
+            for i in range(1, 4)
+        ])
+
+
+async def best_ms(call, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def latency(args):
+    configure_database("simulate")
+    app = load_app()
+    from app.models.database import dispose_engines, session_scope
+    from app.services.forecasting import FORECAST_LOOKBACK_DAYS, daily_series, period_bounds
+    from app.services.simulation import simulate
+
+    seed_user(np.random.default_rng(args.seed), FORECAST_LOOKBACK_DAYS)
+    now = datetime.utcnow()
+    async with session_scope() as db:
+        series = await daily_series(db, 1, now.date() - timedelta(days=FORECAST_LOOKBACK_DAYS), now.date())
+    from app.models import CategoryEnum
+    categories = list(CategoryEnum)[:5]
+    end = period_bounds(None, None, now)[1]
+    goal_dates = [now + timedelta(days=40 * i) for i in range(1, 4)]
+
+    print(f"{'chemins':>9}{'/ai/simulate (ms)':>19}{'simulate() (ms)':>17}")
+    async with app.router.lifespan_context(app):
+        async with asgi_client(app) as client:
+            for paths in args.paths:
+                async def route():
+                    response = await client.post(f"/ai/simulate?user_id=1&paths={paths}",
+                                                 json={"amount": 25000, "category": "alimentation"})
+                    response.raise_for_status()
+
+                async def direct():
+                    simulate(series, now, categories, [end] * len(categories), goal_dates, paths)
+
+                route_ms = await best_ms(route, args.repeat)
+                direct_ms = await best_ms(direct, args.repeat)
+                print(f"{paths:>9}{route_ms:>19.2f}{direct_ms:>17.2f}")
+    await dispose_engines()
+
+
+def calibration(args):
+    from app.models import CategoryEnum
+    from app.services.forecasting import CATEGORY_ROW, FORECAST_LOOKBACK_DAYS, DailySeries
+    from app.services.simulation import simulate
+    from benchmarks.bench_forecast import MONTHS, PROFILES, synthetic
+
+    rng = np.random.default_rng(args.seed)
+    categories = [CategoryEnum(name) for name in PROFILES]
+    rows = [CATEGORY_ROW[category] for category in categories]
+    predicted, legacy, observed = [], [], []
+
+    for month_start in MONTHS:
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        first_day = month_start - timedelta(days=FORECAST_LOOKBACK_DAYS)
+        series = synthetic(rng, args.users, first_day, FORECAST_LOOKBACK_DAYS + (month_end - month_start).days)
+        now = datetime.combine(month_start + timedelta(days=CUTOFF), datetime.min.time())
+        end = datetime.combine(month_end, datetime.min.time())
+        history_days = FORECAST_LOOKBACK_DAYS + CUTOFF
+
+        for user in range(args.users):
+            user_rows = series[user::args.users]  # une ligne par profil
+            expenses = np.zeros((len(CATEGORY_ROW), history_days))
+            expenses[rows] = user_rows[:, :history_days]
+            history = DailySeries(expenses, np.zeros(history_days), first_day)
+            usual = user_rows[:, :FORECAST_LOOKBACK_DAYS].sum(axis=1) * 30 / FORECAST_LOOKBACK_DAYS
+            limits = np.round(usual * rng.uniform(0.8, 1.4, len(categories)), -2)
+            spent = user_rows[:, FORECAST_LOOKBACK_DAYS:history_days].sum(axis=1)
+            actual = user_rows[:, FORECAST_LOOKBACK_DAYS:].sum(axis=1)
+
+            result = simulate(history, now, categories, [end] * len(categories), [], args.calibration_paths, rng)
+            predicted.extend(((spent[:, None] + result.spend) > limits[:, None]).mean(axis=1))
+            legacy.extend((spent + spent / (CUTOFF + 1) * (30 - (CUTOFF + 1))) > limits)
+            observed.extend(actual > limits)
+
+    predicted, legacy, observed = np.array(predicted), np.array(legacy, dtype=float), np.array(observed, dtype=float)
+    print(f"\n{len(observed)} budgets, probabilité au soir du {CUTOFF} du mois")
+    print(f"{'tranche':<12}{'budgets':>9}{'prévu':>8}{'observé':>9}")
+    for low, high in zip(BINS, BINS[1:]):
+        inside = (predicted >= low) & (predicted < high)
+        if inside.any():
+            print(f"{f'{low:.1f}-{min(high, 1):.1f}':<12}{int(inside.sum()):>9}"
+                  f"{predicted[inside].mean():>8.2f}{observed[inside].mean():>9.2f}")
+    print(f"Brier : simulation {np.mean((predicted - observed) ** 2):.3f}, "
+          f"ancienne réponse binaire {np.mean((legacy - observed) ** 2):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--users", type=int, default=300, help="utilisateurs synthétiques (calibration)")
+    parser.add_argument("--calibration-paths", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(latency(args))
+    calibration(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Démarrage d'un worker : de l'import de l'application à la première réponse.
+
+    python -m benchmarks.bench_startup --runs 10
+
+Chaque mesure est un processus neuf (comme un worker uvicorn / gunicorn) :
+- import : `import main` (modules, construction de l'application) ;
+- lifespan : démarrage (création des moteurs) ;
+- 1re requête : GET /budgets/ (première connexion du pool, premier
+  passage dans les routes) ;
+- processus : du lancement de l'interpréteur à sa sortie, vu du parent.
+
+Deux variantes, en alternance :
+- factory : l'application actuelle, schéma géré par les migrations ;
+- create_all : même chose plus Base.metadata.create_all à l'import, comme
+  le faisait main.py (une vérification par table et par index, soit autant
+  d'allers-retours sur un Postgres distant : BENCH_DATABASE_URL).
+
+Enfin l'import est vérifié sans DATABASE_URL ni base joignable.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, configure_database
+
+
+async def child(create_all: bool) -> dict:
+    import httpx  # client de mesure, hors chronométrage
+    start = time.perf_counter()
+    import main
+    if create_all:
+        from app.models import Base, get_engine
+        Base.metadata.create_all(bind=get_engine())
+    imported = time.perf_counter()
+
+    app = main.app
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/budgets/?user_id=1")
+            response.raise_for_status()
+        answered = time.perf_counter()
+    return {
+        "import_ms": (imported - start) * 1000,
+        "lifespan_ms": (started - imported) * 1000,
+        "first_request_ms": (answered - started) * 1000,
+    }
+
+
+def run_child(variant: str, env: dict) -> dict:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", variant],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def import_without_database() -> str:
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    env["DATABASE_URL"] = ""
+    done = subprocess.run(
+        [sys.executable, "-c", "import main; main.create_app()"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    return "ok" if done.returncode == 0 else done.stderr.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", choices=["factory", "create_all"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child == "create_all"))))
+        return
+
+    url = configure_database("startup")
+    from benchmarks.common import load_app
+    load_app()  # schéma créé une fois, hors mesure
+    from app.models.database import get_engine
+    get_engine().dispose()
+
+    env = dict(os.environ, DATABASE_URL=url)
+    samples = {"factory": [], "create_all": []}
+    run_child("factory", env)  # caches disque et bytecode
+    for _ in range(args.runs):
+        for variant in samples:
+            samples[variant].append(run_child(variant, env))
+
+    print(f"{'variante':<12}{'import':>10}{'lifespan':>10}{'1re req.':>10}{'processus':>11}  (médianes, ms)")
+    for variant, runs in samples.items():
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{variant:<12}{median['import_ms']:>10.1f}{median['lifespan_ms']:>10.1f}"
+              f"{median['first_request_ms']:>10.1f}{median['process_ms']:>11.1f}")
+    print(f"import sans DATABASE_URL : {import_without_database()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Outils partagés par les benchmarks du backend.
+
+Les benchmarks tournent en local, sans service externe : une base SQLite
+temporaire (ou la base pointée par BENCH_DATABASE_URL) et l'application
+FastAPI appelée en mémoire via httpx.ASGITransport.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def configure_database(name: str = "bench") -> str:
+    """Pointer DATABASE_URL vers une base de benchmark (avant d'importer l'application)"""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"gertonargent_{name}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    return url
+
+
+def load_app():
+    """
+    Importer l'application une fois la configuration posée et créer le
+    schéma : la base de benchmark est jetable, les migrations servent aux
+    vraies bases
+    """
+    import main
+    from app.models import Base, get_engine
+
+    Base.metadata.create_all(bind=get_engine())
+    return main.app
+
+
+def peak_rss_mb() -> float:
+    """Pic de mémoire résidente du processus depuis son démarrage (Linux / macOS)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_stats(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Résumé standard : débit et quantiles de latence en millisecondes"""
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def hammer(
+    client,
+    method: str,
+    path: str,
+    concurrency: int,
+    total: int,
+    json: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> Dict[str, float]:
+    """Envoyer `total` requêtes identiques avec `concurrency` clients simultanés"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, json=json, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["errors"] = errors
+    return stats
+
+
+def asgi_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def seed_transactions(user_id: int, count: int, batch_size: int = 50000, offset: int = 0):
+    """Insérer `count` dépenses synthétiques en executemany par lots"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app.models.database import engine
+    from app.models.budget import CategoryEnum
+    from app.models.transaction import Transaction
+
+    categories = list(CategoryEnum)
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        for batch_start in range(offset, offset + count, batch_size):
+            batch_end = min(batch_start + batch_size, offset + count)
+            conn.execute(insert(Transaction), [
+                {
+                    "user_id": user_id,
+                    "amount": float(500 + (i * 7919) % 25000),
+                    "category": categories[i % len(categories)],
+                    "transaction_type": "income" if i % 20 == 0 else "expense",
+                    "was_approved": True,
+                    "created_at": start + timedelta(minutes=7 * i),
+                }
+                for i in range(batch_start, batch_end)
+            ])
@@ -0,0 +1,231 @@
+"""
+Jeu de données synthétique pour les tests de charge : N utilisateurs × M transactions.
+
+    python -m benchmarks.dataset --users 200 --transactions 500
+
+Les distributions imitent l'usage de l'application (montants en FCFA) :
+- dépenses tirées par catégorie selon une fréquence et une loi log-normale
+  propres à chacune (transport : petits montants fréquents, logement : loyer
+  mensuel…), arrondies à 25 FCFA ;
+- environ un revenu pour douze dépenses (salaire, transfert) ;
+- dates réparties sur les --months derniers mois ;
+- 4 à 8 budgets par utilisateur, plafond proche de la dépense mensuelle
+  habituelle, `current_spent` égal aux dépenses du mois en cours ;
+- 0 à 3 objectifs d'épargne ;
+- agrégats mensuels reconstruits après l'insertion.
+
+Le tirage est déterministe (--seed) : deux exécutions produisent les mêmes
+données. La base visée (DATABASE_URL, ou BENCH_DATABASE_URL via
+configure_database) est vidée puis recréée : n'utiliser qu'une base jetable.
+"""
+import argparse
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.common import configure_database
+
+PASSWORD = "mot-de-passe-de-charge"
+
+# catégorie -> (poids dans les dépenses, médiane FCFA, dispersion log-normale)
+EXPENSE_PROFILE: Dict[str, Tuple[float, float, float]] = {
+    "alimentation": (34, 2500, 0.8),
+    "transport": (20, 800, 0.7),
+    "communication": (9, 1500, 0.6),
+    "loisirs": (10, 4000, 0.9),
+    "autre": (8, 3000, 1.0),
+    "vetements": (5, 8000, 0.8),
+    "sante": (4, 5000, 0.9),
+    "epargne": (4, 10000, 0.7),
+    "education": (3, 15000, 0.8),
+    "logement": (3, 60000, 0.4),
+}
+INCOME_SHARE = 1 / 13
+INCOME_MEDIAN, INCOME_SIGMA = 150000, 0.5
+
+
+@dataclass
+class SeededUser:
+    id: int
+    email: str
+    token: str
+    transaction_ids: Tuple[int, int]  # (premier, dernier) : insérés d'un bloc
+    budget_ids: List[int] = field(default_factory=list)
+    budget_categories: List[str] = field(default_factory=list)
+    goal_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Dataset:
+    users: List[SeededUser]
+    transactions: int
+    seconds: float
+
+
+def expense_rows(rng: np.random.Generator, user_id: int, count: int, start: datetime, span: float):
+    """Dépenses et revenus d'un utilisateur, tirés en bloc"""
+    from app.models import CategoryEnum
+
+    categories = list(EXPENSE_PROFILE)
+    members = [CategoryEnum(c) for c in categories]
+    weights = np.array([EXPENSE_PROFILE[c][0] for c in categories], dtype=float)
+    medians = np.array([EXPENSE_PROFILE[c][1] for c in categories], dtype=float)
+    sigmas = np.array([EXPENSE_PROFILE[c][2] for c in categories], dtype=float)
+
+    is_income = rng.random(count) < INCOME_SHARE
+    picked = rng.choice(len(categories), size=count, p=weights / weights.sum())
+    amounts = np.where(
+        is_income,
+        rng.lognormal(np.log(INCOME_MEDIAN), INCOME_SIGMA, count),
+        rng.lognormal(np.log(medians[picked]), sigmas[picked]),
+    )
+    amounts = np.maximum(25.0, np.round(amounts / 25) * 25)
+    offsets = np.sort(rng.random(count)) * span
+
+    return [
+        {
+            "user_id": user_id,
+            "amount": float(amounts[i]),
+            "category": CategoryEnum.AUTRE if is_income[i] else members[picked[i]],
+            "description": None,
+            "transaction_type": "income" if is_income[i] else "expense",
+            "was_approved": True,
+            "created_at": start + timedelta(seconds=float(offsets[i])),
+        }
+        for i in range(count)
+    ]
+
+
+def seed_dataset(users: int, transactions: int, months: int = 6, seed: int = 42,
+                 batch_size: int = 20000) -> Dataset:
+    """Vider la base, la recréer et la remplir ; renvoie les identifiants utiles au scénario"""
+    from sqlalchemy import func, insert, select
+    from app.models import Base, Budget, CategoryEnum, Goal, Transaction, User
+    from app.models.database import engine
+    from app.routes.auth import create_access_token
+    from app.services.passwords import pwd_context
+    from app.services.rollups import rebuild_rollups
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=30 * months)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0)
+    span = (now - start).total_seconds()
+    # Un seul hachage bcrypt pour tous les comptes (plusieurs centaines de ms chacun)
+    hashed_password = pwd_context.hash(PASSWORD)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    seeded: List[SeededUser] = []
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": f"user{n}@charge.example.com",
+                "username": f"user{n}",
+                "phone": f"+2250{n:09d}",
+                "hashed_password": hashed_password,
+                "is_active": True,
+            }
+            for n in range(1, users + 1)
+        ])
+        # Identifiants attribués par la base : la séquence reste cohérente pour /auth/register
+        user_ids = dict(conn.execute(select(User.email, User.id)).all())
+
+        pending: List[dict] = []
+        for user_id in user_ids.values():
+            rows = expense_rows(rng, user_id, transactions, start, span)
+            pending.extend(rows)
+            if len(pending) >= batch_size:
+                conn.execute(insert(Transaction), pending)
+                pending = []
+
+            # Budgets : plafond autour de la dépense mensuelle habituelle
+            spent_this_month: Dict[CategoryEnum, float] = {}
+            monthly: Dict[CategoryEnum, float] = {}
+            for row in rows:
+                if row["transaction_type"] != "expense":
+                    continue
+                category = row["category"]
+                monthly[category] = monthly.get(category, 0.0) + row["amount"] / months
+                if row["created_at"] >= month_start:
+                    spent_this_month[category] = spent_this_month.get(category, 0.0) + row["amount"]
+            chosen = rng.choice(list(EXPENSE_PROFILE), size=int(rng.integers(4, 9)), replace=False)
+            conn.execute(insert(Budget), [
+                {
+                    "user_id": user_id,
+                    "category": category,
+                    "monthly_limit": float(max(5000, round(monthly.get(category, 0) * rng.uniform(0.8, 1.5), -3))),
+                    "current_spent": spent_this_month.get(category, 0.0),
+                    "period_start": month_start,
+                }
+                for category in map(CategoryEnum, chosen)
+            ])
+
+            targets = np.round(rng.uniform(50000, 1000000, int(rng.integers(0, 4))), -3)
+            if len(targets):
+                conn.execute(insert(Goal), [
+                    {
+                        "user_id": user_id,
+                        "name": f"Objectif {i + 1}",
+                        "target_amount": float(target),
+                        "current_amount": float(round(target * rng.uniform(0, 0.9), -2)),
+                        "icon": "flag",
+                        "color": "#00A86B",
+                        "is_completed": False,
+                    }
+                    for i, target in enumerate(targets)
+                ])
+        if pending:
+            conn.execute(insert(Transaction), pending)
+        rebuild_rollups(conn)
+
+        ranges = {
+            row.user_id: (row.first, row.last)
+            for row in conn.execute(
+                select(Transaction.user_id, func.min(Transaction.id).label("first"),
+                       func.max(Transaction.id).label("last"))
+                .group_by(Transaction.user_id)
+            )
+        }
+        budgets: Dict[int, List[Tuple[int, CategoryEnum]]] = {}
+        for row in conn.execute(select(Budget.id, Budget.user_id, Budget.category)):
+            budgets.setdefault(row.user_id, []).append((row.id, row.category))
+        goals_by_user: Dict[int, List[int]] = {}
+        for row in conn.execute(select(Goal.id, Goal.user_id)):
+            goals_by_user.setdefault(row.user_id, []).append(row.id)
+
+    for email, user_id in user_ids.items():
+        seeded.append(SeededUser(
+            id=user_id,
+            email=email,
+            token=create_access_token(data={"sub": email, "uid": user_id}),
+            transaction_ids=ranges.get(user_id, (0, 0)),
+            budget_ids=[budget_id for budget_id, _ in budgets.get(user_id, [])],
+            budget_categories=[category.value for _, category in budgets.get(user_id, [])],
+            goal_ids=goals_by_user.get(user_id, []),
+        ))
+
+    return Dataset(users=seeded, transactions=users * transactions, seconds=time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=500, help="par utilisateur")
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    url = configure_database("dataset")
+    dataset = seed_dataset(args.users, args.transactions, args.months, args.seed)
+    print(f"{len(dataset.users)} utilisateurs, {dataset.transactions:,} transactions "
+          f"en {dataset.seconds:.1f} s dans {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Afficher le plan d'exécution (EXPLAIN) de chaque requête SQL émise par les
+endpoints principaux, pour repérer les scans complets et les régressions d'index.
+
+    python -m benchmarks.explain_queries [--transactions 20000]
+
+Les requêtes sont capturées en appelant réellement les endpoints sur une base
+de démonstration (SQLite temporaire ou BENCH_DATABASE_URL), puis rejouées
+avec EXPLAIN QUERY PLAN (SQLite) ou EXPLAIN (Postgres).
+"""
+import argparse
+import asyncio
+import os
+
+from benchmarks.common import asgi_client, configure_database, load_app, seed_transactions
+
+ENDPOINTS = [
+    ("GET", "/transactions/?user_id=1", None),
+    ("GET", "/transactions/?user_id=1&category=transport", None),
+    ("GET", "/transactions/?user_id=1&transaction_type=income", None),
+    ("GET", "/transactions/summary?user_id=1", None),
+    ("GET", "/budgets/?user_id=1", None),
+    ("GET", "/budgets/summary?user_id=1", None),
+    ("GET", "/goals/?user_id=1&include_completed=false", None),
+    ("GET", "/goals/summary?user_id=1", None),
+    ("POST", "/ai/analyze?user_id=1", {"amount": 5000, "category": "transport"}),
+    ("POST", "/ai/recommend?user_id=1", None),
+    ("POST", "/ai/predict?user_id=1", None),
+    ("POST", "/ai/sika?user_id=1", {"query": "combien il me reste ?"}),
+]
+
+
+def seed_fixtures():
+    from app.models.database import SessionLocal
+    from app.models.budget import Budget, CategoryEnum
+    from app.models.goal import Goal
+
+    db = SessionLocal()
+    for category in CategoryEnum:
+        db.add(Budget(user_id=1, category=category, monthly_limit=100000, current_spent=30000))
+    db.add(Goal(user_id=1, name="Moto", target_amount=500000, current_amount=50000))
+    db.commit()
+    db.close()
+
+
+def explain(conn, statement: str, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    if conn.dialect.name == "sqlite":
+        return [f"{'  ' * (row[1] > 0)}{row[-1]}" for row in rows]
+    return [row[0] for row in rows]
+
+
+async def run(args):
+    os.environ["DB_ASYNC"] = "false"
+    configure_database("explain")
+    app = load_app()
+
+    from sqlalchemy import event
+    from app.models.database import engine, dispose_engines
+    from app.services.rollups import rebuild_rollups
+
+    seed_fixtures()
+    seed_transactions(user_id=1, count=args.transactions)
+    seed_transactions(user_id=2, count=args.transactions, offset=args.transactions)
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+        conn.exec_driver_sql("ANALYZE")
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    async with asgi_client(app) as client:
+        for method, path, body in ENDPOINTS:
+            captured.clear()
+            response = await client.request(method, path, json=body)
+            # Une seule fois chaque couple (requête, paramètres)
+            queries = list({(s, repr(p)): (s, p) for s, p in captured}.values())
+
+            print(f"\n=== {method} {path}  [{response.status_code}]  {len(captured)} requête(s)")
+            event.remove(engine, "before_cursor_execute", capture)
+            with engine.connect() as conn:
+                for statement, parameters in queries:
+                    print("\n  " + " ".join(statement.split())[:160])
+                    for line in explain(conn, statement, parameters):
+                        print("    -> " + line)
+            event.listen(engine, "before_cursor_execute", capture)
+
+    await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=20000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
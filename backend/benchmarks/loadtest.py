@@ -0,0 +1,397 @@
+"""
+Test de charge de bout en bout : tous les routeurs, mélange de requêtes configurable.
+
+    python -m benchmarks.loadtest --users 200 --transactions 500 --requests 5000 --concurrency 50
+    python -m benchmarks.loadtest --mix "ai.sika=30,transactions.create=0" --compare ancien.json
+
+Pour chaque mode (sync, async), dans un sous-processus car DB_ASYNC est lu
+à l'import :
+1. la base est remplie par benchmarks.dataset (N utilisateurs × M
+   transactions, budgets, objectifs ; tirage déterministe) ;
+2. --concurrency clients envoient --requests requêtes (après --warmup non
+   mesurées), chacune tirée selon les poids de SCENARIOS pour un
+   utilisateur au hasard : auth, budgets, transactions, goals, ai, health ;
+3. par scénario : latence p50/p95/p99, débit, codes HTTP et requêtes SQL
+   par requête. Les requêtes SQL sont attribuées à la requête HTTP qui les
+   émet (ContextVar, propagée au threadpool en mode sync).
+
+Le rapport JSON (--output, par défaut benchmarks/results/) contient aussi la
+configuration et le commit : deux exécutions se comparent avec --compare.
+Sans service externe : SQLite temporaire, ou BENCH_DATABASE_URL vers un
+Postgres local jetable (vidé et recréé).
+
+Scénarios et poids par défaut : --list. Un poids à 0 désactive un scénario.
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import BACKEND_DIR, asgi_client, configure_database, latency_stats, load_app
+from benchmarks.dataset import PASSWORD, Dataset, SeededUser, seed_dataset
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Requête HTTP en cours dans la tâche du client : [nombre de requêtes SQL]
+current_request: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "loadtest_request", default=None
+)
+
+SIKA_QUERIES = [
+    "combien il me reste ?",
+    "j'ai payé 3500 francs pour manger",
+    "est-ce que je peux acheter des chaussures à 15000 ?",
+    "donne moi un conseil",
+    "bonjour Sika",
+]
+VOICE_QUERIES = ["combien il me reste", "j'ai dépensé combien ce mois", "mon budget transport"]
+CATEGORIES = ["alimentation", "transport", "communication", "loisirs", "autre",
+              "vetements", "sante", "epargne", "education", "logement"]
+
+Request = Tuple[str, str, dict]  # méthode, URL, arguments httpx
+Builder = Callable[[random.Random, SeededUser], Request]
+_new_accounts = itertools.count(1)
+
+
+def _expense(rng: random.Random) -> dict:
+    return {"amount": float(rng.choice([500, 1000, 2500, 3500, 5000, 15000])),
+            "category": rng.choice(CATEGORIES), "description": "Charge"}
+
+
+def _transaction_id(rng: random.Random, user: SeededUser) -> int:
+    first, last = user.transaction_ids
+    return rng.randint(first, last)
+
+
+def _auth(user: SeededUser) -> dict:
+    return {"Authorization": f"Bearer {user.token}"}
+
+
+def _import_body(rng: random.Random) -> str:
+    lines = ["amount,category,description,transaction_type"]
+    lines += [f"{rng.choice([500, 1500, 4000])},{rng.choice(CATEGORIES)},Import,expense" for _ in range(20)]
+    return "\n".join(lines) + "\n"
+
+
+def _register(rng: random.Random, user: SeededUser) -> Request:
+    n = f"{os.getpid()}x{next(_new_accounts)}"
+    return "POST", "/auth/register", {"json": {
+        "email": f"nouveau{n}@charge.example.com", "username": f"nouveau{n}", "phone": f"+229{n}", "password": PASSWORD
+    }}
+
+
+# nom -> (route affichée, poids par défaut, construction de la requête)
+SCENARIOS: Dict[str, Tuple[str, float, Builder]] = {
+    "auth.login": ("POST /auth/login", 1, lambda rng, u: (
+        "POST", "/auth/login", {"data": {"username": u.email, "password": PASSWORD}})),
+    "auth.me": ("GET /auth/me", 4, lambda rng, u: ("GET", "/auth/me", {"headers": _auth(u)})),
+    "auth.update": ("PUT /auth/me", 0.5, lambda rng, u: (
+        "PUT", f"/auth/me?phone=%2B2251{u.id:09d}", {"headers": _auth(u)})),
+    "auth.register": ("POST /auth/register", 0.3, _register),
+
+    "budgets.list": ("GET /budgets/", 8, lambda rng, u: ("GET", f"/budgets/?user_id={u.id}", {})),
+    "budgets.summary": ("GET /budgets/summary", 6, lambda rng, u: (
+        "GET", f"/budgets/summary?user_id={u.id}", {})),
+    "budgets.get": ("GET /budgets/{id}", 2, lambda rng, u: (
+        "GET", f"/budgets/{rng.choice(u.budget_ids)}", {})),
+    "budgets.update": ("PUT /budgets/{id}", 0.5, lambda rng, u: (
+        "PUT", f"/budgets/{rng.choice(u.budget_ids)}", {"json": {"monthly_limit": float(rng.randint(20, 200) * 1000)}})),
+    "budgets.reset": ("POST /budgets/reset", 0, lambda rng, u: ("POST", f"/budgets/reset?user_id={u.id}", {})),
+
+    "transactions.create": ("POST /transactions/", 10, lambda rng, u: (
+        "POST", f"/transactions/?user_id={u.id}", {"json": _expense(rng)})),
+    "transactions.list": ("GET /transactions/", 14, lambda rng, u: (
+        "GET", f"/transactions/?user_id={u.id}&limit=50", {})),
+    "transactions.filter": ("GET /transactions/?category", 3, lambda rng, u: (
+        "GET", f"/transactions/?user_id={u.id}&category={rng.choice(CATEGORIES)}&limit=20", {})),
+    "transactions.summary": ("GET /transactions/summary", 6, lambda rng, u: (
+        "GET", f"/transactions/summary?user_id={u.id}", {})),
+    "transactions.get": ("GET /transactions/{id}", 3, lambda rng, u: (
+        "GET", f"/transactions/{_transaction_id(rng, u)}", {})),
+    "transactions.update": ("PUT /transactions/{id}", 1, lambda rng, u: (
+        "PUT", f"/transactions/{_transaction_id(rng, u)}", {"json": {"description": "Modifiée"}})),
+    "transactions.delete": ("DELETE /transactions/{id}", 0.5, lambda rng, u: (
+        "DELETE", f"/transactions/{_transaction_id(rng, u)}", {})),
+    "transactions.export": ("GET /transactions/export", 0.3, lambda rng, u: (
+        "GET", f"/transactions/export?user_id={u.id}&start={(datetime.utcnow() - timedelta(days=30)):%Y-%m-%dT00:00:00}", {})),
+    "transactions.import": ("POST /transactions/import", 0.2, lambda rng, u: (
+        "POST", f"/transactions/import?user_id={u.id}&format=csv", {"content": _import_body(rng)})),
+
+    "goals.list": ("GET /goals/", 4, lambda rng, u: ("GET", f"/goals/?user_id={u.id}", {})),
+    "goals.summary": ("GET /goals/summary", 3, lambda rng, u: ("GET", f"/goals/summary?user_id={u.id}", {})),
+    "goals.get": ("GET /goals/{id}", 1, lambda rng, u: ("GET", f"/goals/{rng.choice(u.goal_ids)}", {})),
+    "goals.add": ("POST /goals/{id}/add", 1.5, lambda rng, u: (
+        "POST", f"/goals/{rng.choice(u.goal_ids)}/add", {"json": {"amount": float(rng.choice([1000, 5000, 10000]))}})),
+    "goals.create": ("POST /goals/", 0.3, lambda rng, u: (
+        "POST", f"/goals/?user_id={u.id}", {"json": {"name": "Nouvel objectif", "target_amount": 250000}})),
+    "goals.update": ("PUT /goals/{id}", 0.2, lambda rng, u: (
+        "PUT", f"/goals/{rng.choice(u.goal_ids)}", {"json": {"description": "Modifié"}})),
+
+    "ai.analyze": ("POST /ai/analyze", 4, lambda rng, u: (
+        "POST", f"/ai/analyze?user_id={u.id}", {"json": _expense(rng)})),
+    "ai.analyze_batch": ("POST /ai/analyze/batch", 1, lambda rng, u: (
+        "POST", f"/ai/analyze/batch?user_id={u.id}", {"json": {"transactions": [_expense(rng) for _ in range(20)]}})),
+    "ai.recommend": ("POST /ai/recommend", 2, lambda rng, u: ("POST", f"/ai/recommend?user_id={u.id}", {})),
+    "ai.predict": ("POST /ai/predict", 2, lambda rng, u: ("POST", f"/ai/predict?user_id={u.id}", {})),
+    "ai.voice": ("POST /ai/voice", 2, lambda rng, u: (
+        "POST", f"/ai/voice?user_id={u.id}", {"json": {"query": rng.choice(VOICE_QUERIES)}})),
+    "ai.sika": ("POST /ai/sika", 8, lambda rng, u: (
+        "POST", f"/ai/sika?user_id={u.id}", {"json": {"query": rng.choice(SIKA_QUERIES)}})),
+    "ai.sika_confirm": ("POST /ai/sika/confirm", 2, lambda rng, u: (
+        "POST", f"/ai/sika/confirm?user_id={u.id}", {"json": _expense(rng)})),
+
+    "health": ("GET /health", 0.5, lambda rng, u: ("GET", "/health", {})),
+}
+# Scénarios qui ciblent un objectif : tirés parmi les utilisateurs qui en ont
+NEEDS_GOAL = {"goals.get", "goals.add", "goals.update"}
+
+
+def parse_mix(text: Optional[str], path: Optional[str]) -> Dict[str, float]:
+    """Poids par défaut, surchargés par --mix-file (JSON) puis --mix "nom=poids,..." """
+    mix = {name: weight for name, (_, weight, _) in SCENARIOS.items()}
+    overrides: Dict[str, float] = {}
+    if path:
+        with open(path) as f:
+            overrides.update(json.load(f))
+    for item in filter(None, (text or "").split(",")):
+        name, _, weight = item.partition("=")
+        overrides[name.strip()] = float(weight)
+    unknown = set(overrides) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Scénarios inconnus : {', '.join(sorted(unknown))} (voir --list)")
+    mix.update(overrides)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def count_queries():
+    """Attribuer chaque requête SQL à la requête HTTP de la tâche courante"""
+    from sqlalchemy import event
+    from app.models.database import async_engine, engine
+
+    def on_execute(*_):
+        box = current_request.get()
+        if box is not None:
+            box[0] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+
+
+async def drive(client, dataset: Dataset, mix: Dict[str, float], total: int, concurrency: int,
+                seed: int, samples: Optional[Dict[str, dict]] = None) -> float:
+    """Envoyer `total` requêtes ; renvoie la durée. `samples` reçoit les mesures par scénario"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    with_goals = [user for user in dataset.users if user.goal_ids]
+    remaining = total
+
+    async def worker(index: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + index)
+        while remaining > 0:
+            remaining -= 1
+            name = rng.choices(names, weights)[0]
+            user = rng.choice(with_goals if name in NEEDS_GOAL and with_goals else dataset.users)
+            method, url, kwargs = SCENARIOS[name][2](rng, user)
+
+            box = [0]
+            token = current_request.set(box)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except Exception as e:
+                # Exception remontée par l'application (pas de réponse HTTP)
+                status = type(getattr(e, "orig", None) or e).__name__
+            finally:
+                current_request.reset(token)
+            latency = time.perf_counter() - start
+
+            if samples is not None:
+                sample = samples.setdefault(name, {"latencies": [], "queries": [], "statuses": {}})
+                sample["latencies"].append(latency)
+                sample["queries"].append(box[0])
+                sample["statuses"][status] = sample["statuses"].get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def summarize(samples: Dict[str, dict], elapsed: float) -> Dict[str, dict]:
+    endpoints = {}
+    for name in sorted(samples):
+        sample = samples[name]
+        stats = latency_stats(sample["latencies"], elapsed)
+        stats["endpoint"] = SCENARIOS[name][0]
+        stats["max_ms"] = round(max(sample["latencies"]) * 1000, 2)
+        stats["sql_per_request"] = round(sum(sample["queries"]) / len(sample["queries"]), 2)
+        stats["sql_max"] = max(sample["queries"])
+        stats["statuses"] = dict(sorted(sample["statuses"].items()))
+        # 503 : refus volontaire (file bcrypt pleine, /health avec pool saturé),
+        # compté à part ; les 4xx (404 après suppression) ne sont pas des erreurs
+        stats["rejected"] = sample["statuses"].get("503", 0)
+        stats["errors"] = sum(count for status, count in sample["statuses"].items()
+                              if not status.isdigit() or (int(status) >= 500 and status != "503"))
+        endpoints[name] = stats
+    return endpoints
+
+
+async def run_mode(args) -> dict:
+    app = load_app()
+    from app.models.database import dispose_engines
+
+    dataset = seed_dataset(args.users, args.transactions, args.months, args.seed)
+    count_queries()
+    mix = parse_mix(args.mix, args.mix_file)
+
+    samples: Dict[str, dict] = {}
+    async with asgi_client(app) as client:
+        if args.warmup:
+            await drive(client, dataset, mix, args.warmup, args.concurrency, args.seed + 1)
+        elapsed = await drive(client, dataset, mix, args.requests, args.concurrency, args.seed, samples)
+    await dispose_engines()
+
+    every = [latency for sample in samples.values() for latency in sample["latencies"]]
+    endpoints = summarize(samples, elapsed)
+    totals = latency_stats(every, elapsed)
+    totals["sql_per_request"] = round(
+        sum(sum(sample["queries"]) for sample in samples.values()) / max(1, len(every)), 2
+    )
+    totals["errors"] = sum(stats["errors"] for stats in endpoints.values())
+    totals["rejected"] = sum(stats["rejected"] for stats in endpoints.values())
+    return {
+        "dataset": {"users": len(dataset.users), "transactions": dataset.transactions,
+                    "seed_seconds": round(dataset.seconds, 2)},
+        "mix": mix,
+        "elapsed_s": round(elapsed, 2),
+        "totals": totals,
+        "endpoints": endpoints,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def database_label() -> str:
+    """Dialecte et base, sans identifiants"""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        return "sqlite (fichier temporaire)"
+    scheme, _, rest = url.partition("://")
+    return f"{scheme}://{rest.rpartition('@')[2]}"
+
+
+def print_report(report: dict, previous: Optional[dict]):
+    for mode, run in report["runs"].items():
+        before = (previous or {}).get("runs", {}).get(mode, {}).get("endpoints", {})
+        totals = run["totals"]
+        print(f"\n[{mode}] {totals['requests']} requêtes en {run['elapsed_s']} s : {totals['rps']} req/s, "
+              f"p50 {totals['p50_ms']} ms, p99 {totals['p99_ms']} ms, {totals['sql_per_request']} SQL/req, "
+              f"{totals['errors']} erreurs, {totals['rejected']} refus (503)")
+        print(f"{'scénario':<22}{'route':<30}{'n':>6}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>9}"
+              f"{'SQL/req':>9}{'err':>5}" + ("   Δp50     Δp99" if before else ""))
+        for name, s in run["endpoints"].items():
+            line = (f"{name:<22}{s['endpoint']:<30}{s['requests']:>6}{s['rps']:>8}{s['p50_ms']:>8}"
+                    f"{s['p95_ms']:>8}{s['p99_ms']:>9}{s['sql_per_request']:>9}{s['errors']:>5}")
+            if name in before:
+                old = before[name]
+                line += "".join(
+                    f"{(s[key] - old[key]) / old[key]:>+8.0%}" if old[key] else f"{'':>8}"
+                    for key in ("p50_ms", "p99_ms")
+                )
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=500, help="par utilisateur")
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", help='poids à surcharger : "ai.sika=30,auth.login=0"')
+    parser.add_argument("--mix-file", help="fichier JSON {scénario: poids}")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--output", help="rapport JSON (défaut : benchmarks/results/loadtest-<date>.json)")
+    parser.add_argument("--compare", help="rapport JSON précédent : écarts de latence par scénario")
+    parser.add_argument("--list", action="store_true", help="lister les scénarios et leurs poids")
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (endpoint, weight, _) in SCENARIOS.items():
+            print(f"{name:<22}{endpoint:<30}{weight:>5}")
+        return
+
+    if args.mode:
+        configure_database(f"loadtest_{args.mode}")
+        os.environ["DB_ASYNC"] = "true" if args.mode == "async" else "false"
+        # Profilage actif : les N+1 sous charge sont journalisés
+        os.environ.setdefault("SQL_PROFILING", "true")
+        print(json.dumps(asyncio.run(run_mode(args))))
+        return
+
+    parse_mix(args.mix, args.mix_file)  # erreurs de configuration avant le remplissage
+    report = {
+        "meta": {
+            "date": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "commit": git_commit(),
+            "database": database_label(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ("mode", "list", "output", "compare")},
+        },
+        "runs": {},
+    }
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.loadtest", "--mode", mode,
+             "--users", str(args.users), "--transactions", str(args.transactions),
+             "--months", str(args.months), "--requests", str(args.requests),
+             "--warmup", str(args.warmup), "--concurrency", str(args.concurrency),
+             "--seed", str(args.seed)]
+            + (["--mix", args.mix] if args.mix else [])
+            + (["--mix-file", args.mix_file] if args.mix_file else []),
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        report["runs"][mode] = json.loads(output.strip().splitlines()[-1])
+
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"loadtest-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    print(f"\nRapport : {path}")
+    errors = sum(run["totals"]["errors"] for run in report["runs"].values())
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
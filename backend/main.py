@@ -1,36 +1,34 @@
+from contextlib import asynccontextmanager, suppress
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.models.database import engine, Base
-from app.routes import auth, budgets, transactions, goals, ai
-
-# Créer toutes les tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="GèrTonArgent API",
-    description="Backend pour l'assistant financier intelligent - Gestion budgétaire avec IA",
-    version="2.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-# Configuration CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Inclure tous les routeurs
-app.include_router(auth.router)
-app.include_router(budgets.router)
-app.include_router(transactions.router)
-app.include_router(goals.router)
-app.include_router(ai.router)
-
-@app.get("/")
+from app.models.database import dispose_engines, init_engines
+from app.routes import auth, budgets, transactions, goals, ai, health, metrics
+from app.services.metrics import METRICS_ENABLED, MetricsMiddleware
+from app.models.profiling import SQL_PROFILING
+from app.services.profiling import PROFILING_HEADERS, SQL_DEBUG_HEADERS, QueryProfilingMiddleware
+from app.services.passwords import hasher
+from app.services.rollover import start_scheduler
+
+# Le schéma est géré par les migrations : `alembic upgrade head` avant le
+# premier démarrage et à chaque déploiement.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Moteurs créés au démarrage du worker, pas à l'import (aucune connexion ouverte ici)
+    init_engines()
+    # Remise à zéro mensuelle des budgets si BUDGET_ROLLOVER_SCHEDULER est activé
+    scheduler = start_scheduler()
+    yield
+    if scheduler is not None:
+        scheduler.cancel()
+        with suppress(asyncio.CancelledError):
+            await scheduler
+    await dispose_engines()
+    hasher.shutdown()
+
+
 def read_root():
     return {
         "message": "Bienvenue sur l'API GèrTonArgent",
@@ -38,10 +36,53 @@ def read_root():
         "status": "running"
     }
 
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+
+def create_app() -> FastAPI:
+    """Construire l'application, sans effet de bord (ni base, ni réseau)"""
+    app = FastAPI(
+        title="GèrTonArgent API",
+        description="Backend pour l'assistant financier intelligent - Gestion budgétaire avec IA",
+        version="2.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan,
+    )
+
+    # Configuration CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", *(PROFILING_HEADERS if SQL_DEBUG_HEADERS else [])],
+    )
+
+    # Requêtes SQL par requête HTTP (SQL_PROFILING) : N+1 journalisés, résumé
+    # en en-têtes si SQL_DEBUG_HEADERS
+    if SQL_PROFILING:
+        app.add_middleware(QueryProfilingMiddleware)
+
+    # Latence, statuts et tailles par route (GET /metrics)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Inclure tous les routeurs
+    app.include_router(auth.router)
+    app.include_router(budgets.router)
+    app.include_router(transactions.router)
+    app.include_router(goals.router)
+    app.include_router(ai.router)
+    app.include_router(health.router)
+    if METRICS_ENABLED:
+        app.include_router(metrics.router)
+
+    app.get("/")(read_root)
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
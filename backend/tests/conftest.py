@@ -0,0 +1,18 @@
+"""
+Configuration commune des tests : base SQLite jetable (voir
+benchmarks.common), posée avant le premier import de l'application.
+
+    cd backend && python -m pytest -q
+    DB_ASYNC=true python -m pytest -q    # mêmes tests en mode asynchrone
+"""
+import pytest
+
+from benchmarks.common import configure_database
+
+configure_database("tests")
+
+
+@pytest.fixture(scope="session")
+def app():
+    from benchmarks.common import load_app
+    return load_app()
@@ -0,0 +1,26 @@
+"""Débit des budgets sous concurrence (voir benchmarks.bench_accounting)"""
+import asyncio
+
+from benchmarks.bench_accounting import AMOUNT, budget_state, parallel, seed
+from benchmarks.common import asgi_client
+
+
+def test_parallel_expenses_keep_exact_total(app):
+    from app.models.database import dispose_engines
+
+    async def run():
+        async with asgi_client(app) as client:
+            stats = await parallel(client, "/transactions", 1, 1000)
+        # Connexions asynchrones liées à la boucle de asyncio.run
+        await dispose_engines()
+        return stats
+
+    seed(1)
+    stats = asyncio.run(run())
+    spent, count = budget_state(1)
+
+    # Seule erreur tolérée : l'attente du verrou d'écriture SQLite, sans débit
+    assert set(stats["error_types"]) <= {"database is locked"}
+    assert count == 1000 - stats["errors"]
+    assert stats["lost_updates"] == 0
+    assert spent == count * AMOUNT
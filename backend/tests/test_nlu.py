@@ -0,0 +1,20 @@
+"""Analyse des requêtes Sika / vocales (voir benchmarks.bench_nlu)"""
+import pytest
+
+from benchmarks.bench_nlu import CORPUS, FIXED, LegacyAIEngine, answers, check_corpus
+from app.services.ai_engine import AIEngine
+from app.services.nlu import parse_query
+
+
+def test_golden_corpus():
+    assert check_corpus(LegacyAIEngine(), AIEngine()) == []
+
+
+@pytest.mark.parametrize("query", CORPUS)
+def test_same_answers_as_legacy(query):
+    assert answers(AIEngine(), query) == answers(LegacyAIEngine(), query)
+
+
+@pytest.mark.parametrize("query,expected", FIXED.items())
+def test_fixed_amounts(query, expected):
+    assert parse_query(query).amount == expected
@@ -0,0 +1,10 @@
+"""Score vectorisé contre calculate_score (voir benchmarks.bench_scoring)"""
+import pytest
+
+from benchmarks.bench_scoring import check_equivalence
+from app.services.ai_engine import AIEngine
+
+
+@pytest.mark.parametrize("seed", [0, 1, 42])
+def test_vector_matches_scalar(seed):
+    assert check_equivalence(AIEngine(), 20000, seed) == 0